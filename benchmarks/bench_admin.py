@@ -0,0 +1,55 @@
+"""
+Admin list pages on a large table: Flask-Admin's plain ModelView (exact
+COUNT(*), OFFSET, ILIKE '%x%', every column) against the views of
+src/admin.py (estimated count, ?after= keyset, prefix search, projection).
+
+    python benchmarks/bench_admin.py --rows 1000000
+"""
+import argparse
+import statistics
+from common import load_app, seed, measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app, _ = load_app()
+    seed(app, users=10, planets=args.rows, characters=0, vehicles=0, favorites_per_user=0)
+
+    from flask_admin.contrib.sqla import ModelView
+    from models import db, Planet
+    app.extensions['admin'][0].add_view(
+        ModelView(Planet, db.session, name='Planet (plain)', endpoint='planet_plain', url='/admin/planet-plain'))
+    client = app.test_client()
+
+    deep = args.rows // 2
+    page_size = 50
+    cases = [
+        ("first page", "/admin/planet-plain/", "/admin/planet/"),
+        (f"page {deep // page_size}", f"/admin/planet-plain/?page={deep // page_size}",
+         f"/admin/planet/?page={deep // page_size}&after={deep}"),
+        ("search 'Planet 12345'", "/admin/planet-plain/?search=Planet+12345", "/admin/planet/?search=Planet+12345"),
+    ]
+
+    def db_ms(url):
+        # db;dur=... de la cabecera Server-Timing (profiling.py)
+        response = client.get(url)
+        assert response.status_code == 200, url
+        return float(response.headers['Server-Timing'].split('db;dur=')[1].split(';')[0])
+
+    print(f"{args.rows} planets, median of {args.repeat}, total ms (of which database)")
+    print(f"  {'page':<28}{'ModelView':>22}{'ScalableModelView':>22}")
+    for label, plain, scalable in cases:
+        results = []
+        for url in (plain, scalable):
+            total = statistics.median(measure(lambda: client.get(url), args.repeat))
+            database = statistics.median(db_ms(url) for _ in range(args.repeat))
+            results.append(f"{total:.2f} ({database:.2f})")
+        print(f"  {label:<28}{results[0]:>22}{results[1]:>22}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Sync (gunicorn wsgi, N workers) vs async (gunicorn asgi with uvicorn workers)
+under increasing concurrency on the read routes. Reports throughput, p50/p99
+and the RSS of the whole process tree (master + workers), so the two modes
+can be compared at the same memory: by default 4 sync workers against 1
+async worker.
+
+    python benchmarks/bench_async.py --sync-workers 4 --async-workers 1 --concurrency 1,8,32,64
+"""
+import os
+import argparse
+from common import load_app, seed
+from run import Scenario, HTTPDriver, run_scenario, start_gunicorn
+
+READ_ROUTES = ["/planets?limit=50", "/planets/1", "/characters/1", "/users/1", "/users/1/favorites"]
+
+
+def tree_rss_mb(pid):
+    """RSS del proceso y todos sus hijos, en MB (Linux, /proc)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except OSError:
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            continue
+    return round(total / 1024, 1)
+
+
+def mixed_reads(i):
+    return "GET", READ_ROUTES[i % len(READ_ROUTES)], None
+
+
+def bench_server(label, db_path, workers, worker_class, target, levels, requests):
+    process, port = start_gunicorn(db_path, workers, worker_class, target)
+    try:
+        driver = HTTPDriver("127.0.0.1", port)
+        # Calentamiento: conexiones abiertas y cache llena en todos los workers
+        run_scenario(driver, Scenario("warmup", mixed_reads), 50 * workers, concurrency=workers)
+        for concurrency in levels:
+            result = run_scenario(driver, Scenario("reads", mixed_reads), requests, concurrency)
+            print(f"{label:<28}{concurrency:>6}{result['throughput_rps']:>10}{result['p50']:>10.2f}"
+                  f"{result['p99']:>10.2f}{result['errors']:>8}{tree_rss_mb(process.pid):>10}")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync-workers', type=int, default=4)
+    parser.add_argument('--async-workers', type=int, default=1)
+    parser.add_argument('--concurrency', default='1,8,32,64', help="niveles de clientes en paralelo")
+    parser.add_argument('--requests', type=int, default=2000, help="peticiones por nivel")
+    parser.add_argument('--planets', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    args = parser.parse_args()
+
+    app, db_path = load_app()
+    seed(app, users=args.users, planets=args.planets, characters=args.planets, vehicles=args.planets,
+         favorites_per_user=10)
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    print(f"{'mode':<28}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'RSS MB':>10}")
+    bench_server(f"sync wsgi x{args.sync_workers}", db_path, args.sync_workers, "sync",
+                 "wsgi:application", levels, args.requests)
+    bench_server(f"async asgi x{args.async_workers}", db_path, args.async_workers,
+                 "uvicorn.workers.UvicornWorker", "asgi:application", levels, args.requests)
+
+
+if __name__ == '__main__':
+    main()
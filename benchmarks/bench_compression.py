@@ -0,0 +1,76 @@
+"""
+Bytes on the wire against CPU for the response compression: each encoding
+and level on a full catalog page and on a user's favorites, and then the
+whole request with the compressed page taken from the cache or compressed
+on every hit (favorites).
+
+    python benchmarks/bench_compression.py --rows 10000 --limit 1000
+
+br and zstd only appear when brotli / zstandard are installed.
+"""
+import argparse
+import statistics
+from common import load_app, seed, measure
+
+LEVELS = {'gzip': (1, 6, 9), 'br': (1, 5, 11), 'zstd': (1, 3, 9)}
+# Tiempo de transferencia de referencia: un enlace movil modesto
+LINK_MBITS = 10
+
+
+def wire_ms(size):
+    return size * 8 / (LINK_MBITS * 1e6) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--favorites', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    # Umbral 0 y todos los encodings disponibles
+    app, _ = load_app(COMPRESSION_MIN_SIZE='0')
+    seed(app, users=1, planets=args.rows, characters=args.rows, vehicles=args.rows,
+         favorites_per_user=args.favorites)
+
+    import gzip
+    from compression import compress, AVAILABLE, brotli, zstandard
+    decompressors = {'gzip': gzip.decompress}
+    if brotli is not None:
+        decompressors['br'] = brotli.decompress
+    if zstandard is not None:
+        decompressors['zstd'] = zstandard.ZstdDecompressor().decompress
+
+    client = app.test_client()
+    payloads = {
+        f"/planets?limit={args.limit}": client.get(f"/planets?limit={args.limit}").get_data(),
+        "/users/1/favorites": client.get("/users/1/favorites").get_data(),
+    }
+
+    for path, body in payloads.items():
+        print(f"\n{path}: {len(body)} bytes, {wire_ms(len(body)):.1f} ms at {LINK_MBITS} Mbit/s")
+        print(f"  {'encoding':<10}{'level':>6}{'bytes':>10}{'ratio':>8}{'compress ms':>13}"
+              f"{'decompress ms':>15}{'wire ms':>9}")
+        for encoding, levels in LEVELS.items():
+            if not AVAILABLE[encoding]:
+                continue
+            for level in levels:
+                data = compress(body, encoding, level)
+                compress_ms = statistics.median(measure(lambda: compress(body, encoding, level), args.repeat))
+                decompress_ms = statistics.median(measure(lambda: decompressors[encoding](data), args.repeat))
+                print(f"  {encoding:<10}{level:>6}{len(data):>10}{len(body) / len(data):>8.1f}"
+                      f"{compress_ms:>13.3f}{decompress_ms:>15.3f}{wire_ms(len(data)):>9.1f}")
+
+    print(f"\nWhole request, median of {args.repeat} (levels by default)")
+    print(f"  {'path':<28}{'encoding':<10}{'bytes':>10}{'server ms':>11}{'+ wire ms':>11}")
+    for path in payloads:
+        for encoding in ['identity'] + [encoding for encoding in LEVELS if AVAILABLE[encoding]]:
+            headers = {'Accept-Encoding': encoding}
+            size = len(client.get(path, headers=headers).get_data())
+            server_ms = statistics.median(measure(lambda: client.get(path, headers=headers), args.repeat))
+            print(f"  {path:<28}{encoding:<10}{size:>10}{server_ms:>11.2f}{server_ms + wire_ms(size):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Deleting a popular planet: the ORM way (load its favorites and delete them
+one by one with session.delete) against DELETE /planets/<id> (counters, one
+DELETE and ON DELETE CASCADE in the database), with PURGE_THRESHOLD=0 so
+the whole deletion happens inside the request.
+
+    python benchmarks/bench_delete.py --favorites 1000,10000,50000
+"""
+import time
+import argparse
+from common import load_app
+
+
+def seed_popular(app, users):
+    """Un planeta por ronda, favorito de todos los usuarios."""
+    from sqlalchemy import insert
+    from models import db, User, Planet, Favorite
+    from favorites import recompute_counts, recompute_popularity
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {"email": f"user{i}@example.com", "password": "x", "first_name": "U", "last_name": str(i), "is_active": True}
+            for i in range(users)
+        ])
+        db.session.execute(insert(Planet), [
+            {"id": i, "name": f"Planet {i}", "climate": f"climate-{i}", "terrain": "t", "population": i}
+            for i in (1, 2)
+        ])
+        user_ids = db.session.execute(db.select(User.id)).scalars().all()
+        db.session.execute(insert(Favorite), [
+            {"user_id": user_id, "planet_id": planet_id} for planet_id in (1, 2) for user_id in user_ids
+        ])
+        recompute_counts()
+        recompute_popularity()
+        db.session.commit()
+
+
+def orm_delete(app, planet_id):
+    from models import db, Planet
+    with app.app_context():
+        planet = db.session.get(Planet, planet_id)
+        for favorite in planet.favorite:
+            db.session.delete(favorite)
+        db.session.delete(planet)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--favorites', default='1000,10000,50000', help="favoritos del planeta borrado")
+    args = parser.parse_args()
+
+    print(f"{'favorites':>10}{'ORM ms':>12}{'DELETE ms':>12}{'queries':>10}")
+    for count in [int(value) for value in args.favorites.split(',')]:
+        app, _ = load_app(PURGE_THRESHOLD='0')
+        seed_popular(app, count)
+
+        started = time.perf_counter()
+        orm_delete(app, 1)
+        orm_ms = (time.perf_counter() - started) * 1000
+
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.delete('/planets/2')
+        delete_ms = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.status_code
+        queries = response.headers['Server-Timing'].split('desc="')[1].split(' ')[0]
+        print(f"{count:>10}{orm_ms:>12.1f}{delete_ms:>12.1f}{queries:>10}")
+
+
+if __name__ == '__main__':
+    main()
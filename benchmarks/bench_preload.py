@@ -0,0 +1,95 @@
+"""
+Memory per gunicorn worker with and without src/gunicorn_config.py (preload,
+warm-up and gc.freeze in the master): RSS, PSS and USS (the pages only that
+process holds, Private_* in /proc/<pid>/smaps_rollup) of every worker after
+serving the same mixed reads, plus the total PSS of master + workers.
+
+    python benchmarks/bench_preload.py --workers 4 --requests 4000
+"""
+import os
+import time
+import argparse
+from common import SRC, load_app, seed
+from run import Scenario, HTTPDriver, run_scenario, start_gunicorn
+
+READ_ROUTES = ["/planets?limit=50", "/planets/1", "/characters?limit=50", "/characters/1",
+               "/vehicles/1", "/users/1/favorites", "/search?q=pla"]
+
+MODES = (
+    ("plain", ()),
+    ("--preload", ("--preload",)),
+    ("gunicorn_config.py", ("-c", os.path.join(SRC, "gunicorn_config.py"))),
+)
+
+
+def mixed_reads(i):
+    return "GET", READ_ROUTES[i % len(READ_ROUTES)], None
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        found.append(int(entry))
+            except OSError:
+                continue
+    return sorted(found)
+
+
+def memory_mb(pid):
+    """rss, pss y uss del proceso en MB (Linux >= 4.14, /proc/<pid>/smaps_rollup)."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].endswith(':') and len(parts) == 3:
+                fields[parts[0][:-1]] = int(parts[1])
+    uss = fields['Private_Clean'] + fields['Private_Dirty']
+    return {name: round(kb / 1024, 1) for name, kb in
+            (('rss', fields['Rss']), ('pss', fields['Pss']), ('uss', uss))}
+
+
+def bench_mode(label, extra_args, db_path, workers, requests):
+    process, port = start_gunicorn(db_path, workers, "sync", extra_args=extra_args, REQUEST_LOG='0')
+    try:
+        deadline = time.time() + 30
+        while len(children(process.pid)) < workers and time.time() < deadline:
+            time.sleep(0.2)
+        driver = HTTPDriver("127.0.0.1", port)
+        run_scenario(driver, Scenario("reads", mixed_reads), requests, concurrency=workers * 2)
+
+        master = memory_mb(process.pid)
+        per_worker = [memory_mb(pid) for pid in children(process.pid)]
+        for column in ('rss', 'pss', 'uss'):
+            values = sorted(sample[column] for sample in per_worker)
+            print(f"  {label:<22}{column:>6}{values[len(values) // 2]:>12}{min(values):>10}{max(values):>10}"
+                  f"{master[column]:>10}")
+        total = master['pss'] + sum(sample['pss'] for sample in per_worker)
+        print(f"  {label:<22}{'total PSS (master + workers)':>38} {total:.1f}")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=4000, help="peticiones antes de medir")
+    parser.add_argument('--planets', type=int, default=1000)
+    args = parser.parse_args()
+
+    app, db_path = load_app()
+    seed(app, users=100, planets=args.planets, characters=args.planets, vehicles=args.planets,
+         favorites_per_user=10)
+
+    print(f"{args.workers} sync workers after {args.requests} mixed reads (MB)")
+    print(f"  {'mode':<22}{'':>6}{'worker p50':>12}{'min':>10}{'max':>10}{'master':>10}")
+    for label, extra_args in MODES:
+        bench_mode(label, extra_args, db_path, args.workers, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Throughput of the request schemas (validations per second, valid and
+invalid bodies) and the cost of a rejected POST end to end: a 422 without
+any query against the database.
+
+    python benchmarks/bench_schemas.py --iterations 200000
+"""
+import argparse
+import time
+import statistics
+from common import load_app, measure
+
+BODIES = {
+    'planet': ({"name": "Hoth", "climate": "frozen", "terrain": "ice", "population": 10000},
+               {"name": 5, "climate": "x" * 200, "population": True}),
+    'character': ({"name": "Luke", "gender": "male", "height": 172, "mass": 77},
+                  {"name": "Luke", "height": 1.72, "mass": "77"}),
+    'vehicle': ({"name": "X-wing", "cargo_capacity": "110", "length": "12.5", "model": "T-65"},
+                {"cargo_capacity": 110, "length": None}),
+    'user': ({"email": "luke@rebels.org", "password": "secret", "first_name": "Luke", "last_name": "Skywalker"},
+             {"email": "", "password": 1, "first_name": "  "}),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app, _ = load_app()
+    from models import User, Planet, Character, Vehicle
+    from schemas import CREATE_SCHEMAS
+    models = {'planet': Planet, 'character': Character, 'vehicle': Vehicle, 'user': User}
+
+    print(f"{'schema':<12}{'body':<10}{'errors':>8}{'validations/s':>16}")
+    for kind, bodies in BODIES.items():
+        validate = CREATE_SCHEMAS[models[kind]].validate
+        for label, body in zip(('valid', 'invalid'), bodies):
+            errors = len(validate(body)[1])
+            started = time.perf_counter()
+            for _ in range(args.iterations):
+                validate(body)
+            rate = args.iterations / (time.perf_counter() - started)
+            print(f"{kind:<12}{label:<10}{errors:>8}{rate:>16,.0f}")
+
+    client = app.test_client()
+    urls = {'planet': '/planets', 'character': '/characters', 'vehicle': '/vehicles', 'user': '/users'}
+    print(f"\nRejected POST end to end, median of {args.repeat}")
+    for kind, (_, invalid) in BODIES.items():
+        response = client.post(urls[kind], json=invalid)
+        queries = response.headers['Server-Timing'].split('desc="')[1].split(' ')[0]
+        samples = measure(lambda: client.post(urls[kind], json=invalid), args.repeat)
+        print(f"  POST {urls[kind]:<14}{response.status_code:>5}  {queries} queries  {statistics.median(samples):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
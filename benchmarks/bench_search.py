@@ -0,0 +1,41 @@
+"""
+Latency of GET /search on a large catalog (one million rows by default,
+split between planets, characters and vehicles), from a selective prefix
+to a word that matches a third of the table.
+
+    python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+from common import load_app, seed, measure, percentiles
+
+QUERIES = [
+    ("exact id", "q=planet%20123457"),
+    ("prefix of 11 rows", "q=planet%2012345"),
+    ("prefix of 111 rows", "q=vehicle%201234"),
+    ("three words, extra column", "q=model%201%20vehicle%2099"),
+    ("broad prefix, page 1", "q=plan"),
+    ("broad prefix, deep page", "q=plan&offset=1000"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app, _ = load_app()
+    per_kind = args.rows // 3
+    seed(app, users=1, planets=per_kind, characters=per_kind, vehicles=per_kind, favorites_per_user=0)
+    client = app.test_client()
+
+    print(f"{'query':<32}{'results':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, query in QUERIES:
+        results = len(client.get(f"/search?{query}").get_json())
+        samples = measure(lambda: client.get(f"/search?{query}"), args.repeat)
+        stats = percentiles(samples)
+        print(f"{label:<32}{results:>8}{stats['p50']:>10.2f}{stats['p99']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
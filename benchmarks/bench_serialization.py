@@ -0,0 +1,50 @@
+"""
+Compares the old list path (ORM objects + serialize() + stdlib jsonify)
+with the row-tuple path on the stdlib and orjson providers.
+
+    python benchmarks/bench_serialization.py --rows 10000 --limit 1000
+"""
+import argparse
+import statistics
+from common import load_app, seed, measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app, _ = load_app()
+    seed(app, users=1, planets=args.rows, characters=0, vehicles=0, favorites_per_user=0)
+
+    from flask import jsonify
+    from flask.json.provider import DefaultJSONProvider
+    from json_provider import StdlibJSONProvider, OrjsonProvider, orjson
+    from models import Planet
+    from queries import paginate, parse_list_args
+
+    def legacy():
+        planets = Planet.query.limit(args.limit).all()
+        jsonify([planet.serialize() for planet in planets]).get_data()
+
+    def rows():
+        items, _ = paginate(Planet, parse_list_args(Planet, {"limit": str(args.limit)}))
+        jsonify(items).get_data()
+
+    cases = [("orm + serialize() + jsonify (stdlib)", DefaultJSONProvider, legacy),
+             ("row tuples + stdlib", StdlibJSONProvider, rows)]
+    if orjson is not None:
+        cases.append(("row tuples + orjson", OrjsonProvider, rows))
+
+    print(f"{args.limit} rows per response, {args.repeat} runs")
+    for name, provider, fn in cases:
+        with app.test_request_context():
+            app.json = provider(app)
+            samples = measure(fn, args.repeat)
+        print(f"  {name:40s} median {statistics.median(samples):8.2f} ms   min {min(samples):8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
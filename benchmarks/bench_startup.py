@@ -0,0 +1,66 @@
+"""
+Worker startup per profile, each run in a fresh interpreter: importing
+app.py, create_app(), the first response of / and of /planets, and the
+RSS at that point. Run it after touching imports or create_app to catch
+startup regressions.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from common import SRC, load_app, seed
+
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+client = app.test_client()
+assert client.get('/').status_code == 200
+sitemap = time.perf_counter()
+assert client.get('/planets').status_code == 200
+planets = time.perf_counter()
+print(json.dumps({
+    "import": (imported - started) * 1000,
+    "create_app": (created - imported) * 1000,
+    "first /": (sitemap - created) * 1000,
+    "first /planets": (planets - sitemap) * 1000,
+    "total": (planets - started) * 1000,
+    # VmRSS y no ru_maxrss: ru_maxrss arrastra el maximo del proceso padre
+    "rss MB": next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS')) / 1024,
+}))
+"""
+
+
+def probe(profile, env):
+    output = subprocess.run([sys.executable, "-c", PROBE, profile], cwd=SRC, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    app, db_path = load_app()
+    seed(app, users=1, planets=100, characters=0, vehicles=0, favorites_per_user=0)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", REQUEST_LOG='0')
+
+    columns = ("import", "create_app", "first /", "first /planets", "total", "rss MB")
+    print(f"median of {args.runs} fresh interpreters (ms, except rss)")
+    print(f"  {'profile':<14}" + "".join(f"{column:>16}" for column in columns))
+    for profile in ('development', 'production'):
+        samples = [probe(profile, env) for _ in range(args.runs)]
+        print(f"  {profile:<14}" + "".join(
+            f"{statistics.median(sample[column] for sample in samples):>16.1f}" for column in columns))
+
+
+if __name__ == '__main__':
+    main()
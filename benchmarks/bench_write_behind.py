@@ -0,0 +1,68 @@
+"""
+POST /favorite/planet/<id> from many client threads: a commit per request
+(default) against the write-behind queue of src/write_behind.py with
+durability sync (201 after the batch commit) and async (202 once queued).
+Reports favorites written per second, commits per second and favorites per
+commit. Runs in process against SQLite; the difference grows with the cost
+of each commit (fsync on a real disk, a network round trip to PostgreSQL).
+
+    python benchmarks/bench_write_behind.py --requests 5000 --concurrency 32
+"""
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from common import load_app, seed
+
+MODES = (
+    ("commit per request", {"FAVORITES_WRITE_BEHIND": "0"}),
+    ("write-behind sync", {"FAVORITES_WRITE_BEHIND": "1", "FAVORITES_DURABILITY": "sync"}),
+    ("write-behind async", {"FAVORITES_WRITE_BEHIND": "1", "FAVORITES_DURABILITY": "async"}),
+)
+
+
+def bench_mode(env, requests, concurrency, side):
+    app, _ = load_app(**env)
+    seed(app, users=side, planets=side, characters=0, vehicles=0, favorites_per_user=0)
+
+    from sqlalchemy import event, select, func
+    from models import db, Favorite
+    commits = Counter()
+    with app.app_context():
+        event.listen(db.engine, 'commit', lambda connection: commits.update(['commit']))
+
+    def post(i):
+        client = app.test_client()
+        return client.post(f'/favorite/planet/{i % side + 1}', json={"user_id": i // side + 1}).status_code
+
+    def written():
+        with app.app_context():
+            return db.session.scalar(select(func.count(Favorite.id)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        statuses = Counter(pool.map(post, range(requests)))
+    # Con async las respuestas llegan antes que los datos: se espera a que esten todos escritos
+    while written() < requests:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    return statuses, requests / elapsed, commits['commit'] / elapsed, requests / max(commits['commit'], 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+    # Usuarios x planetas: un par distinto por peticion
+    side = int(args.requests ** 0.5) + 1
+
+    print(f"{args.requests} favorites, {args.concurrency} client threads")
+    print(f"  {'mode':<22}{'favorites/s':>14}{'commits/s':>12}{'per commit':>12}  statuses")
+    for label, env in MODES:
+        statuses, rate, commit_rate, per_commit = bench_mode(env, args.requests, args.concurrency, side)
+        print(f"  {label:<22}{rate:>14,.0f}{commit_rate:>12,.0f}{per_commit:>12.1f}  {dict(statuses)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Helpers shared by the benchmarks: a throwaway SQLite database, seeding with
+configurable volumes and latency percentiles.
+"""
+import os
+import sys
+import time
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+
+def load_app(db_path=None, profile=None, **env):
+    """Crea la app de src/app.py (perfil `profile`) contra una base SQLite temporal
+    (o `db_path`) y crea las tablas."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='starwars-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    # Sin una linea de log por peticion mientras medimos
+    os.environ.setdefault('REQUEST_LOG', '0')
+    os.environ.update(env)
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+
+    from app import create_app
+    from models import db
+    app = create_app(profile)
+    with app.app_context():
+        db.create_all()
+    return app, db_path
+
+
+def seed(app, users=100, planets=1000, characters=1000, vehicles=1000, favorites_per_user=10, batch=5000):
+    """Rellena la base con datos sinteticos usando INSERT multi-fila."""
+    from sqlalchemy import insert
+    from models import db, User, Planet, Character, Vehicle, Favorite
+
+    def insert_rows(model, rows):
+        for start in range(0, len(rows), batch):
+            db.session.execute(insert(model), rows[start:start + batch])
+
+    with app.app_context():
+        insert_rows(User, [
+            {"email": f"user{i}@example.com", "password": "x", "first_name": f"Name{i}",
+             "last_name": f"Last{i}", "is_active": True}
+            for i in range(users)
+        ])
+        insert_rows(Planet, [
+            {"name": f"Planet {i}", "climate": f"climate-{i}", "terrain": f"terrain-{i % 20}",
+             "population": i * 1000}
+            for i in range(planets)
+        ])
+        insert_rows(Character, [
+            {"name": f"Character {i}", "gender": f"gender-{i}", "height": 100 + i % 100, "mass": 50 + i % 80}
+            for i in range(characters)
+        ])
+        insert_rows(Vehicle, [
+            {"name": f"Vehicle {i}", "cargo_capacity": str(i * 10), "length": str(i % 50),
+             "model": f"model-{i % 30}"}
+            for i in range(vehicles)
+        ])
+
+        favorites = []
+        for user_id in range(1, users + 1):
+            for n in range(favorites_per_user):
+                kind = n % 3
+                target = (user_id * 7 + n) % max(1, [planets, characters, vehicles][kind]) + 1
+                key = ["planet_id", "character_id", "vehicle_id"][kind]
+                favorites.append({"user_id": user_id, key: target})
+        # Quitar colisiones con los indices unicos (user_id, X_id)
+        unique = {tuple(sorted(row.items())): row for row in favorites}
+        insert_rows(Favorite, list(unique.values()))
+        # Los contadores desnormalizados a partir de lo insertado
+        from favorites import recompute_counts, recompute_popularity
+        recompute_counts()
+        recompute_popularity()
+        db.session.commit()
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{p}": None for p in points}
+    return {
+        f"p{p}": ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+        for p in points
+    }
+
+
+def measure(fn, repeat):
+    """Ejecuta `fn` `repeat` veces y devuelve las duraciones en milisegundos."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
@@ -0,0 +1,351 @@
+"""
+Benchmark / load-test suite for every route in src/app.py.
+
+Seeds a throwaway SQLite database with the requested volumes and drives
+every route through the Flask test client and, with --gunicorn, through a
+real `gunicorn wsgi:application` launch. Reports p50/p95/p99 latency,
+throughput and queries per request, and saves everything as JSON so two
+commits can be compared:
+
+    python benchmarks/run.py --planets 50000 --gunicorn --workers 4
+    python benchmarks/run.py --compare benchmarks/results/<old>.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import platform
+import subprocess
+import http.client
+import re
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from common import ROOT, SRC, load_app, seed, percentiles
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class Scenario:
+    """Una ruta a medir. `make_request(i)` devuelve (method, url, json_body)
+    para la iteracion i; las escrituras generan datos unicos en cada llamada.
+    `after(status, body)` permite guardar ids creados para otros escenarios."""
+
+    def __init__(self, rule, make_request, after=None, requests=None):
+        self.rule = rule
+        self.make_request = make_request
+        self.after = after
+        self.requests = requests
+
+
+def build_scenarios(volumes):
+    created = {"users": [], "planets": [], "vehicles": [], "characters": []}
+    users = volumes["users"]
+    stamp = int(time.time() * 1000)
+
+    def get(url):
+        return lambda i: ("GET", url, None)
+
+    def remember(collection):
+        def after(status, body):
+            if status == 201:
+                created[collection].append(json.loads(body)["id"])
+        return after
+
+    def delete_created(collection, url):
+        return lambda i: ("DELETE", url.format(created[collection].pop()), None)
+
+    def favorite(kind):
+        # Pares (usuario, entidad) que no chocan con los sembrados ni entre si
+        total = volumes[f"{kind}s"]
+        return lambda i: ("POST", f"/favorite/{kind}/{total - i // users}", {"user_id": i % users + 1})
+
+    def batch_items(i):
+        # 100 favoritos mezclados por peticion: 34 planetas, 33 personajes y 33 vehiculos
+        return [{"type": kind, "id": (i * 100 + n) % volumes[f"{kind}s"] + 1}
+                for n, kind in enumerate(["planet", "character", "vehicle"] * 34) if n < 100]
+
+    def bulk(kind, row):
+        return lambda i: ("POST", f"/{kind}/bulk", [row(f"{stamp}-{i}-{n}") for n in range(100)])
+
+    scenarios = [
+        Scenario("/", get("/")),
+        Scenario("/users", get("/users")),
+        Scenario("/users/<int:user_id>", get("/users/1")),
+        Scenario("/planets", get("/planets")),
+        Scenario("/planets?filter", get("/planets?population_gte=1000&limit=50&fields=name,population")),
+        Scenario("/planets/<int:planet_id>", get("/planets/1")),
+        Scenario("/planets/popular", get("/planets/popular")),
+        Scenario("/vehicles", get("/vehicles")),
+        Scenario("/vehicles/<int:vehicle_id>", get("/vehicles/1")),
+        Scenario("/vehicles/popular", get("/vehicles/popular")),
+        Scenario("/characters", get("/characters")),
+        Scenario("/characters/<int:character_id>", get("/characters/1")),
+        Scenario("/characters/popular", get("/characters/popular")),
+        Scenario("/users/<int:user_id>/favorites", get("/users/1/favorites")),
+        Scenario("/users/<int:user_id>/favorites/summary", get("/users/1/favorites/summary")),
+        Scenario("/cache/stats", get("/cache/stats")),
+        Scenario("/metrics", get("/metrics")),
+        Scenario("/search", get("/search?q=planet%201")),
+        Scenario("/<collection>/export", get("/planets/export"), requests=10),
+        Scenario("POST /users", lambda i: ("POST", "/users", {
+            "email": f"bench-{stamp}-{i}@example.com", "password": "x", "first_name": "B", "last_name": "M"}),
+            after=remember("users")),
+        Scenario("POST /planets", lambda i: ("POST", "/planets", {
+            "name": f"bench-{stamp}-{i}", "climate": f"bench-{stamp}-{i}", "terrain": "x", "population": i}),
+            after=remember("planets")),
+        Scenario("POST /vehicles", lambda i: ("POST", "/vehicles", {
+            "name": f"bench-{stamp}-{i}", "cargo_capacity": "1", "length": "1", "model": "bench"}),
+            after=remember("vehicles")),
+        Scenario("POST /characters", lambda i: ("POST", "/characters", {
+            "name": f"bench-{stamp}-{i}", "gender": f"bench-{stamp}-{i}", "height": 1, "mass": 1}),
+            after=remember("characters")),
+        Scenario("POST /planets/bulk", bulk("planets", lambda key: {
+            "name": f"bulk-{key}", "climate": f"bulk-{key}", "terrain": "x", "population": 1}), requests=10),
+        Scenario("POST /vehicles/bulk", bulk("vehicles", lambda key: {
+            "name": f"bulk-{key}", "cargo_capacity": "1", "length": "1", "model": "bulk"}), requests=10),
+        Scenario("POST /characters/bulk", bulk("characters", lambda key: {
+            "name": f"bulk-{key}", "gender": f"bulk-{key}", "height": 1, "mass": 1}), requests=10),
+        Scenario("POST /users/<int:user_id>/favorites/batch", lambda i: (
+            "POST", f"/users/{i % users + 1}/favorites/batch", batch_items(i)), requests=20),
+        Scenario("DELETE /users/<int:user_id>/favorites/batch", lambda i: (
+            "DELETE", f"/users/{i % users + 1}/favorites/batch", batch_items(i)), requests=20),
+        Scenario("POST /favorite/planet/<int:planet_id>", favorite("planet")),
+        Scenario("POST /favorite/vehicle/<int:vehicle_id>", favorite("vehicle")),
+        Scenario("POST /favorite/character/<int:character_id>", favorite("character")),
+        Scenario("DELETE /users/<int:user_id>", delete_created("users", "/users/{}")),
+        Scenario("DELETE /planets/<int:planet_id>", delete_created("planets", "/planets/{}")),
+        Scenario("DELETE /vehicles/<int:vehicle_id>", delete_created("vehicles", "/vehicles/{}")),
+        Scenario("DELETE /characters/<int:character_id>", delete_created("characters", "/characters/{}")),
+    ]
+    return scenarios, created
+
+
+def check_coverage(app, scenarios):
+    """Avisa de las rutas de la app que no tienen escenario."""
+    covered = set()
+    for scenario in scenarios:
+        method, _, rule = scenario.rule.rpartition(" ")
+        covered.add((method or "GET", rule.split("?")[0]))
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static' or rule.rule.startswith('/admin'):
+            continue
+        for method in rule.methods - {"HEAD", "OPTIONS"}:
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    return sorted(missing)
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        from sqlalchemy import event
+        from models import db
+        self.client = app.test_client()
+        self.queries = 0
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.queries += 1
+
+    def request(self, method, url, body):
+        response = self.client.open(url, method=method, json=body)
+        return response.status_code, response.get_data()
+
+
+class HTTPDriver:
+    """Cliente HTTP contra gunicorn. Las queries por peticion salen de la
+    cabecera Server-Timing (db;desc="N queries") que pone profiling.py."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, body):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        payload = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection.request(method, url, body=payload, headers=headers)
+        response = connection.getresponse()
+        data = response.read()
+        match = SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing') or '')
+        if match:
+            with self._lock:
+                self.queries += int(match.group(1))
+        connection.close()
+        return response.status, data
+
+
+def run_scenario(driver, scenario, requests, concurrency=1):
+    count = scenario.requests or requests
+    samples, errors = [], 0
+    queries_before = driver.queries
+
+    def one(i):
+        method, url, body = scenario.make_request(i)
+        start = time.perf_counter()
+        status, data = driver.request(method, url, body)
+        elapsed = (time.perf_counter() - start) * 1000
+        if scenario.after:
+            scenario.after(status, data)
+        return elapsed, status
+
+    started = time.perf_counter()
+    try:
+        if concurrency == 1:
+            outcomes = [one(i) for i in range(count)]
+        else:
+            with ThreadPoolExecutor(concurrency) as pool:
+                outcomes = list(pool.map(one, range(count)))
+    except IndexError:
+        # DELETE sin ids creados suficientes
+        outcomes = []
+    total = time.perf_counter() - started
+
+    for elapsed, status in outcomes:
+        samples.append(elapsed)
+        errors += status >= 500
+    result = {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / total, 1) if total and samples else None,
+        **{k: round(v, 3) if v is not None else None for k, v in percentiles(samples).items()},
+    }
+    if driver.queries is not None and samples:
+        result["queries_per_request"] = round((driver.queries - queries_before) / len(samples), 2)
+    return result
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(db_path, workers, worker_class, target="wsgi:application", extra_args=(), **env):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", **env)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", target, "--chdir", SRC,
+         "-b", f"127.0.0.1:{port}", "-w", str(workers), "-k", worker_class, "--log-level", "warning",
+         *extra_args],
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn no arranco en 30s")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(mode, results):
+    print(f"\n== {mode} ==")
+    print(f"{'route':48s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'req/s':>8s} {'q/req':>6s} {'err':>4s}")
+    for name, r in results.items():
+        fmt = lambda v: f"{v:8.2f}" if v is not None else f"{'-':>8s}"
+        q = r.get("queries_per_request")
+        print(f"{name:48s} {fmt(r['p50'])} {fmt(r['p95'])} {fmt(r['p99'])} "
+              f"{fmt(r['throughput_rps'])} {q if q is not None else '-':>6} {r['errors']:>4d}")
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n== comparado con {baseline_path} ({baseline['meta'].get('commit')}) ==")
+    for mode, results in current["results"].items():
+        for name, r in results.items():
+            old = baseline["results"].get(mode, {}).get(name)
+            if not old or not old.get("p50") or not r.get("p50"):
+                continue
+            delta = (r["p50"] - old["p50"]) / old["p50"] * 100
+            flag = "  <-- regresion" if delta > 20 else ""
+            print(f"{mode:12s} {name:48s} p50 {old['p50']:8.2f} -> {r['p50']:8.2f} ms ({delta:+.0f}%){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--planets', type=int, default=1000)
+    parser.add_argument('--characters', type=int, default=1000)
+    parser.add_argument('--vehicles', type=int, default=1000)
+    parser.add_argument('--favorites-per-user', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200, help="peticiones por ruta")
+    parser.add_argument('--gunicorn', action='store_true', help="medir tambien contra gunicorn real")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-class', default='sync')
+    parser.add_argument('--concurrency', type=int, default=4, help="clientes en paralelo contra gunicorn")
+    parser.add_argument('--output', help="fichero JSON de resultados (por defecto benchmarks/results/)")
+    parser.add_argument('--compare', help="JSON de una ejecucion anterior para comparar")
+    args = parser.parse_args()
+
+    volumes = {"users": args.users, "planets": args.planets, "characters": args.characters,
+               "vehicles": args.vehicles, "favorites_per_user": args.favorites_per_user}
+    # El mismo perfil que wsgi.py (el que se lanza con --gunicorn)
+    app, db_path = load_app(profile='production')
+    seed(app, **volumes)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "volumes": volumes,
+            "requests_per_route": args.requests,
+        },
+        "results": {},
+    }
+
+    scenarios, _ = build_scenarios(volumes)
+    missing = check_coverage(app, scenarios)
+    if missing:
+        print("AVISO: rutas sin escenario: " + ", ".join(missing))
+
+    driver = TestClientDriver(app)
+    report["results"]["test_client"] = {s.rule: run_scenario(driver, s, args.requests) for s in scenarios}
+    print_table("test_client", report["results"]["test_client"])
+
+    if args.gunicorn:
+        scenarios, _ = build_scenarios(volumes)
+        process, port = start_gunicorn(db_path, args.workers, args.worker_class)
+        try:
+            driver = HTTPDriver("127.0.0.1", port)
+            mode = f"gunicorn_{args.workers}w"
+            report["meta"]["gunicorn"] = {"workers": args.workers, "worker_class": args.worker_class,
+                                          "concurrency": args.concurrency}
+            report["results"][mode] = {s.rule: run_scenario(driver, s, args.requests, args.concurrency)
+                                       for s in scenarios}
+            print_table(mode, report["results"][mode])
+        finally:
+            process.terminate()
+            process.wait()
+
+    output = args.output
+    if output is None:
+        os.makedirs(os.path.join(ROOT, 'benchmarks', 'results'), exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'benchmarks', 'results', f"{stamp}-{report['meta']['commit'] or 'local'}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,16 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # El indice de busqueda (FTS5 en SQLite, GIN en PostgreSQL) no esta en los
+    # modelos: lo crea su migracion y autogenerate no debe borrarlo
+    if type_ == 'table' and name.startswith('catalog_search'):
+        return False
+    if type_ == 'index' and name.endswith('_search'):
+        return False
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -93,10 +103,16 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # pool.py activa foreign_keys en cada conexion, pero batch_alter_table recrea
+            # las tablas con DROP TABLE: con las claves ajenas activas borraria en cascada
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
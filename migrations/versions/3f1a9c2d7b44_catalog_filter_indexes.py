@@ -0,0 +1,32 @@
+"""catalog filter indexes
+
+Revision ID: 3f1a9c2d7b44
+Revises: c49edce8b016
+Create Date: 2026-10-16 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a9c2d7b44'
+down_revision = 'c49edce8b016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_planet_terrain'), 'planet', ['terrain'], unique=False)
+    op.create_index(op.f('ix_planet_population'), 'planet', ['population'], unique=False)
+    op.create_index(op.f('ix_character_height'), 'character', ['height'], unique=False)
+    op.create_index(op.f('ix_character_mass'), 'character', ['mass'], unique=False)
+    op.create_index(op.f('ix_vehicle_model'), 'vehicle', ['model'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_vehicle_model'), table_name='vehicle')
+    op.drop_index(op.f('ix_character_mass'), table_name='character')
+    op.drop_index(op.f('ix_character_height'), table_name='character')
+    op.drop_index(op.f('ix_planet_population'), table_name='planet')
+    op.drop_index(op.f('ix_planet_terrain'), table_name='planet')
@@ -0,0 +1,45 @@
+"""user favorite counts
+
+Revision ID: 5c81f0a2e6d3
+Revises: d7e05a3c91b2
+Create Date: 2026-10-16 23:05:41.218094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c81f0a2e6d3'
+down_revision = 'd7e05a3c91b2'
+branch_labels = None
+depends_on = None
+
+COUNTERS = {
+    'favorite_count': 'id',
+    'favorite_planet_count': 'planet_id',
+    'favorite_character_count': 'character_id',
+    'favorite_vehicle_count': 'vehicle_id',
+}
+
+
+def upgrade():
+    with op.batch_alter_table('user') as batch_op:
+        for counter in COUNTERS:
+            batch_op.add_column(sa.Column(counter, sa.Integer(), server_default='0', nullable=False))
+
+    # Rellena los contadores con los favoritos que ya existen ("user" se cita segun el dialecto)
+    user = sa.table('user', sa.column('id'), *[sa.column(counter) for counter in COUNTERS])
+    favorite = sa.table('favorite', *[sa.column(name) for name in ('user_id', *COUNTERS.values())])
+    op.execute(user.update().values({
+        counter: sa.select(sa.func.count(favorite.c[column]))
+        .where(favorite.c.user_id == user.c.id)
+        .scalar_subquery()
+        for counter, column in COUNTERS.items()
+    }))
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        for counter in reversed(list(COUNTERS)):
+            batch_op.drop_column(counter)
@@ -0,0 +1,37 @@
+"""favorite unique indexes
+
+Revision ID: 8b2e4d61a9f0
+Revises: 3f1a9c2d7b44
+Create Date: 2026-10-16 10:03:17.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d61a9f0'
+down_revision = '3f1a9c2d7b44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Los duplicados existentes impedirian crear los indices unicos: nos quedamos con el mas antiguo
+    for column in ('planet_id', 'character_id', 'vehicle_id'):
+        op.execute(
+            f"DELETE FROM favorite WHERE {column} IS NOT NULL AND id NOT IN "
+            f"(SELECT MIN(id) FROM favorite WHERE {column} IS NOT NULL GROUP BY user_id, {column})"
+        )
+
+    op.create_index('ix_favorite_user_planet', 'favorite', ['user_id', 'planet_id'], unique=True)
+    op.create_index('ix_favorite_user_character', 'favorite', ['user_id', 'character_id'], unique=True)
+    op.create_index('ix_favorite_user_vehicle', 'favorite', ['user_id', 'vehicle_id'], unique=True)
+    op.create_index('ix_favorite_user_created_at', 'favorite', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_favorite_user_created_at', table_name='favorite')
+    op.drop_index('ix_favorite_user_vehicle', table_name='favorite')
+    op.drop_index('ix_favorite_user_character', table_name='favorite')
+    op.drop_index('ix_favorite_user_planet', table_name='favorite')
@@ -0,0 +1,40 @@
+"""entity favorite counts
+
+Revision ID: a4d9c3e7f512
+Revises: 5c81f0a2e6d3
+Create Date: 2026-10-16 23:48:12.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9c3e7f512'
+down_revision = '5c81f0a2e6d3'
+branch_labels = None
+depends_on = None
+
+TABLES = ('planet', 'character', 'vehicle')
+
+
+def upgrade():
+    favorite = sa.table('favorite', sa.column('id'), *[sa.column(f"{table}_id") for table in TABLES])
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('favorite_count', sa.Integer(), server_default='0', nullable=False))
+
+        entity = sa.table(table, sa.column('id'), sa.column('favorite_count'))
+        op.execute(entity.update().values(
+            favorite_count=sa.select(sa.func.count(favorite.c.id))
+            .where(favorite.c[f"{table}_id"] == entity.c.id)
+            .scalar_subquery()
+        ))
+        op.create_index(f'ix_{table}_favorite_count_id', table, ['favorite_count', 'id'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_favorite_count_id', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('favorite_count')
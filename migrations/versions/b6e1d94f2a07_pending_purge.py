@@ -0,0 +1,30 @@
+"""pending purge
+
+Revision ID: b6e1d94f2a07
+Revises: f3c8a1d5e927
+Create Date: 2026-10-17 10:12:31.540218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d94f2a07'
+down_revision = 'f3c8a1d5e927'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pending_purge',
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('claimed_until', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('kind', 'entity_id')
+    )
+
+
+def downgrade():
+    op.drop_table('pending_purge')
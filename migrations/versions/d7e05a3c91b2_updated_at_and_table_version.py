@@ -0,0 +1,42 @@
+"""updated_at and table_version
+
+Revision ID: d7e05a3c91b2
+Revises: 8b2e4d61a9f0
+Create Date: 2026-10-16 11:40:02.771563
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e05a3c91b2'
+down_revision = '8b2e4d61a9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    for name in ('user', 'planet', 'character', 'vehicle'):
+        op.execute(f"INSERT INTO table_version (name, version, updated_at) VALUES ('{name}', 1, CURRENT_TIMESTAMP)")
+
+    # En SQLite no se puede añadir una columna NOT NULL con default no constante:
+    # se añade nullable, se rellena y luego se marca NOT NULL (batch recrea la tabla)
+    for table in ('planet', 'character', 'vehicle', 'favorite'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in ('favorite', 'vehicle', 'character', 'planet'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
+    op.drop_table('table_version')
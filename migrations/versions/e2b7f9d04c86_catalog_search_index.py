@@ -0,0 +1,64 @@
+"""catalog search index
+
+Revision ID: e2b7f9d04c86
+Revises: a4d9c3e7f512
+Create Date: 2026-10-17 00:31:27.905346
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7f9d04c86'
+down_revision = 'a4d9c3e7f512'
+branch_labels = None
+depends_on = None
+
+# tabla -> (codigo en el rowid de FTS5, columnas buscables ademas de name); igual que src/search.py
+SEARCHABLE = {
+    'planet': (1, ('climate', 'terrain')),
+    'character': (2, ()),
+    'vehicle': (3, ('model',)),
+}
+
+
+def _extra(prefix, columns):
+    return " || ' ' || ".join(f"{prefix}{column}" for column in columns) if columns else "''"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE catalog_search USING fts5("
+                   "name, extra, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')")
+        for table, (code, columns) in SEARCHABLE.items():
+            insert = (f"INSERT INTO catalog_search (rowid, name, extra) "
+                      f"VALUES (new.id * 4 + {code}, new.name, {_extra('new.', columns)});")
+            delete = f"DELETE FROM catalog_search WHERE rowid = old.id * 4 + {code};"
+            watched = ", ".join(('name',) + columns)
+            op.execute(f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END")
+            op.execute(f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END")
+            op.execute(f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF {watched} ON {table} "
+                       f"BEGIN {delete} {insert} END")
+            op.execute(f"INSERT INTO catalog_search (rowid, name, extra) "
+                       f"SELECT id * 4 + {code}, name, {_extra('', columns)} FROM {table}")
+
+    elif dialect == 'postgresql':
+        for table, (_, columns) in SEARCHABLE.items():
+            vector = "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+            if columns:
+                vector += f" || setweight(to_tsvector('simple', {_extra('', columns)}), 'B')"
+            op.execute(f"CREATE INDEX ix_{table}_search ON {table} USING gin (({vector}))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for table in SEARCHABLE:
+            for action in ('insert', 'delete', 'update'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{action}")
+        op.execute("DROP TABLE IF EXISTS catalog_search")
+
+    elif dialect == 'postgresql':
+        for table in SEARCHABLE:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search")
@@ -0,0 +1,49 @@
+"""favorite cascade deletes
+
+Revision ID: f3c8a1d5e927
+Revises: e2b7f9d04c86
+Create Date: 2026-10-17 00:21:44.108356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d5e927'
+down_revision = 'e2b7f9d04c86'
+branch_labels = None
+depends_on = None
+
+# columna de favorite -> tabla a la que apunta
+FOREIGN_KEYS = {'user_id': 'user', 'planet_id': 'planet', 'character_id': 'character', 'vehicle_id': 'vehicle'}
+# En SQLite las claves ajenas de la tabla inicial no tienen nombre: batch les da este al reflejarlas
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _recreate_foreign_keys(ondelete):
+    existing = {fk['constrained_columns'][0]: fk['name']
+                for fk in sa.inspect(op.get_bind()).get_foreign_keys('favorite')}
+    with op.batch_alter_table('favorite', naming_convention=NAMING_CONVENTION) as batch_op:
+        for column, table in FOREIGN_KEYS.items():
+            name = existing.get(column) or f"fk_favorite_{column}_{table}"
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    # SQLite no comprobaba las claves ajenas: favoritos de filas ya borradas harian fallar la copia
+    for column, table in FOREIGN_KEYS.items():
+        op.execute(
+            f'DELETE FROM favorite WHERE {column} IS NOT NULL AND {column} NOT IN (SELECT id FROM "{table}")'
+        )
+
+    _recreate_foreign_keys('CASCADE')
+    for column in ('planet_id', 'character_id', 'vehicle_id'):
+        op.create_index(f'ix_favorite_{column}', 'favorite', [column], unique=False)
+
+
+def downgrade():
+    for column in ('vehicle_id', 'character_id', 'planet_id'):
+        op.drop_index(f'ix_favorite_{column}', table_name='favorite')
+    _recreate_foreign_keys(None)
@@ -1,21 +1,312 @@
+"""
+Flask-Admin views that stay usable on large tables:
+
+- Counts: above ADMIN_EXACT_COUNT_LIMIT rows the list shows an estimate
+  (pg_class.reltuples on PostgreSQL, information_schema on MySQL, a cached
+  COUNT(*) elsewhere) and a previous/next pager instead of numbered pages.
+- Paging: in the default order (by id) the previous/next links carry the
+  first/last id of the page (?after= / ?before=), so deep pages seek on the
+  primary key instead of OFFSET.
+- Only the listed columns are loaded, and the relations shown in the
+  Favorite list come in the same query with just the column displayed.
+- Search and sorting are limited to indexed columns, and search is a
+  prefix range (name >= 'x' AND name < 'x\\U0010ffff') that uses the index.
+- The list and detail pages are read-only: with replicas configured they
+  are read from a replica, not the primary.
+- Deletes go through the same code as the API (purge.remove and
+  favorites.batch_remove), so the favorite counters stay in step and rows
+  with many favorites are purged in the background.
+"""
 import os
+from flask import g, request, flash
 from flask_admin import Admin
-from models import db, User, Planet, Vehicle, Character, Favorite
+from flask_admin.babel import gettext
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import load_only, joinedload
+from models import db, User, Planet, Vehicle, Character, Favorite
+from cache import catalog_cache
+from favorites import FAVORITE_KINDS, batch_remove
+from purge import MODELS, remove
+
+EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', 100000))
+
+# Estimacion del numero de filas sin recorrer la tabla
+ESTIMATE_QUERIES = {
+    'postgresql': "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)",
+    'mysql': "SELECT table_rows FROM information_schema.tables "
+             "WHERE table_schema = DATABASE() AND table_name = :table",
+}
+
+# Vistas de Flask-Admin que solo leen
+READ_VIEWS = ('index_view', 'details_view')
+
+
+def is_indexed(column):
+    if column.primary_key or column.index or column.unique:
+        return True
+    # Tambien vale un indice compuesto que empiece por la columna
+    return any(next(iter(index.columns)) is column for index in column.table.indexes)
+
+
+class ListState:
+    """Lo que necesitan los enlaces del pager despues de cargar una pagina."""
+
+    def __init__(self, view_args):
+        self.view_args = view_args
+        self.estimated = False
+        self.first_id = None
+        self.last_id = None
+
+
+class ScalableModelView(ModelView):
+    """ModelView con conteos estimados, paginacion por clave y proyeccion de columnas.
+
+    `column_related` indica, para cada relacion de `column_list`, la columna
+    del modelo relacionado que se muestra: se carga con un JOIN en la misma query.
+    """
+
+    column_related = {}
+    column_auto_select_related = False
+    exact_count_limit = EXACT_COUNT_LIMIT
+    page_size = 50
+
+    def __init__(self, model, session, **kwargs):
+        table = model.__table__
+        for name in (self.column_searchable_list or ()) + (self.column_sortable_list or ()):
+            if name in table.columns and not is_indexed(table.columns[name]):
+                raise ValueError(f"{table.name}.{name} no tiene indice: el admin recorreria la tabla entera")
+        self.column_formatters = dict(self.column_formatters or {}, **{
+            name: self._related_formatter(name, column) for name, column in self.column_related.items()
+        })
+        super().__init__(model, session, **kwargs)
+
+    @staticmethod
+    def _related_formatter(name, column):
+        def formatter(view, context, model, attribute):
+            related = getattr(model, name)
+            return getattr(related, column) if related is not None else ''
+        return formatter
+
+    def _handle_view(self, name, **kwargs):
+        if request.method == 'GET' and name in READ_VIEWS:
+            # Igual que @read_only: estas lecturas pueden ir a una replica
+            self.session.info['read_only'] = True
+        return super()._handle_view(name, **kwargs)
+
+    def delete_model(self, model):
+        # El delete_model de Flask-Admin con remove_model en vez de session.delete()
+        try:
+            self.on_model_delete(model)
+            deleted = self.remove_model(model)
+        except Exception as ex:
+            self.session.rollback()
+            if not self.handle_view_exception(ex):
+                flash(gettext('Failed to delete record. %(error)s', error=str(ex)), 'error')
+            return False
+        if deleted:
+            self.after_model_delete(model)
+        return deleted
+
+    def remove_model(self, model):
+        """Borra la fila como DELETE /<coleccion>/<id>; True si se borro o quedo en cola.
+
+        Con session.delete() la BD borraria los favoritos en cascada sin pasar
+        por favorites.py y los contadores quedarian desajustados.
+        """
+        if self.model.__tablename__ not in MODELS:
+            self.session.delete(model)
+            self.session.commit()
+            return True
+        outcome = remove(self.model.__tablename__, model.id)
+        if outcome == 'scheduled':
+            flash(f"{model.id} tiene muchos favoritos: se eliminará en segundo plano", 'info')
+        return outcome is not None
+
+    def list_options(self):
+        columns = self.model.__table__.columns
+        projected = [getattr(self.model, name) for name in self.column_list if name in columns]
+        options = [load_only(*projected)]
+        for name, column in self.column_related.items():
+            relation = getattr(self.model, name)
+            options.append(joinedload(relation).load_only(getattr(relation.property.mapper.class_, column)))
+        return options
+
+    def estimated_count(self):
+        """(filas, estimado): la estimacion solo se usa por encima de exact_count_limit."""
+        table = self.model.__tablename__
+        dialect = self.session.get_bind().dialect.name
+        key = f"admin:count:{table}"
+        if dialect in ESTIMATE_QUERIES:
+            name = f'"{table}"' if dialect == 'postgresql' else table
+            estimate = self.session.execute(text(ESTIMATE_QUERIES[dialect]), {"table": name}).scalar()
+        else:
+            cached = catalog_cache.get(key)
+            estimate = int(cached) if cached is not None and cached.isdigit() else None
+
+        # reltuples es -1 si la tabla nunca se ha analizado
+        if estimate is not None and estimate >= self.exact_count_limit:
+            return int(estimate), True
+
+        count = self.get_count_query().scalar()
+        if dialect not in ESTIMATE_QUERIES:
+            catalog_cache.set(key, b"%d" % count)
+        return count, False
+
+    def _get_list_extra_args(self):
+        view_args = super()._get_list_extra_args()
+        # El cursor no se arrastra a los enlaces de ordenar, buscar, etc.
+        cursor = {name: view_args.extra_args.pop(name) for name in ('after', 'before') if name in view_args.extra_args}
+        g._admin_cursor = {name: int(value) for name, value in cursor.items() if value.lstrip('-').isdigit()}
+        g._admin_list = ListState(view_args)
+        return view_args
+
+    def _get_list_url(self, view_args):
+        url = super()._get_list_url(view_args)
+        state = g.get('_admin_list')
+        if state is None or state.last_id is None or not self._same_list(view_args, state.view_args):
+            return url
+
+        current = state.view_args.page or 0
+        if view_args.page == current + 1:
+            cursor = f"after={state.last_id}"
+        elif view_args.page and view_args.page == current - 1:
+            cursor = f"before={state.first_id}"
+        else:
+            return url
+        return url + ('&' if '?' in url else '?') + cursor
+
+    @staticmethod
+    def _same_list(a, b):
+        fields = ('page_size', 'sort', 'sort_desc', 'search', 'filters', 'extra_args')
+        return all(getattr(a, name) == getattr(b, name) for name in fields)
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        # Prefijo de la busqueda completa como rango: usa el indice en cualquier base
+        # (ILIKE '%x%' de Flask-Admin obliga a recorrer la tabla). Distingue mayusculas
+        term = search.strip()
+        if not term:
+            return query, count_query, joins, count_joins
+        condition = or_(*[and_(field >= term, field < term + '\U0010ffff') for field, _ in self._search_fields])
+        query = query.filter(condition)
+        if count_query is not None:
+            count_query = count_query.filter(condition)
+        return query, count_query, joins, count_joins
+
+    def _apply_keyset(self, query, page, page_size):
+        pk = getattr(self.model, self._primary_key)
+        cursor = g.get('_admin_cursor') or {}
+        if 'after' in cursor:
+            return query.filter(pk > cursor['after']).order_by(pk).limit(page_size), False
+        if 'before' in cursor:
+            return query.filter(pk < cursor['before']).order_by(pk.desc()).limit(page_size), True
+        # Primera pagina o salto directo a una pagina: OFFSET
+        return self._apply_pagination(query.order_by(pk), page, page_size), False
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        page_size = page_size if page_size is not None else self.page_size
+        joins, count_joins = {}, {}
+        query = self.get_query().options(*self.list_options())
+
+        searching = bool(self._search_supported and search)
+        filtering = bool(filters and self._filters)
+        count, estimated = self.estimated_count()
+        # Con busqueda o filtros solo se cuenta en tablas pequeñas; si no, pager anterior/siguiente
+        count_query = self.get_count_query() if (searching or filtering) and not estimated else None
+
+        if searching:
+            query, count_query, joins, count_joins = self._apply_search(query, count_query, joins, count_joins, search)
+        if filtering:
+            query, count_query, joins, count_joins = self._apply_filters(query, count_query, joins, count_joins, filters)
+        if searching or filtering:
+            count = count_query.scalar() if count_query is not None else None
+
+        reverse = False
+        if sort_column is None and not self.column_default_sort and page_size:
+            query, reverse = self._apply_keyset(query, page, page_size)
+        else:
+            query, joins = self._apply_sorting(query, joins, sort_column, sort_desc)
+            query = self._apply_pagination(query, page, page_size)
+
+        if not execute:
+            return count, query
+
+        rows = query.all()
+        if reverse:
+            rows.reverse()
+
+        state = g.get('_admin_list')
+        if state is not None:
+            state.estimated = estimated
+            if rows and sort_column is None:
+                state.first_id = getattr(rows[0], self._primary_key)
+                state.last_id = getattr(rows[-1], self._primary_key)
+        return count, rows
+
+    def render(self, template, **kwargs):
+        state = g.get('_admin_list')
+        if template == self.list_template and state is not None and state.estimated and kwargs.get('count'):
+            # Con un conteo estimado no hay paginas numeradas: anterior/siguiente
+            kwargs.update(count=f"~{kwargs['count']:,}", num_pages=None)
+        return super().render(template, **kwargs)
+
+
+class UserView(ScalableModelView):
+    column_list = ('id', 'email', 'first_name', 'last_name', 'is_active', 'favorite_count')
+    column_searchable_list = ('email',)
+    column_sortable_list = ('id', 'email')
+
+
+class PlanetView(ScalableModelView):
+    column_list = ('id', 'name', 'climate', 'terrain', 'population', 'favorite_count')
+    column_searchable_list = ('name', 'climate')
+    column_sortable_list = ('id', 'name', 'terrain', 'population', 'favorite_count')
+
+
+class CharacterView(ScalableModelView):
+    column_list = ('id', 'name', 'gender', 'height', 'mass', 'favorite_count')
+    column_searchable_list = ('name', 'gender')
+    column_sortable_list = ('id', 'name', 'height', 'mass', 'favorite_count')
+
+
+class VehicleView(ScalableModelView):
+    column_list = ('id', 'name', 'model', 'cargo_capacity', 'length', 'favorite_count')
+    column_searchable_list = ('name', 'model')
+    column_sortable_list = ('id', 'name', 'model', 'favorite_count')
+
+
+class FavoriteView(ScalableModelView):
+    column_list = ('id', 'user', 'planet', 'character', 'vehicle', 'created_at')
+    column_related = {'user': 'email', 'planet': 'name', 'character': 'name', 'vehicle': 'name'}
+    column_sortable_list = ('id',)
+
+    def remove_model(self, model):
+        # Como DELETE /users/<id>/favorites/batch: el favorito y sus contadores en una transaccion
+        for kind, (_, column, _) in FAVORITE_KINDS.items():
+            entity_id = getattr(model, column.key)
+            if entity_id is not None:
+                result = batch_remove(model.user_id, [{"type": kind, "id": entity_id}])
+                self.session.commit()
+                return result["deleted"] == 1
+        self.session.delete(model)
+        self.session.commit()
+        return True
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
+
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
-    admin.add_view(ModelView(Planet, db.session))
-    admin.add_view(ModelView(Vehicle, db.session))
-    admin.add_view(ModelView(Character, db.session))
-    admin.add_view(ModelView(Favorite, db.session))
-    
-   
+    # (ScalableModelView en vez de ModelView: las tablas de produccion son grandes)
+    admin.add_view(UserView(User, db.session))
+    admin.add_view(PlanetView(Planet, db.session))
+    admin.add_view(VehicleView(Vehicle, db.session))
+    admin.add_view(CharacterView(Character, db.session))
+    admin.add_view(FavoriteView(Favorite, db.session))
+
+
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(ScalableModelView(YourModelName, db.session))
@@ -2,53 +2,220 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, abort
-from flask_migrate import Migrate
-from flask_swagger import swagger
+from flask import Flask, Blueprint, request, jsonify, abort, current_app
 from flask_cors import CORS
+from sqlalchemy import select, Integer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, joinedload, configure_mappers
 from utils import APIException, generate_sitemap
-from admin import setup_admin
+from commands import setup_commands
 from models import db, User, Planet, Character, Vehicle, Favorite
+from queries import paginate_popular, parse_int, parse_list_args, build_list_query, page_from_rows, public_row_query
+from cache import catalog_cache, CACHED_TABLES, metrics_collector as cache_metrics
+from http_cache import conditional, table_validator, favorites_validator, table_version
+from steps import executed, run
+from bulk import bulk_create, MAX_CHUNK_SIZE
+from schemas import USER_SCHEMA, PLANET_SCHEMA, CHARACTER_SCHEMA, VEHICLE_SCHEMA, INTEGER_RANGES
+from export import export_response
+from search import search
+from favorites import (add_favorite, favorites_summary,
+                       batch_add, batch_remove, MAX_BATCH_SIZE)
+from json_provider import init_json_provider
+from compression import init_compression, precompress_as
+from purge import init_purge, remove
+from write_behind import init_write_behind, QueueFull
+from profiling import init_profiling, metrics
+from pool import engine_options_from_env, metrics_collector as pool_metrics, dispose_after_fork
+from replicas import init_replicas, read_only
 #from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+api = Blueprint('api', __name__)
+
+# Herramientas que se cargan segun el perfil (APP_PROFILE). Cada una se puede
+# forzar con <NOMBRE>_ENABLED=1/0; si esta desactivada ni se importa su paquete
+PROFILES = {
+    # flask run / flask db: admin, migraciones y /swagger.json
+    'development': {'ADMIN': True, 'MIGRATE': True, 'SWAGGER': True},
+    # wsgi.py / asgi.py: solo la API, los workers arrancan antes
+    'production': {'ADMIN': False, 'MIGRATE': False, 'SWAGGER': False},
+}
+
+metrics.add_collector('cache', cache_metrics)
+
+
+def tool_enabled(profile, name):
+    value = os.getenv(f"{name}_ENABLED")
+    return PROFILES[profile][name] if value is None else value == '1'
+
+
+def create_app(profile=None):
+    """Crea la app con el perfil `profile` (por defecto APP_PROFILE o development)."""
+    profile = profile or os.getenv('APP_PROFILE', 'development')
+    if profile not in PROFILES:
+        raise ValueError(f"APP_PROFILE desconocido: {profile}")
+
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.config['APP_PROFILE'] = profile
+    init_json_provider(app)
+
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    db.init_app(app)
+    replicas = init_replicas(app)
+    init_profiling(app)
+    init_compression(app)
+    init_write_behind(app)
+    init_purge(app)
+
+    # Engines por etiqueta (primary, el nombre del bind o replicaN) para las metricas del pool
+    def database_engines():
+        with app.app_context():
+            engines = {key or 'primary': engine for key, engine in db.engines.items()}
+        if replicas is not None:
+            engines.update(replicas.engines)
+        return engines
+
+    metrics.add_collector('pool', pool_metrics(database_engines))
+    dispose_after_fork('app', database_engines)
+    CORS(app)
+    setup_commands(app)
+
+    if tool_enabled(profile, 'MIGRATE'):
+        # flask_migrate importa alembic entero: solo hace falta para `flask db`
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    if tool_enabled(profile, 'ADMIN'):
+        from admin import setup_admin
+        setup_admin(app)
+    if tool_enabled(profile, 'SWAGGER'):
+        app.add_url_rule('/swagger.json', 'swagger', swagger_spec)
+
+    app.register_blueprint(api)
+    return app
+
+
+# Listados del catalogo que warm_up deja en cache
+WARM_LISTS = ((Planet, '/planets'), (Character, '/characters'), (Vehicle, '/vehicles'))
+
+
+def warm_up(app):
+    """Trabajo de arranque para hacer una vez antes de los forks (gunicorn_config.py):
+    mappers configurados, sitemap y primera pagina del catalogo en cache. Las
+    conexiones abiertas se cierran para que los workers no hereden ninguna."""
+    configure_mappers()
+    with app.test_request_context('/'):
+        generate_sitemap(app)
+    # list_response y no el test client: ni metricas HTTP ni log de peticiones en el master
+    for model, path in WARM_LISTS:
+        with app.test_request_context(path):
+            run(list_response(model))
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+# GET /swagger.json - Especificacion generada desde los docstrings (flask_swagger se importa al pedirla)
+def swagger_spec():
+    from flask_swagger import swagger
+    return jsonify(swagger(current_app)), 200
 
 # Handle/serialize errors like a JSON object
-@app.errorhandler(APIException)
+@api.app_errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
+# Respuesta comun de los listados: ?after=&limit=&fields= y filtros
+# El id para pedir la siguiente pagina va en la cabecera X-Next-After
+# Las paginas del catalogo se sirven desde cache ya serializadas
+# Esta y las vistas GET de abajo son pasos (steps.py): asgi.py las ejecuta en async
+def list_response(model):
+    table = model.__tablename__
+    cacheable = table in CACHED_TABLES
+    list_args = parse_list_args(model, request.args)
+    # La version se lee antes que la pagina: la entrada nunca es mas vieja que su clave
+    key = catalog_cache.list_key(table, (yield from table_version(table)), list_args) if cacheable else None
+    entry = catalog_cache.get_page(key) if cacheable else None
+
+    if entry is None:
+        statement, fields, limit = build_list_query(model, list_args)
+        items, next_after = page_from_rows((yield statement).all(), fields, limit)
+        entry = (jsonify(items).get_data(), next_after)
+        if cacheable:
+            catalog_cache.set_page(key, *entry)
+
+    if cacheable:
+        precompress_as(key)
+
+    body, next_after = entry
+    response = current_app.response_class(body, mimetype='application/json')
+    if next_after is not None:
+        response.headers['X-Next-After'] = str(next_after)
+    return response, 200
+
+# Ranking de favoritos: ?limit= y ?after=<favoritos>:<id> (cursor en X-Next-After)
+def popular_response(model):
+    items, next_after = paginate_popular(model, request.args)
+    response = jsonify(items)
+    if next_after is not None:
+        response.headers['X-Next-After'] = next_after
+    return response, 200
+
+# Detalle de planeta/personaje/vehiculo pasando por la cache; None si no existe
+def cached_detail(model, entity_id):
+    table = model.__tablename__
+    key = catalog_cache.entity_key(table, (yield from table_version(table)), entity_id)
+    body = catalog_cache.get(key)
+
+    if body is None:
+        row = (yield public_row_query(model, entity_id)).first()
+        if row is None:
+            return None
+        body = jsonify(dict(zip(model.public_fields, row))).get_data()
+        catalog_cache.set(key, body)
+
+    precompress_as(key)
+    return current_app.response_class(body, mimetype='application/json')
+
+# GET /cache/stats - Contadores de la cache para monitorizacion
+@api.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(catalog_cache.stats()), 200
+
+# GET /metrics - Metricas por ruta en formato texto de Prometheus
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # generate sitemap with all your endpoints
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
 
 # GET /users - Obtener todos los usuarios
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('user'))
 def get_users():
-    users = User.query.all()
-    users_to_json = jsonify([user.serialize() for user in users]), 200
-    return users_to_json
+    return (yield from list_response(User))
 
 
 # GET /users - Obtener por ID
 
-@app.route('/users/<int:user_id>', methods=['GET'])
+@api.route('/users/<int:user_id>', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('user'))
 def get_user_by_id(user_id):
-    user = User.query.get(user_id)
+    user = (yield select(User).where(User.id == user_id)).scalar()
     if user is None:
        abort(404, description=f"Usuario con id {user_id} no encontrado")
     user_to_json = jsonify(user.serialize())
@@ -57,88 +224,138 @@ def get_user_by_id(user_id):
 
 # GET /planets - Obtener todos los planetas
 
-@app.route('/planets', methods=['GET'])
+@api.route('/planets', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('planet'))
 def get_planets():
-    planets = Planet.query.all()
-    planets_to_json = jsonify([planet.serialize() for planet in planets]), 200
-    return planets_to_json
+    return (yield from list_response(Planet))
+
+# GET /planets/popular - Los planetas con mas favoritos
+
+@api.route('/planets/popular', methods=['GET'])
+@read_only
+def get_popular_planets():
+    return popular_response(Planet)
 
 # GET /planets - Obtener un planeta por ID
 
-@app.route('/planets/<int:planet_id>', methods=['GET'])
+@api.route('/planets/<int:planet_id>', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('planet'))
 def get_planet_by_id(planet_id):
-    planet = Planet.query.get(planet_id)
-    if planet is None:
+    response = yield from cached_detail(Planet, planet_id)
+    if response is None:
         abort(404, description=f"Planeta con id {planet_id} no encontrado")
-    
-    planet_to_json = jsonify(planet.serialize())
-    return planet_to_json, 200
+    return response, 200
 
 
 # GET/ todos los vehículos
-@app.route('/vehicles', methods=['GET'])
+@api.route('/vehicles', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('vehicle'))
 def get_vehicles():
-    all_vehicles = Vehicle.query.all()
-    vehicles_to_json = jsonify([vehicle.serialize() for vehicle in all_vehicles]), 200
-    
-    return vehicles_to_json
+    return (yield from list_response(Vehicle))
+
+
+# GET /vehicles/popular - Los vehículos con mas favoritos
+@api.route('/vehicles/popular', methods=['GET'])
+@read_only
+def get_popular_vehicles():
+    return popular_response(Vehicle)
 
 
 # GET  vehículo por ID
-@app.route('/vehicles/<int:vehicle_id>', methods=['GET'])
+@api.route('/vehicles/<int:vehicle_id>', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('vehicle'))
 def get_vehicle_by_id(vehicle_id):
-    vehicle = Vehicle.query.get(vehicle_id)
-    
-    if vehicle is None:
-        
+    response = yield from cached_detail(Vehicle, vehicle_id)
+    if response is None:
         abort(404, description=f"Vehículo con id {vehicle_id} no encontrado")
-    
-    vehicle_to_json = jsonify(vehicle.serialize())
-    return vehicle_to_json, 200
+    return response, 200
 
 # GET / personajes
-@app.route('/characters', methods=['GET'])
+@api.route('/characters', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('character'))
 def get_characters():
-    all_characters = Character.query.all()
-    characters_to_json = jsonify([character.serialize() for character in all_characters]), 200
-    
-    return characters_to_json
+    return (yield from list_response(Character))
+
+
+# GET /characters/popular - Los personajes con mas favoritos
+@api.route('/characters/popular', methods=['GET'])
+@read_only
+def get_popular_characters():
+    return popular_response(Character)
 
 
 # GET personaje por ID
-@app.route('/characters/<int:character_id>', methods=['GET'])
+@api.route('/characters/<int:character_id>', methods=['GET'])
+@read_only
+@executed
+@conditional(table_validator('character'))
 def get_character_by_id(character_id):
-    character = Character.query.get(character_id)
-    
-    if character is None:
+    response = yield from cached_detail(Character, character_id)
+    if response is None:
         abort(404, description=f"Personaje con id {character_id} no encontrado")
-    
-    character_to_json = jsonify(character.serialize())
-    return character_to_json, 200
+    return response, 200
+
+# GET /search?q= - Busqueda por prefijo en planetas, personajes y vehiculos
+# ?type=planet,vehicle para acotar, ?limit= y ?offset= (posicion en el ranking, no un
+# cursor por id como el ?after= de los listados; la siguiente en X-Next-Offset)
+@api.route('/search', methods=['GET'])
+@read_only
+def search_catalog():
+    items, next_offset = search(request.args)
+    response = jsonify(items)
+    if next_offset is not None:
+        response.headers['X-Next-Offset'] = str(next_offset)
+    return response, 200
+
+# GET /<collection>/export - Volcado completo en streaming
+# ?format=ndjson (por defecto) o ?format=json (array JSON enviado por trozos)
+
+EXPORTABLE = {
+    'planets': Planet,
+    'characters': Character,
+    'vehicles': Vehicle,
+    'favorites': Favorite,
+}
+
+@api.route('/<collection>/export', methods=['GET'])
+@read_only
+def export_collection(collection):
+    model = EXPORTABLE.get(collection)
+    if model is None:
+        abort(404, description=f"La coleccion {collection} no se puede exportar")
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        abort(400, description="format debe ser ndjson o json")
+    return export_response(model, fmt)
 
 # POST /USER - crear usuario
 
-@app.route('/users', methods=['POST'])
+@api.route('/users', methods=['POST'])
 def create_user():
     body = request.get_json()
     if body is None:
         abort(400, description="El body no puede estar vacio")
 
-    required_fields = ['email', 'password', 'first_name', 'last_name']
-    for field in required_fields:
-        if field not in body or not body[field]:
-            abort(422, description=f"el campo {field} es obligatorio")
+    # 422 con todos los errores antes de tocar la base de datos
+    fields = USER_SCHEMA.load(body)
 
-    user_exists = User.query.filter_by(email=body['email']).first()
+    user_exists = User.query.filter_by(email=fields['email']).first()
     if user_exists:
         abort(400, description="El email ya está registrado")
 
     try:
-        new_user = User()
-        new_user.email=body['email']
-        new_user.password=body['password']
-        new_user.first_name=body['first_name']  
-        new_user.last_name=body['last_name']
+        new_user = User(**fields)
         new_user.is_active = True
 
         db.session.add(new_user)
@@ -146,6 +363,10 @@ def create_user():
 
         return jsonify(new_user.serialize()), 201
 
+    except IntegrityError:
+        db.session.rollback()
+        abort(400, description="El email ya está registrado")
+
     except Exception as e:
         db.session.rollback()
         print(f"Error real: {e}")
@@ -156,26 +377,27 @@ def create_user():
         
 # POST /planets - Crear un nuevo planeta
 
-@app.route('/planets', methods=['POST'])
+@api.route('/planets', methods=['POST'])
 def create_planet():
     body = request.get_json()
     
     if body is None:
         abort(400, description="El body no puede estar vacio")
     
+    fields = PLANET_SCHEMA.load(body)
+
     try:
-        new_planet = Planet()
-        
-        new_planet.name = body['name']
-        new_planet.climate = body['climate']
-        new_planet.terrain = body['terrain']
-        new_planet.population = body['population']
+        new_planet = Planet(**fields)
     
         db.session.add(new_planet)
         db.session.commit()
 
         return jsonify(new_planet.serialize()), 201
 
+    except IntegrityError:
+        db.session.rollback()
+        abort(400, description="Ya existe un planeta con ese name o climate")
+
     except Exception as e:
         db.session.rollback()
         abort(500, description="Error al crear el planeta")
@@ -183,26 +405,27 @@ def create_planet():
 
 # POST /vehicles - Crear un nuevo vehiculo
 
-@app.route('/vehicles', methods=['POST'])
+@api.route('/vehicles', methods=['POST'])
 def create_vehicle():
     body = request.get_json()
     
     if body is None:
         abort(400, description="El body no puede estar vacio")
     
+    fields = VEHICLE_SCHEMA.load(body)
+
     try:
-        new_vehicle = Vehicle()
-        
-        new_vehicle.name = body['name']
-        new_vehicle.cargo_capacity = body['cargo_capacity']
-        new_vehicle.length = body['length']
-        new_vehicle.model = body['model']
+        new_vehicle = Vehicle(**fields)
     
         db.session.add(new_vehicle)
         db.session.commit()
 
         return jsonify(new_vehicle.serialize()), 201
 
+    except IntegrityError:
+        db.session.rollback()
+        abort(400, description="Ya existe un vehiculo con ese name")
+
     except Exception as e:
         db.session.rollback()
         abort(500, description="Error al crear el vehiculo")
@@ -210,114 +433,101 @@ def create_vehicle():
 
 # POST /character - Crear un nuevo character
 
-@app.route('/characters', methods=['POST'])
+@api.route('/characters', methods=['POST'])
 def create_character():
     body = request.get_json()
     
     if body is None:
         abort(400, description="El body no puede estar vacio")
     
+    fields = CHARACTER_SCHEMA.load(body)
+
     try:
-        new_character = Character()
-        
-        new_character.name = body['name']
-        new_character.gender = body['gender']
-        new_character.height = body['height']
-        new_character.mass = body['mass']
+        new_character = Character(**fields)
     
         db.session.add(new_character)
         db.session.commit()
 
         return jsonify(new_character.serialize()), 201
 
+    except IntegrityError:
+        db.session.rollback()
+        abort(400, description="Ya existe un personaje con ese name o gender")
+
     except Exception as e:
         db.session.rollback()
         abort(500, description="Error al crear el personaje")
 
 
 
-# DELETE user
+# POST /planets/bulk, /vehicles/bulk, /characters/bulk - Carga masiva
+# Body: array JSON o NDJSON (Content-Type: application/x-ndjson)
+# ?chunk_size= filas por INSERT/transaccion
 
-    
-@app.route('/users/<int:user_id>', methods=['DELETE'])
-def delete_user(user_id):
-    user = User.query.get(user_id)
+@api.route('/planets/bulk', methods=['POST'])
+def bulk_create_planets():
+    chunk_size = parse_int(request.args, 'chunk_size', minimum=1, maximum=MAX_CHUNK_SIZE)
+    return jsonify(bulk_create(Planet, chunk_size)), 200
 
-    if user is None:
-       abort(404, description=f"Usuario con id {user_id} no encontrado")
 
-    try:
-        
-        db.session.delete(user)
-        db.session.commit()
-        return jsonify({"msg": f"Usuario {user_id} eliminado con éxito"}), 200
+@api.route('/vehicles/bulk', methods=['POST'])
+def bulk_create_vehicles():
+    chunk_size = parse_int(request.args, 'chunk_size', minimum=1, maximum=MAX_CHUNK_SIZE)
+    return jsonify(bulk_create(Vehicle, chunk_size)), 200
 
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error: {e}")
-        abort(500, description="Error al eliminar usuario")
 
+@api.route('/characters/bulk', methods=['POST'])
+def bulk_create_characters():
+    chunk_size = parse_int(request.args, 'chunk_size', minimum=1, maximum=MAX_CHUNK_SIZE)
+    return jsonify(bulk_create(Character, chunk_size)), 200
 
-# DELETE planet
 
-@app.route('/planets/<int:planet_id>', methods=['DELETE'])
-def delete_planet(planet_id):
-    planet = Planet.query.get(planet_id)
-
-    if planet is None:
-       abort(404, description=f"Planeta con id {planet_id} no encontrado")
 
-    try:
-        db.session.delete(planet)
-        db.session.commit()
-        return jsonify({"msg": f"Planeta {planet_id} eliminado con éxito"}), 200
+# DELETE user
 
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error: {e}")
-        abort(500, description="Error al eliminar el planeta")
+    
+@api.route('/users/<int:user_id>', methods=['DELETE'])
+def delete_user(user_id):
+    return delete_response('user', user_id, "Usuario")
 
 
-# DELETE vehicle
+# DELETE planet
 
-@app.route('/vehicles/<int:vehicle_id>', methods=['DELETE'])
-def delete_vehicle(vehicle_id):
-    # Recuerda: Usamos Vehicles (mayúscula y plural) por tu models.py
-    vehicle = Vehicle.query.get(vehicle_id)
+@api.route('/planets/<int:planet_id>', methods=['DELETE'])
+def delete_planet(planet_id):
+    return delete_response('planet', planet_id, "Planeta")
 
-    if vehicle is None:
-       abort(404, description=f"Vehículo con id {vehicle_id} no encontrado")
 
-    try:
-        db.session.delete(vehicle)
-        db.session.commit()
-        return jsonify({"msg": f"Vehículo {vehicle_id} eliminado con éxito"}), 200
+# DELETE vehicle
 
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error: {e}")
-        abort(500, description="Error al eliminar el vehículo")
+@api.route('/vehicles/<int:vehicle_id>', methods=['DELETE'])
+def delete_vehicle(vehicle_id):
+    return delete_response('vehicle', vehicle_id, "Vehículo")
 
 
 
 # DELETE character
 
-@app.route('/characters/<int:character_id>', methods=['DELETE'])
+@api.route('/characters/<int:character_id>', methods=['DELETE'])
 def delete_character(character_id):
-    character = Character.query.get(character_id)
+    return delete_response('character', character_id, "Personaje")
 
-    if character is None:
-       abort(404, description=f"Personaje con id {character_id} no encontrado")
 
+# Un DELETE por fila (los favoritos se borran en cascada en la BD); con muchos
+# favoritos se contesta 202 y se purga en segundo plano (ver purge.py)
+def delete_response(kind, entity_id, label):
     try:
-        db.session.delete(character)
-        db.session.commit()
-        return jsonify({"msg": f"Personaje {character_id} eliminado con éxito"}), 200
-
+        outcome = remove(kind, entity_id)
     except Exception as e:
         db.session.rollback()
         print(f"Error: {e}")
-        abort(500, description="Error al eliminar el personaje")
+        abort(500, description=f"Error al eliminar {label.lower()} {entity_id}")
+
+    if outcome is None:
+        abort(404, description=f"{label} con id {entity_id} no encontrado")
+    if outcome == 'scheduled':
+        return jsonify({"msg": f"{label} {entity_id} se eliminará en segundo plano"}), 202
+    return jsonify({"msg": f"{label} {entity_id} eliminado con éxito"}), 200
 
 
 
@@ -325,97 +535,158 @@ def delete_character(character_id):
 
 # [POST] Añadir characyter Favorito
 
-@app.route('/favorite/character/<int:people_id>', methods=['POST'])
+@api.route('/favorite/character/<int:character_id>', methods=['POST'])
 def add_favorite_character(character_id):
-    body = request.get_json()
-    user_id = body.get("user_id") # El ID del usuario que pulsa el botón
+    user_id, error = favorite_user_id('character', character_id)
+    if error is not None:
+        return error
 
-    if not user_id:
-        return jsonify({"msg": "user_id es obligatorio"}), 400
-
-    exists = Favorite.query.filter_by(user_id=user_id, character_id=character_id).first()
-    if exists: return jsonify({"msg": "Este personaje ya es favorito"}), 400
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind is not None:
+        return queued_favorite_response(write_behind, user_id, 'character', character_id)
 
+    # Sin SELECT previo: el indice unico (user_id, character_id) rechaza el duplicado
     try:
-        
-        character = Character.query.get(character_id)
-        if not character:
-            return jsonify({"msg": "El personaje no existe"}), 404
-
-        new_fav = Favorite(user_id=user_id, character_id=character_id)
-        db.session.add(new_fav)
+        missing = add_favorite(user_id, 'character', character_id)
+        if missing is not None:
+            db.session.rollback()
+            return jsonify({"msg": "El usuario no existe" if missing == 'user' else "El personaje no existe"}), 404
         db.session.commit()
-        
-        return jsonify({"msg": f"Personaje {character.name} añadido a favoritos"}), 201
+
+        return jsonify({"msg": "Personaje añadido a favoritos"}), 201
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "Este personaje ya es favorito"}), 400
 
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
-    
+
 
 
 # [POST] Añadir Vehículo Favorito
 
-@app.route('/favorite/vehicle/<int:vehicle_id>', methods=['POST'])
+@api.route('/favorite/vehicle/<int:vehicle_id>', methods=['POST'])
 def add_favorite_vehicle(vehicle_id):
-    body = request.get_json()
-    user_id = body.get("user_id")
-
-    if not user_id:
-        return jsonify({"msg": "user_id es obligatorio"}), 400
-    
-    exists = Favorite.query.filter_by(user_id=user_id, vehicle_id=vehicle_id).first()
-    if exists: return jsonify({"msg": "Este vehículo ya es favorito"}), 400
+    user_id, error = favorite_user_id('vehicle', vehicle_id)
+    if error is not None:
+        return error
 
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind is not None:
+        return queued_favorite_response(write_behind, user_id, 'vehicle', vehicle_id)
 
     try:
-        
-        new_fav = Favorite(user_id=user_id, vehicle_id=vehicle_id)
-        db.session.add(new_fav)
+        missing = add_favorite(user_id, 'vehicle', vehicle_id)
+        if missing is not None:
+            db.session.rollback()
+            return jsonify({"msg": "El usuario no existe" if missing == 'user' else "El vehículo no existe"}), 404
         db.session.commit()
 
         return jsonify({"msg": "Vehículo añadido a favoritos"}), 201
-    
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "Este vehículo ya es favorito"}), 400
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 # [POST] Añadir planeta Favorito
 
-@app.route('/favorite/planet/<int:planet_id>', methods=['POST'])
+@api.route('/favorite/planet/<int:planet_id>', methods=['POST'])
 def add_favorite_planet(planet_id):
-    body = request.get_json()
-    user_id = body.get("user_id")
-
-    if not user_id:
-        return jsonify({"msg": "user_id es obligatorio"}), 400
-
-    exists = Favorite.query.filter_by(user_id=user_id, planet_id=planet_id).first()
-    if exists: return jsonify({"msg": "Este planeta ya es favorito"}), 400
+    user_id, error = favorite_user_id('planet', planet_id)
+    if error is not None:
+        return error
 
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind is not None:
+        return queued_favorite_response(write_behind, user_id, 'planet', planet_id)
 
     try:
-        
-        new_fav = Favorite(user_id=user_id, planet_id=planet_id)
-        db.session.add(new_fav)
+        missing = add_favorite(user_id, 'planet', planet_id)
+        if missing is not None:
+            db.session.rollback()
+            return jsonify({"msg": "El usuario no existe" if missing == 'user' else "El planeta no existe"}), 404
         db.session.commit()
 
         return jsonify({"msg": "Planeta añadido a favoritos"}), 201
-    
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"msg": "Este planeta ya es favorito"}), 400
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
-    
+
+
+# Con FAVORITES_WRITE_BEHIND=1 los favoritos pasan por la cola de write_behind.py:
+# estado del favorito -> (mensaje, status)
+FAVORITE_NAMES = {'planet': 'planeta', 'character': 'personaje', 'vehicle': 'vehículo'}
+MIN_ID, MAX_ID = INTEGER_RANGES[Integer]
+QUEUED_FAVORITE_RESPONSES = {
+    "created": ("{Name} añadido a favoritos", 201),
+    "queued": ("{Name} se añadirá a favoritos", 202),
+    "duplicate": ("Este {name} ya es favorito", 400),
+    "user_not_found": ("El usuario no existe", 404),
+    "not_found": ("El {name} no existe", 404),
+    "timeout": ("El favorito no se confirmó a tiempo, puede que se guarde más tarde", 503),
+    "error": ("Error al guardar el favorito", 500),
+}
+
+def favorite_user_id(kind, entity_id):
+    """user_id del body (el del usuario que pulsa el botón) como (user_id, None),
+    o (None, respuesta de error). Se valida antes de elegir entre la cola y el
+    INSERT directo, para que el 400/404 no dependa de FAVORITES_WRITE_BEHIND."""
+    body = request.get_json(silent=True)
+    user_id = body.get("user_id") if isinstance(body, dict) else None
+    if user_id is None or user_id == "":
+        return None, (jsonify({"msg": "user_id es obligatorio"}), 400)
+    # bool es un int para Python: tampoco vale
+    if type(user_id) is not int:
+        return None, (jsonify({"msg": "user_id debe ser un entero"}), 400)
+    # Fuera del rango de la columna no puede existir (y PostgreSQL fallaria con un DataError)
+    if not MIN_ID <= user_id <= MAX_ID:
+        return None, (jsonify({"msg": "El usuario no existe"}), 404)
+    if not MIN_ID <= entity_id <= MAX_ID:
+        return None, (jsonify({"msg": f"El {FAVORITE_NAMES[kind]} no existe"}), 404)
+    return user_id, None
+
+
+def queued_favorite_response(write_behind, user_id, kind, entity_id):
+    try:
+        status = write_behind.add(user_id, kind, entity_id)
+    except QueueFull:
+        return jsonify({"msg": "Demasiados favoritos pendientes, reintenta en un momento"}), 503, {"Retry-After": "1"}
+
+    name = FAVORITE_NAMES[kind]
+    message, status_code = QUEUED_FAVORITE_RESPONSES[status]
+    return jsonify({"msg": message.format(name=name, Name=name.capitalize())}), status_code
+
 
 # [GET] Obtener todos los favoritos de un usuario específico    
 
 
-@app.route('/users/<int:user_id>/favorites', methods=['GET'])
+@api.route('/users/<int:user_id>/favorites', methods=['GET'])
+@read_only
+@executed
+@conditional(favorites_validator)
 def get_all_favorites_of_user(user_id):
 
-    user = User.query.get(user_id)
+    # Cargamos usuario, favoritos y sus planetas/personajes/vehiculos en 2 queries
+    # (usuario + favoritos con JOIN) en vez de una query por cada favorito
+    user = (yield select(User).where(User.id == user_id).options(
+        selectinload(User.favorite).options(
+            joinedload(Favorite.planet),
+            joinedload(Favorite.character),
+            joinedload(Favorite.vehicle),
+        )
+    )).scalar()
 
-   
     if user is None:
         abort(404, description=f"Usuario {user_id} no encontrado")
 
@@ -423,7 +694,47 @@ def get_all_favorites_of_user(user_id):
     return jsonify(user.serialize_with_favorites()), 200
 
 
+# [POST] / [DELETE] Varios favoritos de golpe, de cualquier tipo
+# Body: [{"type": "planet", "id": 1}, {"type": "vehicle", "id": 4}, ...]
+# Una sola transaccion; el resultado de cada item va en "results"
+
+def favorites_batch_items(user_id):
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        abort(400, description="El body debe ser un array JSON")
+    if len(items) > MAX_BATCH_SIZE:
+        abort(400, description=f"Como maximo {MAX_BATCH_SIZE} favoritos por peticion")
+    if db.session.get(User, user_id) is None:
+        abort(404, description=f"Usuario {user_id} no encontrado")
+    return items
+
+
+@api.route('/users/<int:user_id>/favorites/batch', methods=['POST'])
+def add_favorites_batch(user_id):
+    result = batch_add(user_id, favorites_batch_items(user_id))
+    db.session.commit()
+    return jsonify(result), 200
+
+
+@api.route('/users/<int:user_id>/favorites/batch', methods=['DELETE'])
+def remove_favorites_batch(user_id):
+    result = batch_remove(user_id, favorites_batch_items(user_id))
+    db.session.commit()
+    return jsonify(result), 200
+
+
+# [GET] Numero de favoritos de un usuario (total y por tipo) leyendo solo su fila
+
+@api.route('/users/<int:user_id>/favorites/summary', methods=['GET'])
+@read_only
+def get_favorites_summary(user_id):
+    summary = favorites_summary(user_id)
+    if summary is None:
+        abort(404, description=f"Usuario {user_id} no encontrado")
+    return jsonify(summary), 200
+
+
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+ASGI entry point (async serving mode), next to wsgi.py:
+
+    uvicorn asgi:application --app-dir src
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker --chdir src
+
+The GET routes whose view is a step function (catalog lists and details,
+users and favorites, see steps.py) run as coroutines on the event loop with
+SQLAlchemy's async engine (aiosqlite / asyncpg), so a slow query no longer
+blocks a whole worker. It is the same view code as under wsgi.py, executed
+with an AsyncSession inside Flask's request context, through the same
+hooks, cache, ETags and error handlers. Every other route is handed to the
+Flask app in a thread.
+
+Needs asgiref, uvicorn and the async driver (aiosqlite for SQLite, asyncpg
+for PostgreSQL), all in the Pipfile.
+"""
+import io
+import os
+import sys
+from flask import request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from app import create_app
+from steps import run_async
+from pool import engine_options_from_env, metrics_collector as pool_metrics, dispose_after_fork
+from profiling import metrics
+from replicas import ReplicaSet
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    raise RuntimeError("El modo ASGI necesita el paquete asgiref (pipenv install asgiref uvicorn)")
+
+# dialecto -> driver async de SQLAlchemy
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def create_async(url, label):
+    """Engine async equivalente al de `url`, con las mismas opciones de pool."""
+    sync_url = make_url(url)
+    driver = ASYNC_DRIVERS.get(sync_url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"El modo ASGI no soporta {sync_url.get_backend_name()} "
+                           f"(drivers async: {', '.join(ASYNC_DRIVERS.values())})")
+    try:
+        return create_async_engine(sync_url.set(drivername=driver),
+                                   **engine_options_from_env(url, pool_label=label, asyncio=True))
+    except ImportError as error:
+        raise RuntimeError(f"El modo ASGI necesita el driver {driver} "
+                           f"(pipenv install {driver.split('+')[1]})") from error
+
+
+# La misma app que wsgi.py: perfil de produccion salvo que APP_PROFILE diga otra cosa
+app = create_app(os.getenv('APP_PROFILE', 'production'))
+
+engine = create_async(app.config['SQLALCHEMY_DATABASE_URI'], 'async_primary')
+replicas = app.extensions.get('replicas')
+if replicas is not None:
+    # Las vistas en pasos son todas de solo lectura: van siempre a una replica
+    replicas = ReplicaSet(replicas.urls, replicas.strategy,
+                          engine_factory=lambda url, label: create_async(url, f"async_{label}"))
+
+
+def async_engines():
+    engines = {'async_primary': engine}
+    if replicas is not None:
+        engines.update((f"async_{label}", replica) for label, replica in replicas.engines.items())
+    return {label: async_engine.sync_engine for label, async_engine in engines.items()}
+
+
+metrics.add_collector('async_pool', pool_metrics(async_engines))
+dispose_after_fork('asgi', async_engines)
+
+
+def wsgi_environ(scope):
+    """Environ WSGI de una peticion ASGI sin cuerpo (solo se usa para GET)."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f"HTTP_{name}"
+        value = value.decode('latin-1')
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def choose_engine():
+    return replicas.choose() if replicas is not None else engine
+
+
+async def dispatch(steps):
+    """full_dispatch_request de Flask con los pasos de la vista ejecutados en async."""
+    try:
+        rv = app.preprocess_request()
+        if rv is None:
+            async with AsyncSession(choose_engine(), expire_on_commit=False) as session:
+                rv = await run_async(steps(**request.view_args), session)
+    except Exception as error:
+        rv = app.handle_user_exception(error)
+    return app.finalize_request(rv)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            for async_engine in [engine, *(replicas.engines.values() if replicas else ())]:
+                await async_engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+wsgi_application = WsgiToAsgi(app)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http' or scope['method'] != 'GET':
+        return await wsgi_application(scope, receive, send)
+
+    ctx = app.request_context(wsgi_environ(scope))
+    ctx.push()
+    try:
+        steps = None
+        if request.routing_exception is None:
+            # Las vistas en pasos (steps.executed) se sirven aqui; el resto, en un thread
+            steps = getattr(app.view_functions[request.url_rule.endpoint], 'steps', None)
+        if steps is not None:
+            try:
+                response = await dispatch(steps)
+            except Exception as error:
+                response = app.handle_exception(error)
+            headers = response.get_wsgi_headers(request.environ)
+            body = b"".join(response.get_app_iter(request.environ))
+            response.close()
+    finally:
+        ctx.pop()
+
+    if steps is None:
+        return await wsgi_application(scope, receive, send)
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': body})
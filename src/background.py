@@ -0,0 +1,39 @@
+"""
+A background thread and its queue, one of each per process.
+
+A thread does not survive a fork: a gunicorn worker forked from a preloaded
+master would inherit the queue but not the thread that drains it. A
+ProcessWorker creates both the first time it is started in each process.
+Used by the write-behind flusher (write_behind.py) and the purger (purge.py).
+"""
+import os
+import queue
+import threading
+
+
+class ProcessWorker:
+    """Thread `target` con su cola `queue`, creados la primera vez que se arranca en cada proceso."""
+
+    def __init__(self, name, target, max_size=0):
+        self.name = name
+        self.target = target
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def running(self):
+        """Si este proceso ya tiene su cola y su thread."""
+        return self._pid == os.getpid()
+
+    def start(self):
+        """Crea cola y thread si este proceso aun no los tiene; True si los ha creado."""
+        if self.running():
+            return False
+        with self._lock:
+            if self.running():
+                return False
+            self.queue = queue.Queue(self.max_size)
+            self.thread = threading.Thread(target=self.target, name=self.name, daemon=True)
+            self._pid = os.getpid()
+            self.thread.start()
+            return True
@@ -0,0 +1,135 @@
+"""
+Bulk creation for the catalog (POST /planets/bulk, /characters/bulk, /vehicles/bulk).
+Accepts a JSON array or an NDJSON stream, validates and inserts in chunks
+(one multi-row INSERT and one transaction per chunk) and reports the result
+of every item without aborting the whole batch on a bad row.
+"""
+import os
+import json
+from itertools import islice
+from flask import request, abort
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from models import db
+from http_cache import bump_versions
+from schemas import CREATE_SCHEMAS
+
+DEFAULT_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+MAX_CHUNK_SIZE = 10000
+
+
+def read_items():
+    """Itera los items del body: NDJSON linea a linea (sin cargarlo entero) o un array JSON."""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+        return
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, list):
+        abort(400, description="El body debe ser un array JSON o NDJSON")
+    yield from body
+
+
+def unique_columns(model):
+    return [column for column in model.__table__.columns if column.unique]
+
+
+def find_conflicts(model, rows):
+    """Indices de `rows` que chocan con filas existentes o con otra fila anterior del mismo chunk.
+    Una query IN por cada columna unica."""
+    conflicts = set()
+    for column in unique_columns(model):
+        values = [row[column.key] for _, row in rows]
+        existing = set(db.session.execute(select(column).where(column.in_(values))).scalars())
+        seen = set()
+        for index, row in rows:
+            value = row[column.key]
+            if value in existing or value in seen:
+                conflicts.add(index)
+            seen.add(value)
+    return conflicts
+
+
+def insert_rows(model, rows):
+    """INSERT multi-fila; devuelve los ids en el mismo orden que `rows`.
+
+    No usamos sort_by_parameter_order: en SQLite obliga a un INSERT por fila.
+    Los ids se emparejan por `name`, que es unico en todo el catalogo.
+    """
+    statement = insert(model).returning(model.id, model.name)
+    ids = {name: new_id for new_id, name in db.session.execute(statement, [row for _, row in rows])}
+    return [ids[row['name']] for _, row in rows]
+
+
+def insert_one_by_one(model, rows, results):
+    # Solo si el INSERT del chunk choca (una carrera con otra escritura):
+    # cada fila en su savepoint para no perder las demas
+    for index, row in rows:
+        try:
+            with db.session.begin_nested():
+                new_id = db.session.execute(insert(model).returning(model.id), [row]).scalar_one()
+            results[index] = {"index": index, "status": "created", "id": new_id}
+        except IntegrityError:
+            results[index] = {"index": index, "status": "conflict"}
+
+
+def process_chunk(model, chunk, offset, results):
+    valid = []
+    for position, item in enumerate(chunk):
+        index = offset + position
+        row, errors = CREATE_SCHEMAS[model].validate(item)
+        if errors:
+            results[index] = {"index": index, "status": "invalid", "errors": errors}
+        else:
+            valid.append((index, row))
+
+    if not valid:
+        return
+
+    conflicts = find_conflicts(model, valid)
+    for index in conflicts:
+        results[index] = {"index": index, "status": "conflict"}
+    to_insert = [(index, row) for index, row in valid if index not in conflicts]
+    if not to_insert:
+        db.session.rollback()
+        return
+
+    try:
+        ids = insert_rows(model, to_insert)
+        for (index, _), new_id in zip(to_insert, ids):
+            results[index] = {"index": index, "status": "created", "id": new_id}
+    except IntegrityError:
+        db.session.rollback()
+        insert_one_by_one(model, to_insert, results)
+
+    # insert() no pasa por el flush del ORM: la version a mano
+    bump_versions(db.session, [model.__tablename__])
+    db.session.commit()
+
+
+def bulk_create(model, chunk_size=None):
+    """Crea en bloque y devuelve el resumen con el resultado de cada item."""
+    chunk_size = min(chunk_size or DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE)
+    results = {}
+    items = read_items()
+    offset = 0
+
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            break
+        process_chunk(model, chunk, offset, results)
+        offset += len(chunk)
+
+    ordered = [results[index] for index in range(offset)]
+    summary = {status: 0 for status in ("created", "conflict", "invalid")}
+    for result in ordered:
+        summary[result["status"]] += 1
+    return {**summary, "results": ordered}
@@ -0,0 +1,330 @@
+"""
+Read-through cache for the catalog (planets, characters, vehicles).
+Stores the already serialized JSON bytes per id and per list page. Every key
+carries the version of its table in `table_version`, read from the database
+in the same request, so a write from any worker or process moves the readers
+to new keys and the old entries just age out. Nothing has to be invalidated,
+and a per-process backend is as correct as a shared one, only colder.
+The backend is chosen with CACHE_BACKEND: memory (per process), sqlite
+(a file shared by every worker on the host) or redis.
+"""
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+CACHED_TABLES = ('planet', 'character', 'vehicle')
+
+
+class CacheBackend:
+    """Interfaz comun de los backends de cache.
+
+    Los valores son bytes y se guardan tal cual: lo que se lee de un backend
+    compartido (un fichero o un Redis al que otros pueden escribir) nunca
+    pasa por pickle.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """LRU en memoria del proceso con limite de entradas y TTL, seguro entre threads.
+
+    Cada worker de gunicorn tiene la suya y la calienta por su cuenta.
+    """
+
+    def __init__(self, max_entries=2048, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SqliteCache(CacheBackend):
+    """Cache compartida entre los workers de una misma maquina en un fichero SQLite (WAL).
+
+    Sirve como sustituto local de Redis: todos los workers leen las mismas
+    entradas. La expulsion es LRU
+    aproximada: el acceso se apunta como mucho una vez por segundo y por clave.
+    """
+
+    def __init__(self, path, max_entries=2048, ttl=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry "
+                "(key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed_at ON cache_entry (accessed_at)")
+
+    def _connection(self):
+        # Una conexion por thread y por proceso (no se comparten tras el fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM cache_entry WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None:
+            self.misses += 1
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at < now:
+            conn.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+            self.expirations += 1
+            self.misses += 1
+            return None
+        if now - accessed_at > 1:
+            conn.execute("UPDATE cache_entry SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + self.ttl, now),
+        )
+        # Comprobar el tamaño en cada set seria un COUNT(*) por escritura
+        self._sets += 1
+        if self._sets % 64 == 0:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache_entry WHERE key IN "
+                "(SELECT key FROM cache_entry ORDER BY accessed_at LIMIT ?)", (excess,)
+            )
+            self.evictions += excess
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entry")
+
+    def stats(self):
+        entries = self._connection().execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCache(CacheBackend):
+    """Cache compartida en Redis. Requiere el paquete `redis` (opcional).
+
+    El limite de tamaño y la expulsion LRU los pone el propio Redis
+    (maxmemory + allkeys-lru); aqui solo fijamos el TTL de cada clave.
+    """
+
+    def __init__(self, url, ttl=300, prefix='starwars:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis necesita el paquete redis (pipenv install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=int(self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        info = self.client.info('stats')
+        return {
+            "backend": "redis",
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": info.get('evicted_keys', 0),
+            "expirations": info.get('expired_keys', 0),
+        }
+
+
+def create_backend(name=None, url=None, max_entries=None, ttl=None):
+    """Crea el backend configurado con CACHE_BACKEND (memory, sqlite o redis) y CACHE_URL."""
+    name = name or os.getenv('CACHE_BACKEND', 'memory')
+    url = url or os.getenv('CACHE_URL')
+    max_entries = max_entries or int(os.getenv('CACHE_MAX_ENTRIES', 2048))
+    ttl = ttl or float(os.getenv('CACHE_TTL', 300))
+
+    if name == 'memory':
+        return LRUCache(max_entries=max_entries, ttl=ttl)
+    if name == 'sqlite':
+        return SqliteCache(url or '/tmp/starwars-cache.db', max_entries=max_entries, ttl=ttl)
+    if name == 'redis':
+        return RedisCache(url or 'redis://localhost:6379/0', ttl=ttl)
+    raise ValueError(f"CACHE_BACKEND desconocido: {name}")
+
+
+class CatalogCache:
+    """Claves por id y por pagina de listado sobre cualquier CacheBackend.
+
+    Todas llevan la version de la tabla (http_cache.table_version) leida
+    antes que los datos y por la misma sesion: el cuerpo guardado nunca es
+    mas viejo que la version de su clave.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def entity_key(self, table, version, entity_id):
+        return f"{table}:{version}:id:{entity_id}"
+
+    def list_key(self, table, version, list_args):
+        # De los parametros ya normalizados (queries.parse_list_args), no de la query string
+        fields, filters, after, limit = list_args
+        query = urlencode([("fields", ",".join(fields)), ("after", "" if after is None else after),
+                           ("limit", limit), *filters])
+        return f"{table}:{version}:list:{query}"
+
+    def variant_key(self, key, encoding):
+        # Cuerpo comprimido de la entrada `key` (ver compression.py)
+        return f"{key}:{encoding}"
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def get_page(self, key):
+        """(body, next_after) de una pagina de listado, o None."""
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        # "<next_after>\n<body>", con next_after vacio en la ultima pagina
+        header, _, body = value.partition(b"\n")
+        if header and not header.isdigit():
+            # Escrita con otro formato (una version anterior): como si no estuviera
+            return None
+        return body, int(header) if header else None
+
+    def set_page(self, key, body, next_after):
+        header = b"" if next_after is None else b"%d" % next_after
+        self.backend.set(key, header + b"\n" + body)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+catalog_cache = CatalogCache(create_backend())
+
+
+def metrics_collector():
+    """Contadores de la cache para el /metrics de profiling.py."""
+    stats = catalog_cache.stats()
+    labels = (('backend', stats['backend']),)
+    for name in ('hits', 'misses', 'evictions', 'expirations'):
+        yield f"catalog_cache_{name}_total", 'counter', labels, stats.get(name, 0)
+    if 'entries' in stats:
+        yield "catalog_cache_entries", 'gauge', labels, stats['entries']
+
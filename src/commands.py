@@ -0,0 +1,37 @@
+"""
+Maintenance commands for the Flask CLI (`flask <command>`, with FLASK_APP=src/app.py).
+"""
+import click
+from models import db
+from favorites import recompute_counts, recompute_popularity, FAVORITE_KINDS
+from search import rebuild_index
+
+
+def setup_commands(app):
+
+    @app.cli.command("repair-favorite-counts")
+    @click.option("--user", "user_ids", type=int, multiple=True, help="Solo estos usuarios (repetible)")
+    def repair_favorite_counts(user_ids):
+        """Recalcula los contadores de favoritos de los usuarios desde la tabla favorite."""
+        fixed = recompute_counts(user_ids or None)
+        db.session.commit()
+        click.echo(f"Contadores corregidos en {fixed} usuarios")
+
+    @app.cli.command("reconcile-popularity")
+    @click.option("--kind", "kinds", type=click.Choice(list(FAVORITE_KINDS)), multiple=True,
+                  help="Solo estos tipos (repetible)")
+    def reconcile_popularity(kinds):
+        """Corrige favorite_count de planetas, personajes y vehiculos; pensado para un cron."""
+        fixed = recompute_popularity(kinds or None)
+        db.session.commit()
+        for kind, rows in fixed.items():
+            click.echo(f"{kind}: {rows} corregidos")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index():
+        """Rehace el indice FTS5 de /search desde las tablas del catalogo (solo SQLite)."""
+        if rebuild_index():
+            db.session.commit()
+            click.echo("Indice de busqueda reconstruido")
+        else:
+            click.echo("Nada que hacer: fuera de SQLite el indice se mantiene solo")
@@ -0,0 +1,199 @@
+"""
+Negotiated response compression (Accept-Encoding: zstd, br, gzip).
+gzip is always available; br and zstd need the `brotli` and `zstandard`
+packages (in the Pipfile). Where they are missing, the default encodings
+drop them with a warning at startup. Only JSON/text bodies of at least
+COMPRESSION_MIN_SIZE bytes are compressed; streamed responses (/export)
+are sent as they are.
+
+Catalog responses that come from the cache (see `precompress_as`) keep
+their compressed bytes in the same cache, so a hit costs a lookup instead
+of compressing the same payload again.
+
+Settings: COMPRESSION=0 disables it, COMPRESSION_ENCODINGS sets the server
+preference (by default zstd,br,gzip), COMPRESSION_<GZIP|BR|ZSTD>_LEVEL
+the level of each one.
+"""
+import os
+import gzip
+import time
+import zlib
+import logging
+import threading
+from flask import g, request
+from cache import catalog_cache
+from profiling import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger('starwars.compression')
+
+DEFAULT_MIN_SIZE = 1024
+# Niveles pensados para comprimir al vuelo; los maximos (br 11, zstd 19) multiplican la CPU
+DEFAULT_LEVELS = {'zstd': 3, 'br': 5, 'gzip': 6}
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+_zstd_local = threading.local()
+
+
+def _gzip(data, level):
+    # mtime=0: la misma entrada produce siempre los mismos bytes
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    # Un ZstdCompressor no se puede usar desde dos threads a la vez
+    compressors = _zstd_local.__dict__.setdefault('compressors', {})
+    compressor = compressors.get(level)
+    if compressor is None:
+        compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+    return compressor.compress(data)
+
+
+COMPRESSORS = {'zstd': _zstd, 'br': _brotli, 'gzip': _gzip}
+AVAILABLE = {'zstd': zstandard is not None, 'br': brotli is not None, 'gzip': True}
+PACKAGES = {'zstd': 'zstandard', 'br': 'brotli'}
+
+metrics.describe('http_compression_input_bytes_total', "Bytes de respuesta antes de comprimir, por encoding")
+metrics.describe('http_compression_output_bytes_total', "Bytes de respuesta enviados comprimidos, por encoding")
+metrics.describe('http_compression_seconds_total', "Tiempo comprimiendo respuestas, por encoding")
+metrics.describe('http_compression_cache_total', "Respuestas comprimidas servidas desde la cache (hit) o comprimidas (miss)")
+
+
+def etag_for_encoding(etag, encoding):
+    """Cada encoding es una representacion distinta: su ETag lleva el encoding como sufijo."""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def precompress_as(key):
+    """Marca la respuesta de esta peticion como cacheable bajo `key` en la cache del catalogo:
+    sus versiones comprimidas se guardan junto a ella y se reutilizan mientras el cuerpo no cambie."""
+    g._compression_key = key
+
+
+def compress(data, encoding, level=None):
+    if not AVAILABLE.get(encoding):
+        raise ValueError(f"Encoding no disponible: {encoding}")
+    return COMPRESSORS[encoding](data, DEFAULT_LEVELS[encoding] if level is None else level)
+
+
+class ResponseCompressor:
+    """Hook after_request que negocia el encoding y comprime el cuerpo de la respuesta."""
+
+    def __init__(self, encodings=None, min_size=None, levels=None):
+        configured = encodings or os.getenv('COMPRESSION_ENCODINGS')
+        encodings = configured or list(COMPRESSORS)
+        if isinstance(encodings, str):
+            encodings = [encoding.strip() for encoding in encodings.split(',') if encoding.strip()]
+        unknown = [encoding for encoding in encodings if encoding not in COMPRESSORS]
+        if unknown:
+            raise ValueError(f"COMPRESSION_ENCODINGS desconocidos: {', '.join(unknown)}")
+        missing = [encoding for encoding in encodings if not AVAILABLE[encoding]]
+        if configured and missing:
+            raise RuntimeError(f"COMPRESSION_ENCODINGS={','.join(missing)} necesita el paquete "
+                               f"{' y '.join(PACKAGES[encoding] for encoding in missing)}")
+        # Por defecto, los que no estan instalados se ignoran (gzip siempre esta), con un aviso
+        if missing:
+            logger.warning("Compresion sin %s: falta el paquete %s (pipenv install, o COMPRESSION_ENCODINGS "
+                           "para elegir los encodings a proposito)", ', '.join(missing),
+                           ' y '.join(PACKAGES[encoding] for encoding in missing))
+        self.encodings = [encoding for encoding in encodings if AVAILABLE[encoding]]
+        self.min_size = int(os.getenv('COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)) if min_size is None else min_size
+        self.levels = {
+            encoding: int(os.getenv(f'COMPRESSION_{encoding.upper()}_LEVEL', default))
+            for encoding, default in DEFAULT_LEVELS.items()
+        }
+        self.levels.update(levels or {})
+
+    def negotiate(self):
+        return request.accept_encodings.best_match(self.encodings)
+
+    def _compressible(self, response):
+        return (
+            not response.is_streamed
+            and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype.startswith(COMPRESSIBLE_TYPES)
+        )
+
+    def _not_modified(self, response):
+        # El 304 repite el ETag de la variante que tiene el cliente
+        etag, _ = response.get_etag()
+        if etag and request.if_none_match:
+            for encoding in self.encodings:
+                if request.if_none_match.contains(etag_for_encoding(etag, encoding)):
+                    response.set_etag(etag_for_encoding(etag, encoding))
+                    break
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _compressed(self, body, encoding):
+        key = g.get('_compression_key')
+        if key is not None:
+            # "<longitud> <crc>\n" del original delante: si el cuerpo cambio no se usa
+            fingerprint = b"%d %d" % (len(body), zlib.crc32(body))
+            stored = catalog_cache.get(catalog_cache.variant_key(key, encoding))
+            if stored is not None:
+                header, _, data = stored.partition(b"\n")
+                if header == fingerprint:
+                    metrics.inc('http_compression_cache_total', (('result', 'hit'),))
+                    return data
+
+        started = time.perf_counter()
+        data = COMPRESSORS[encoding](body, self.levels[encoding])
+        metrics.inc('http_compression_seconds_total', (('encoding', encoding),), time.perf_counter() - started)
+
+        if key is not None:
+            metrics.inc('http_compression_cache_total', (('result', 'miss'),))
+            catalog_cache.set(catalog_cache.variant_key(key, encoding), fingerprint + b"\n" + data)
+        return data
+
+    def __call__(self, response):
+        if response.status_code == 304:
+            return self._not_modified(response)
+        if response.status_code != 200 or not self._compressible(response):
+            return response
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        data = self._compressed(body, encoding)
+        if len(data) >= len(body):
+            return response
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag_for_encoding(etag, encoding), weak)
+
+        labels = (('encoding', encoding),)
+        metrics.inc('http_compression_input_bytes_total', labels, len(body))
+        metrics.inc('http_compression_output_bytes_total', labels, len(data))
+        return response
+
+
+def init_compression(app):
+    if os.getenv('COMPRESSION', '1') == '0':
+        return None
+    compressor = ResponseCompressor()
+    app.after_request(compressor)
+    return compressor
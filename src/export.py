@@ -0,0 +1,51 @@
+"""
+Streaming export of whole tables (GET /<collection>/export) as NDJSON or as
+a chunked JSON array. Rows are read with a server-side cursor (`yield_per`)
+and written as they arrive, so memory stays flat whatever the table size.
+"""
+import os
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import select
+from models import db
+
+BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+
+def iter_rows(model, batch_size=BATCH_SIZE):
+    """Itera bloques de dicts; nunca hay mas de `batch_size` filas en memoria."""
+    fields = list(model.public_fields)
+    statement = (
+        select(*[getattr(model, name) for name in fields])
+        .order_by(model.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = db.session.execute(statement)
+    for partition in result.partitions():
+        yield [dict(zip(fields, row)) for row in partition]
+
+
+def generate_ndjson(model, dumps):
+    for rows in iter_rows(model):
+        yield "".join(dumps(row) + "\n" for row in rows)
+
+
+def generate_json_array(model, dumps):
+    yield "["
+    first = True
+    for rows in iter_rows(model):
+        chunk = ",".join(dumps(row) for row in rows)
+        yield chunk if first else "," + chunk
+        first = False
+    yield "]"
+
+
+def export_response(model, fmt='ndjson'):
+    # El provider JSON de la app (orjson si esta instalado)
+    dumps = current_app.json.dumps
+    if fmt == 'json':
+        body, mimetype = generate_json_array(model, dumps), 'application/json'
+    else:
+        body, mimetype = generate_ndjson(model, dumps), 'application/x-ndjson'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={model.__tablename__}.{fmt}'
+    return response
@@ -0,0 +1,411 @@
+"""
+Favorite writes together with the denormalized counters: on `user`
+(favorite_count and one per type) and the popularity `favorite_count` of
+each planet, character and vehicle. Every function runs inside the caller's
+transaction: the handler commits or rolls back, so a favorite and its
+counters are never out of step. Users and catalog entities are deleted
+with one DELETE each and their favorites go with them in the database (ON
+DELETE CASCADE); `purge_entity_favorites` / `purge_user_favorites` empty them
+in bounded batches first when there are too many (see purge.py).
+`add_favorites_bulk` writes the favorites of many users at once for the
+write-behind queue (write_behind.py).
+`recompute_counts` and `recompute_popularity` repair drift in bulk.
+"""
+from collections import Counter
+from sqlalchemy import select, insert, update, delete, func, or_, case, tuple_, literal
+from models import db, User, Planet, Character, Vehicle, Favorite
+from http_cache import bump_versions, UPSERT_INSERTS
+
+# tipo -> (modelo, columna en favorite, contador en user)
+FAVORITE_KINDS = {
+    'planet': (Planet, Favorite.planet_id, User.favorite_planet_count),
+    'character': (Character, Favorite.character_id, User.favorite_character_count),
+    'vehicle': (Vehicle, Favorite.vehicle_id, User.favorite_vehicle_count),
+}
+
+
+def _bump_counts(user_filter, kind, delta):
+    counter = FAVORITE_KINDS[kind][2]
+    return db.session.execute(
+        update(User)
+        .where(user_filter)
+        .values({User.favorite_count: User.favorite_count + delta, counter: counter + delta})
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _bump_popularity(kind, entity_filter, delta):
+    model = FAVORITE_KINDS[kind][0]
+    # updated_at se deja igual: el contador no forma parte de los datos publicos
+    return db.session.execute(
+        update(model)
+        .where(entity_filter(model))
+        .values(favorite_count=model.favorite_count + delta, updated_at=model.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def add_favorite(user_id, kind, entity_id):
+    """Crea el favorito y suma los contadores.
+
+    Devuelve None si todo fue bien, o 'user' / 'entity' si no existe el
+    usuario o el planeta/personaje/vehiculo. El INSERT va primero: un duplicado
+    lo rechaza el indice unico (IntegrityError) antes de bloquear ninguna fila,
+    y el favorito de una entidad popular solo retiene su contador desde el
+    UPDATE hasta el commit. Los UPDATE van siempre en el mismo orden (entidad, usuario).
+    """
+    model, column, _ = FAVORITE_KINDS[kind]
+    # INSERT ... SELECT ... WHERE EXISTS: 0 filas si falta el usuario o la entidad
+    inserted = db.session.execute(
+        insert(Favorite).from_select(
+            ['user_id', column.key],
+            select(literal(user_id), literal(entity_id)).where(
+                select(User.id).where(User.id == user_id).exists(),
+                select(model.id).where(model.id == entity_id).exists(),
+            ),
+        )
+    ).rowcount
+    if inserted == 0:
+        return 'entity' if db.session.get(model, entity_id) is None else 'user'
+    _bump_popularity(kind, lambda model: model.id == entity_id, 1)
+    _bump_counts(User.id == user_id, kind, 1)
+    return None
+
+
+def _delete_row(model, entity_id):
+    return db.session.execute(
+        delete(model).where(model.id == entity_id).execution_options(synchronize_session=False)
+    ).rowcount > 0
+
+
+def delete_entity(kind, entity_id):
+    """Borra el planeta/personaje/vehiculo con un solo DELETE: sus favoritos los
+    borra la BD (ON DELETE CASCADE). Antes resta 1 a cada usuario que lo tenia
+    (el indice unico garantiza uno por usuario). False si no existia."""
+    model, column, _ = FAVORITE_KINDS[kind]
+    _bump_counts(User.id.in_(select(Favorite.user_id).where(column == entity_id)), kind, -1)
+    if not _delete_row(model, entity_id):
+        return False
+    # delete() no pasa por el flush del ORM: la version de la tabla a mano
+    bump_versions(db.session, [kind])
+    return True
+
+
+def delete_user(user_id):
+    """Borra el usuario con un solo DELETE (sus favoritos, en cascada en la BD)
+    despues de restar su voto a cada entidad que tenia de favorita. False si no existia."""
+    for kind, (_, column, _) in FAVORITE_KINDS.items():
+        favorited = select(column).where(Favorite.user_id == user_id, column.is_not(None))
+        _bump_popularity(kind, lambda model: model.id.in_(favorited), -1)
+    if not _delete_row(User, user_id):
+        return False
+    bump_versions(db.session, ['user'])
+    return True
+
+
+def favorites_summary(user_id):
+    """Contadores de un usuario leyendo solo su fila; None si no existe."""
+    row = db.session.execute(
+        select(User.favorite_count, User.favorite_planet_count,
+               User.favorite_character_count, User.favorite_vehicle_count)
+        .where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    total, planets, characters, vehicles = row
+    return {"user_id": user_id, "total": total, "planets": planets,
+            "characters": characters, "vehicles": vehicles}
+
+
+def recompute_counts(user_ids=None):
+    """Recalcula los contadores desde la tabla favorite con un solo UPDATE.
+    Devuelve cuantos usuarios tenian algun contador desajustado."""
+    def count_of(column):
+        return select(func.count(column)).where(Favorite.user_id == User.id).scalar_subquery()
+
+    expected = {User.favorite_count: count_of(Favorite.id)}
+    for _, column, counter in FAVORITE_KINDS.values():
+        expected[counter] = count_of(column)
+
+    statement = update(User).where(
+        or_(*[counter != value for counter, value in expected.items()])
+    ).values(expected).execution_options(synchronize_session=False)
+    if user_ids is not None:
+        statement = statement.where(User.id.in_(user_ids))
+    return db.session.execute(statement).rowcount
+
+
+def recompute_popularity(kinds=None):
+    """Recalcula favorite_count de planetas, personajes y vehiculos desde la
+    tabla favorite, un UPDATE por tabla. Devuelve {tipo: filas corregidas}."""
+    fixed = {}
+    for kind in kinds or FAVORITE_KINDS:
+        model, column, _ = FAVORITE_KINDS[kind]
+        expected = select(func.count(Favorite.id)).where(column == model.id).scalar_subquery()
+        fixed[kind] = db.session.execute(
+            update(model)
+            .where(model.favorite_count != expected)
+            .values(favorite_count=expected, updated_at=model.updated_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    return fixed
+
+
+MAX_BATCH_SIZE = 1000
+BATCH_STATUSES = {
+    'add': ("created", "duplicate", "not_found", "invalid"),
+    'remove': ("deleted", "not_found", "invalid"),
+}
+
+
+def _parse_batch(items):
+    """Valida los items {"type": ..., "id": ...}. Devuelve ({tipo: {id: [indices]}}, resultados)."""
+    by_kind, results = {kind: {} for kind in FAVORITE_KINDS}, {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {"index": index, "status": "invalid", "errors": ["el item debe ser un objeto JSON"]}
+            continue
+        kind, entity_id = item.get("type"), item.get("id")
+        errors = []
+        if kind not in FAVORITE_KINDS:
+            errors.append(f"type debe ser uno de: {', '.join(FAVORITE_KINDS)}")
+        if not isinstance(entity_id, int) or isinstance(entity_id, bool):
+            errors.append("id debe ser un entero")
+        if errors:
+            results[index] = {"index": index, "status": "invalid", "errors": errors}
+        else:
+            by_kind[kind].setdefault(entity_id, []).append(index)
+    return by_kind, results
+
+
+def _summary(operation, results, count):
+    ordered = [results[index] for index in range(count)]
+    summary = {status: 0 for status in BATCH_STATUSES[operation]}
+    for result in ordered:
+        summary[result["status"]] += 1
+    return {**summary, "results": ordered}
+
+
+# Motores con INSERT ... ON CONFLICT DO NOTHING y RETURNING (http_cache.UPSERT_INSERTS):
+# una sola sentencia por tipo
+def _upsert_insert():
+    return UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+
+
+def _insert_ignoring_duplicates(user_id, column, entity_ids):
+    """Inserta los favoritos; el indice unico descarta los que ya existian.
+    Devuelve el conjunto de ids insertados."""
+    rows = [{"user_id": user_id, column.key: entity_id} for entity_id in entity_ids]
+    dialect_insert = _upsert_insert()
+    if dialect_insert is not None:
+        statement = dialect_insert(Favorite).values(rows).on_conflict_do_nothing().returning(column)
+        return set(db.session.execute(statement).scalars())
+
+    # Otros motores (MySQL): los existentes con una query y el resto en un INSERT multi-fila
+    existing = set(db.session.execute(
+        select(column).where(Favorite.user_id == user_id, column.in_(entity_ids))
+    ).scalars())
+    rows = [row for row in rows if row[column.key] not in existing]
+    if rows:
+        db.session.execute(insert(Favorite), rows)
+    return {row[column.key] for row in rows}
+
+
+def _insert_pairs_ignoring_duplicates(column, pairs):
+    """Como _insert_ignoring_duplicates con pares (user_id, id) de varios usuarios.
+    Devuelve el conjunto de pares insertados."""
+    rows = [{"user_id": user_id, column.key: entity_id} for user_id, entity_id in pairs]
+    dialect_insert = _upsert_insert()
+    if dialect_insert is not None:
+        statement = dialect_insert(Favorite).values(rows).on_conflict_do_nothing().returning(Favorite.user_id, column)
+        return set(db.session.execute(statement).tuples())
+
+    existing = set(db.session.execute(
+        select(Favorite.user_id, column).where(tuple_(Favorite.user_id, column).in_(pairs))
+    ).tuples())
+    rows = [row for row in rows if (row["user_id"], row[column.key]) not in existing]
+    if rows:
+        db.session.execute(insert(Favorite), rows)
+    return {(row["user_id"], row[column.key]) for row in rows}
+
+
+def _delete_favorites(user_id, column, entity_ids):
+    """Borra los favoritos del usuario; devuelve el conjunto de ids que existian."""
+    condition = (Favorite.user_id == user_id) & column.in_(entity_ids)
+    if _upsert_insert() is not None:
+        return set(db.session.execute(
+            delete(Favorite).where(condition).returning(column).execution_options(synchronize_session=False)
+        ).scalars())
+    deleted = set(db.session.execute(select(column).where(condition)).scalars())
+    if deleted:
+        db.session.execute(delete(Favorite).where(condition).execution_options(synchronize_session=False))
+    return deleted
+
+
+def _apply_counts(user_id, changed, delta):
+    """Ajusta popularidad (un UPDATE por tipo) y los contadores del usuario (un UPDATE)."""
+    values = {}
+    for kind, entity_ids in changed.items():
+        if not entity_ids:
+            continue
+        _bump_popularity(kind, lambda model: model.id.in_(entity_ids), delta)
+        counter = FAVORITE_KINDS[kind][2]
+        values[counter] = counter + delta * len(entity_ids)
+    if values:
+        total = sum(len(entity_ids) for entity_ids in changed.values())
+        values[User.favorite_count] = User.favorite_count + delta * total
+        db.session.execute(
+            update(User).where(User.id == user_id).values(values).execution_options(synchronize_session=False)
+        )
+
+
+def batch_add(user_id, items):
+    """Añade favoritos de varios tipos en una transaccion (el llamador hace commit).
+
+    Una query IN por tipo para comprobar que existen las entidades, un INSERT
+    multi-fila por tipo que se salta los duplicados gracias al indice unico y
+    los contadores ajustados solo con lo que realmente se inserto.
+    """
+    by_kind, results = _parse_batch(items)
+    inserted = {}
+    for kind, requested in by_kind.items():
+        if not requested:
+            continue
+        model, column, _ = FAVORITE_KINDS[kind]
+        existing = set(db.session.execute(select(model.id).where(model.id.in_(requested))).scalars())
+        inserted[kind] = _insert_ignoring_duplicates(user_id, column, sorted(existing)) if existing else set()
+        for entity_id, indexes in requested.items():
+            for position, index in enumerate(indexes):
+                if entity_id not in existing:
+                    status = "not_found"
+                elif position == 0 and entity_id in inserted[kind]:
+                    status = "created"
+                else:
+                    status = "duplicate"
+                results[index] = {"index": index, "status": status}
+
+    _apply_counts(user_id, inserted, 1)
+    return _summary('add', results, len(items))
+
+
+def batch_remove(user_id, items):
+    """Quita favoritos de varios tipos en una transaccion (el llamador hace commit)."""
+    by_kind, results = _parse_batch(items)
+    deleted = {}
+    for kind, requested in by_kind.items():
+        if not requested:
+            continue
+        deleted[kind] = _delete_favorites(user_id, FAVORITE_KINDS[kind][1], list(requested))
+        for entity_id, indexes in requested.items():
+            for position, index in enumerate(indexes):
+                status = "deleted" if position == 0 and entity_id in deleted[kind] else "not_found"
+                results[index] = {"index": index, "status": status}
+
+    _apply_counts(user_id, deleted, -1)
+    return _summary('remove', results, len(items))
+
+
+def add_favorites_bulk(items):
+    """Añade favoritos de varios usuarios y tipos en una transaccion (la cola de
+    write_behind.py; el llamador hace commit). `items` son tuplas (user_id, tipo, id).
+
+    Una query IN para los usuarios y otra por tipo para las entidades, un INSERT
+    multi-fila por tipo que se salta los duplicados y los contadores con un UPDATE
+    por tabla. Devuelve el estado de cada item, en orden: created, duplicate,
+    user_not_found o not_found.
+    """
+    user_ids = {user_id for user_id, _, _ in items}
+    existing_users = set(db.session.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+    statuses = ["user_not_found"] * len(items)
+    by_kind = {kind: {} for kind in FAVORITE_KINDS}
+    for index, (user_id, kind, entity_id) in enumerate(items):
+        if user_id in existing_users:
+            by_kind[kind].setdefault((user_id, entity_id), []).append(index)
+
+    user_totals, user_counters = Counter(), {}
+    for kind, requested in by_kind.items():
+        if not requested:
+            continue
+        model, column, counter = FAVORITE_KINDS[kind]
+        entity_ids = {entity_id for _, entity_id in requested}
+        existing = set(db.session.execute(select(model.id).where(model.id.in_(entity_ids))).scalars())
+        pairs = sorted(pair for pair in requested if pair[1] in existing)
+        inserted = _insert_pairs_ignoring_duplicates(column, pairs) if pairs else set()
+        for (user_id, entity_id), indexes in requested.items():
+            for position, index in enumerate(indexes):
+                if entity_id not in existing:
+                    statuses[index] = "not_found"
+                elif position == 0 and (user_id, entity_id) in inserted:
+                    statuses[index] = "created"
+                else:
+                    statuses[index] = "duplicate"
+        if not inserted:
+            continue
+
+        # Cada entidad suma los usuarios que la añadieron: CASE id WHEN ... en un solo UPDATE
+        popularity = Counter(entity_id for _, entity_id in inserted)
+        db.session.execute(
+            update(model)
+            .where(model.id.in_(popularity))
+            .values(favorite_count=model.favorite_count + case(popularity, value=model.id, else_=0),
+                    updated_at=model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        per_user = Counter(user_id for user_id, _ in inserted)
+        user_totals.update(per_user)
+        user_counters[counter] = per_user
+
+    if user_totals:
+        values = {User.favorite_count: User.favorite_count + case(user_totals, value=User.id, else_=0)}
+        for counter, per_user in user_counters.items():
+            values[counter] = counter + case(per_user, value=User.id, else_=0)
+        db.session.execute(
+            update(User).where(User.id.in_(user_totals)).values(values).execution_options(synchronize_session=False)
+        )
+    return statuses
+
+
+def _delete_returning(condition, *columns):
+    """DELETE de los favoritos que cumplen `condition`; devuelve `columns` de las filas borradas."""
+    statement = delete(Favorite).where(condition).execution_options(synchronize_session=False)
+    if _upsert_insert() is not None:
+        return db.session.execute(statement.returning(*columns)).all()
+    rows = db.session.execute(select(*columns).where(condition)).all()
+    if rows:
+        db.session.execute(statement)
+    return rows
+
+
+def _next_batch(condition, limit):
+    return db.session.execute(
+        select(Favorite.id).where(condition).order_by(Favorite.id).limit(limit)
+    ).scalars().all()
+
+
+def purge_entity_favorites(kind, entity_id, limit):
+    """Borra hasta `limit` favoritos de la entidad y ajusta los contadores de lo
+    borrado (el llamador hace commit por lote). Devuelve cuantos habia en el lote."""
+    column = FAVORITE_KINDS[kind][1]
+    ids = _next_batch(column == entity_id, limit)
+    if not ids:
+        return 0
+    user_ids = [user_id for user_id, in _delete_returning(Favorite.id.in_(ids), Favorite.user_id)]
+    if user_ids:
+        _bump_popularity(kind, lambda model: model.id == entity_id, -len(user_ids))
+        _bump_counts(User.id.in_(user_ids), kind, -1)
+    return len(ids)
+
+
+def purge_user_favorites(user_id, limit):
+    """Lo mismo para los favoritos de un usuario."""
+    ids = _next_batch(Favorite.user_id == user_id, limit)
+    if not ids:
+        return 0
+    columns = [column for _, column, _ in FAVORITE_KINDS.values()]
+    changed = {kind: set() for kind in FAVORITE_KINDS}
+    for row in _delete_returning(Favorite.id.in_(ids), *columns):
+        for kind, entity_id in zip(FAVORITE_KINDS, row):
+            if entity_id is not None:
+                changed[kind].add(entity_id)
+    _apply_counts(user_id, changed, -1)
+    return len(ids)
@@ -0,0 +1,64 @@
+"""
+Gunicorn settings for wsgi.py (Procfile / render.yaml):
+
+    gunicorn --chdir ./src/ -c ./src/gunicorn_config.py
+
+The app is loaded once in the master (preload_app). Before forking, the master
+configures the mappers, warms the sitemap and the first catalog pages
+(app.warm_up), closes its database connections and moves every surviving
+object to the permanent GC generation (gc.freeze). Workers then share those
+pages with the master instead of copying them the first time the collector
+walks them. Each worker drops the engine connections it inherited in post_fork
+and resumes the pending background deletes in post_worker_init.
+
+Read from env:
+    GUNICORN_WORKERS or WEB_CONCURRENCY (2), GUNICORN_WORKER_CLASS (sync),
+    GUNICORN_THREADS (1), GUNICORN_PRELOAD (1), GUNICORN_APP (wsgi:application;
+    asgi:application with GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker)
+"""
+import gc
+import os
+import sys
+
+wsgi_app = os.getenv('GUNICORN_APP', 'wsgi:application')
+workers = int(os.getenv('GUNICORN_WORKERS') or os.getenv('WEB_CONCURRENCY') or 2)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# Sin colecciones en el master mientras se carga la app: no dejan huecos en
+# paginas que despues comparten los workers. when_ready lo vuelve a activar
+gc.disable()
+
+
+def flask_app(server):
+    # wsgi.py expone la app de Flask como `application`; asgi.py como `app`
+    module = sys.modules[server.app.app_uri.split(':')[0]]
+    return getattr(module, 'app', None) or module.application
+
+
+def when_ready(server):
+    if preload_app:
+        from app import warm_up
+        warm_up(flask_app(server))
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+    server.log.info("App precargada: %d objetos congelados", gc.get_freeze_count())
+
+
+def pre_fork(server, worker):
+    # Lo que haya creado el master desde when_ready (p.ej. al reponer un worker)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from pool import reset_after_fork
+    reset_after_fork()
+
+
+def post_worker_init(worker):
+    # El worker retoma los borrados aceptados (202) que quedaron a medias (ver purge.py)
+    purger = flask_app(worker).extensions.get('purger')
+    if purger is not None:
+        purger.start()
@@ -0,0 +1,186 @@
+"""
+HTTP conditional requests (ETag / Last-Modified / 304).
+The validators come from the per-table version counters in `table_version`,
+so a 304 is answered with one small query, without running the real query
+or serializing anything. The versions are read once per request and the
+catalog cache keys use that same read, so a body is never older than the
+ETag sent with it. The validators and `conditional` are step functions
+(see steps.py): the same code runs under wsgi.py and asgi.py.
+"""
+import zlib
+from datetime import datetime, timezone
+from functools import wraps
+from itertools import chain
+from flask import g, request, make_response, current_app
+from werkzeug.http import http_date
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, select, update, insert, func
+from sqlalchemy.dialects import sqlite, postgresql
+from models import TableVersion, Favorite
+from compression import etag_for_encoding, COMPRESSORS
+
+VERSIONED_TABLES = ('user', 'planet', 'character', 'vehicle')
+ENCODINGS = (None,) + tuple(COMPRESSORS)
+# Motores con INSERT ... ON CONFLICT: una sola sentencia aunque la fila no exista
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _seed_versions(table, connection, **kw):
+    # Como la migracion: con db.create_all las filas tambien existen desde el principio
+    connection.execute(insert(table), [
+        {"name": name, "version": 1, "updated_at": datetime.utcnow()} for name in VERSIONED_TABLES
+    ])
+
+
+def bump_versions(session, tables):
+    """Incrementa la version de `tables` dentro de la transaccion de `session`.
+
+    El listener de before_flush lo hace solo para los cambios del ORM; las
+    sentencias masivas (insert()/delete() sin objetos) deben llamarlo a mano.
+    """
+    connection = session.connection()
+    table = TableVersion.__table__
+    dialect_insert = UPSERT_INSERTS.get(connection.dialect.name)
+    now = datetime.utcnow()
+    # Orden fijo para que dos transacciones no se bloqueen en orden cruzado
+    for name in sorted(tables):
+        if dialect_insert is not None:
+            # Si falta la fila, dos primeras escrituras a la vez no chocan en la clave primaria
+            connection.execute(
+                dialect_insert(table).values(name=name, version=1, updated_at=now)
+                .on_conflict_do_update(index_elements=[table.c.name],
+                                       set_={"version": table.c.version + 1, "updated_at": now})
+            )
+            continue
+        result = connection.execute(
+            update(table).where(table.c.name == name).values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(name=name, version=1, updated_at=now))
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_changed_tables(session, flush_context, instances):
+    tables = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table in VERSIONED_TABLES and (obj not in session.dirty or session.is_modified(obj)):
+            tables.add(table)
+    if tables:
+        bump_versions(session, tables)
+
+
+def _representation_tag(full_path):
+    # Cada URL (con su query string) es una representacion distinta
+    return format(zlib.crc32(full_path.encode()), '08x')
+
+
+def _as_utc(value):
+    return value.replace(microsecond=0, tzinfo=timezone.utc) if value else None
+
+
+def versions_query(tables):
+    return (
+        select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+        .where(TableVersion.name.in_(tables))
+    )
+
+
+def versions_from_rows(tables, rows):
+    """{tabla: (version, updated_at)} de las filas de `versions_query(tables)`."""
+    versions = dict.fromkeys(tables, (0, None))
+    versions.update((name, (version, updated_at)) for name, version, updated_at in rows)
+    return versions
+
+
+def table_versions(*tables):
+    """Pasos: {tabla: (version, updated_at)}, leidas como mucho una vez por peticion.
+
+    El validador y las claves de la cache del catalogo comparten esta lectura,
+    hecha antes que la de los datos: el ETag nunca es mas nuevo que el cuerpo.
+    """
+    read = g.setdefault('_table_versions', {})
+    unread = [name for name in tables if name not in read]
+    if unread:
+        read.update(versions_from_rows(unread, (yield versions_query(unread)).all()))
+    return {name: read[name] for name in tables}
+
+
+def table_version(table):
+    """Pasos: version de `table` en esta peticion, la que llevan las claves de la cache del catalogo."""
+    versions = yield from table_versions(table)
+    return versions[table][0]
+
+
+def favorites_stats_query(user_id):
+    return select(func.count(Favorite.id), func.max(Favorite.updated_at)).where(Favorite.user_id == user_id)
+
+
+def etag_from_versions(versions, full_path):
+    """(etag, last_modified) a partir de `table_versions(...)`."""
+    parts = [f"{name}{version}" for name, (version, _) in versions.items()]
+    last_modified = max((updated_at for _, updated_at in versions.values() if updated_at), default=None)
+    return "-".join(parts + [_representation_tag(full_path)]), last_modified
+
+
+def etag_for_favorites(count, favorites_updated_at, tables_etag, last_modified):
+    if favorites_updated_at is not None and (last_modified is None or favorites_updated_at > last_modified):
+        last_modified = favorites_updated_at
+    stamp = favorites_updated_at.timestamp() if favorites_updated_at else 0
+    return f"fav{count}.{stamp:.6f}-{tables_etag}", last_modified
+
+
+def table_validator(*tables):
+    """Validador para endpoints que solo dependen de unas tablas del catalogo."""
+    def validator(**view_args):
+        versions = yield from table_versions(*tables)
+        return etag_from_versions(versions, request.full_path)
+    return validator
+
+
+def favorites_validator(user_id, **view_args):
+    """Los favoritos de un usuario dependen de sus filas en favorite (count y
+    max(updated_at) por el indice de user_id) y de los datos del usuario y
+    del catalogo que van embebidos en la respuesta."""
+    count, favorites_updated_at = (yield favorites_stats_query(user_id)).one()
+    etag, last_modified = yield from table_validator(*VERSIONED_TABLES)()
+    return etag_for_favorites(count, favorites_updated_at, etag, last_modified)
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    if if_none_match:
+        # El cliente puede tener la variante comprimida, con su propio ETag
+        return any(if_none_match.contains(etag_for_encoding(etag, encoding)) for encoding in ENCODINGS)
+    if if_modified_since and last_modified is not None:
+        return _as_utc(last_modified) <= if_modified_since
+    return False
+
+
+def validator_headers(etag, last_modified):
+    """Cabeceras que acompañan a un 200 o 304 condicional."""
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(_as_utc(last_modified))
+    return headers
+
+
+def conditional(validator):
+    """Decorador de vistas GET en pasos: calcula ETag/Last-Modified antes de
+    ejecutar la vista y contesta 304 sin llamarla si el cliente ya tiene esa version."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, last_modified = yield from validator(**kwargs)
+
+            if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response((yield from view(*args, **kwargs)))
+                if response.status_code != 200:
+                    return response
+
+            response.headers.update(validator_headers(etag, last_modified))
+            return response
+        return wrapper
+    return decorator
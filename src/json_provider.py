@@ -0,0 +1,67 @@
+"""
+JSON providers for the Flask app. Uses orjson (in the Pipfile) and falls
+back to the stdlib provider, with a warning at startup, where it is not
+installed. Both write datetimes as ISO 8601, the format `serialize()`
+already uses. Select with JSON_PROVIDER=orjson|stdlib (by default orjson
+if available).
+"""
+import os
+import logging
+from datetime import date, datetime
+from flask.json.provider import JSONProvider, DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger('starwars.json')
+
+
+def _iso_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """El provider de Flask sin ordenar claves y con fechas ISO."""
+    sort_keys = False
+    default = staticmethod(_iso_default)
+
+
+class OrjsonProvider(JSONProvider):
+    """Serializa con orjson directamente a bytes (sin pasar por str)."""
+    mimetype = 'application/json'
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_iso_default, option=self.option).decode()
+
+    def dumpb(self, obj):
+        return orjson.dumps(obj, default=_iso_default, option=self.option)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj), mimetype=self.mimetype)
+
+
+def init_json_provider(app, name=None):
+    name = name or os.getenv('JSON_PROVIDER')
+    if name is None:
+        name = 'orjson' if orjson else 'stdlib'
+        if orjson is None:
+            logger.warning("orjson no esta instalado: se serializa con el json de la stdlib, mas lento "
+                           "(pipenv install, o JSON_PROVIDER=stdlib para elegirlo a proposito)")
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError("JSON_PROVIDER=orjson necesita el paquete orjson (pipenv install orjson)")
+        app.json = OrjsonProvider(app)
+    elif name == 'stdlib':
+        app.json = StdlibJSONProvider(app)
+    else:
+        raise ValueError(f"JSON_PROVIDER desconocido: {name}")
+    return app.json
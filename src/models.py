@@ -1,10 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, BigInteger, ForeignKey, DateTime, Integer
+from sqlalchemy import String, Boolean, BigInteger, ForeignKey, DateTime, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
+from replicas import RoutingSession
 
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 class User(db.Model):
@@ -15,11 +16,21 @@ class User(db.Model):
     first_name: Mapped[str] = mapped_column(String(150), unique=False, nullable=False)
     last_name: Mapped[str] = mapped_column(String(150), unique=False, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean(), nullable=False)
+    # Contadores desnormalizados de favoritos, mantenidos por favorites.py
+    favorite_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    favorite_planet_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    favorite_character_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    favorite_vehicle_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+
+    # Campos que se pueden pedir con ?fields= y filtrar en el listado
+    public_fields = ("id", "email", "first_name", "last_name")
+    filter_fields = ("email",)
 
       # Relacion inversa
 
+    # ON DELETE CASCADE en la BD: borrar el usuario no carga sus favoritos
     favorite: Mapped[list["Favorite"]] = relationship(
-    back_populates="user")
+    back_populates="user", order_by="Favorite.created_at", cascade="all, delete", passive_deletes=True)
 
 
     def serialize(self):
@@ -39,17 +50,25 @@ class User(db.Model):
 
 class Planet(db.Model):
     __tablename__= 'planet'
+    # Ranking de /planets/popular: keyset sobre (favorite_count, id) recorriendo el indice
+    __table_args__ = (Index('ix_planet_favorite_count_id', 'favorite_count', 'id'),)
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(150), unique=True, nullable=False)
     climate: Mapped[str] = mapped_column(String(100), unique=True, nullable=False) 
-    terrain: Mapped[str] = mapped_column(String(100), unique=False, nullable=False)  
-    population: Mapped[int] = mapped_column(BigInteger, nullable=False)  
+    terrain: Mapped[str] = mapped_column(String(100), unique=False, nullable=False, index=True)
+    population: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Cuantos usuarios lo tienen de favorito, mantenido por favorites.py
+    favorite_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+
+    public_fields = ("id", "name", "climate", "terrain", "population")
+    filter_fields = ("name", "climate", "terrain", "population")
 
 
   # Relacion inversa
 
     favorite: Mapped[list["Favorite"]] = relationship(
-    back_populates="planet")
+    back_populates="planet", cascade="all, delete", passive_deletes=True)
 
     def serialize(self):
         return {
@@ -63,16 +82,24 @@ class Planet(db.Model):
 
 class Character(db.Model):
     __tablename__= 'character'
+    # Ranking de /characters/popular: keyset sobre (favorite_count, id) recorriendo el indice
+    __table_args__ = (Index('ix_character_favorite_count_id', 'favorite_count', 'id'),)
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(150), unique=True, nullable=False)
     gender: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)   
-    height: Mapped[int] = mapped_column(Integer, nullable=False)  
-    mass: Mapped[int] = mapped_column(Integer, nullable=False)  
+    height: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    mass: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Cuantos usuarios lo tienen de favorito, mantenido por favorites.py
+    favorite_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+
+    public_fields = ("id", "name", "gender", "height", "mass")
+    filter_fields = ("name", "gender", "height", "mass")
 
   # Relacion inversa
 
     favorite: Mapped[list["Favorite"]] = relationship(
-    back_populates="character")
+    back_populates="character", cascade="all, delete", passive_deletes=True)
 
 
     def serialize(self):
@@ -88,16 +115,24 @@ class Character(db.Model):
 
 class Vehicle(db.Model):
     __tablename__= 'vehicle'
+    # Ranking de /vehicles/popular: keyset sobre (favorite_count, id) recorriendo el indice
+    __table_args__ = (Index('ix_vehicle_favorite_count_id', 'favorite_count', 'id'),)
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(150), unique=True, nullable=False)
     cargo_capacity: Mapped[str] = mapped_column(String(100), unique=False, nullable=False)   
     length: Mapped[str] = mapped_column(String(100), unique=False, nullable=False) 
-    model: Mapped[str] = mapped_column(String(100), unique=False, nullable=False) 
+    model: Mapped[str] = mapped_column(String(100), unique=False, nullable=False, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Cuantos usuarios lo tienen de favorito, mantenido por favorites.py
+    favorite_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+
+    public_fields = ("id", "name", "cargo_capacity", "length", "model")
+    filter_fields = ("name", "model")
 
   # Relacion inversa
 
     favorite: Mapped[list["Favorite"]] = relationship(
-    back_populates="vehicle")
+    back_populates="vehicle", cascade="all, delete", passive_deletes=True)
 
 
 
@@ -112,12 +147,25 @@ class Vehicle(db.Model):
 
 class Favorite(db.Model):
     __tablename__= 'favorite'
+    # Un usuario no puede repetir favorito; la BD lo garantiza y los
+    # handlers insertan directamente y capturan el IntegrityError
+    __table_args__ = (
+        Index('ix_favorite_user_planet', 'user_id', 'planet_id', unique=True),
+        Index('ix_favorite_user_character', 'user_id', 'character_id', unique=True),
+        Index('ix_favorite_user_vehicle', 'user_id', 'vehicle_id', unique=True),
+        Index('ix_favorite_user_created_at', 'user_id', 'created_at'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey('user.id'))
-    planet_id: Mapped[int] = mapped_column(ForeignKey('planet.id'), nullable=True)
-    character_id: Mapped[int] = mapped_column(ForeignKey('character.id'), nullable=True)
-    vehicle_id: Mapped[int] = mapped_column(ForeignKey('vehicle.id'), nullable=True)
+    # Los favoritos se borran en la BD con su usuario o su entidad (ON DELETE CASCADE);
+    # los indices de planet_id/character_id/vehicle_id sirven a ese borrado
+    user_id: Mapped[int] = mapped_column(ForeignKey('user.id', ondelete='CASCADE'))
+    planet_id: Mapped[int] = mapped_column(ForeignKey('planet.id', ondelete='CASCADE'), nullable=True, index=True)
+    character_id: Mapped[int] = mapped_column(ForeignKey('character.id', ondelete='CASCADE'), nullable=True, index=True)
+    vehicle_id: Mapped[int] = mapped_column(ForeignKey('vehicle.id', ondelete='CASCADE'), nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    public_fields = ("id", "user_id", "planet_id", "character_id", "vehicle_id", "created_at")
 
      # Relaciones 
 
@@ -163,6 +211,23 @@ class Favorite(db.Model):
         if self.vehicle:
             data["vehicle"] = self.vehicle.serialize()
         return data
-    
-   
 
+
+class TableVersion(db.Model):
+    # Version por tabla para los ETag/Last-Modified: se incrementa en la misma
+    # transaccion que cualquier cambio (ver http_cache.py)
+    __tablename__= 'table_version'
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class PendingPurge(db.Model):
+    # DELETE aceptados con 202 cuyos favoritos se purgan en segundo plano: la
+    # fila sobrevive a un reinicio y otro proceso retoma la purga (ver purge.py)
+    __tablename__= 'pending_purge'
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    entity_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    # Hasta cuando la tiene cogida el proceso que la esta purgando (None: nadie)
+    claimed_until: Mapped[datetime] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,146 @@
+"""
+Connection pool settings and health for the SQLAlchemy engines.
+
+Read from env like DATABASE_URL:
+    DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30 s),
+    DB_POOL_RECYCLE (1800 s), DB_POOL_PRE_PING (1)
+
+Checkout wait time and pool saturation are exported to /metrics, and the
+engines are disposed in every forked child so gunicorn workers never share
+sockets opened in the master. SQLite connections are opened with
+foreign_keys=ON, so ON DELETE CASCADE works there as on the other engines.
+"""
+import os
+import time
+import sqlite3
+from sqlalchemy import exc, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from profiling import metrics
+
+metrics.describe('db_pool_checkout_wait_seconds', "Espera para obtener una conexion del pool")
+metrics.describe('db_pool_timeouts_total', "Checkouts que agotaron DB_POOL_TIMEOUT")
+metrics.describe('db_pool_saturation', "Conexiones en uso / (pool_size + max_overflow)")
+
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuanto espera cada checkout."""
+    pool_label = 'primary'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.inc('db_pool_timeouts_total', (('pool', self.pool_label),))
+            raise
+        finally:
+            metrics.observe('db_pool_checkout_wait_seconds', (('pool', self.pool_label),),
+                            time.perf_counter() - started, CHECKOUT_BUCKETS)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool, TimedQueuePool):
+    """La misma medicion para los engines de create_async_engine."""
+
+
+def timed_pool_class(label, asyncio=False):
+    # create_engine no acepta argumentos extra para el pool: la etiqueta va en una subclase
+    base = TimedAsyncQueuePool if asyncio else TimedQueuePool
+    if label == base.pool_label:
+        return base
+    return type(f"{base.__name__}_{label}", (base,), {"pool_label": label})
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite no aplica las claves ajenas (ni ON DELETE CASCADE) si no se activan en cada conexion
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+def engine_options_from_env(url, pool_label='primary', asyncio=False):
+    """Opciones para create_engine / SQLALCHEMY_ENGINE_OPTIONS segun el entorno
+    (con asyncio=True, para create_async_engine)."""
+    options = {
+        "pool_pre_ping": _env_bool('DB_POOL_PRE_PING', '1'),
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    # SQLite en memoria usa un pool de un solo hilo que no admite estas opciones
+    if url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') == 'sqlite:'):
+        return options
+
+    options.update(
+        poolclass=timed_pool_class(pool_label, asyncio),
+        pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        pool_timeout=float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    )
+    return options
+
+
+def pool_status(engine):
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(pool.checkedout() / capacity, 4) if capacity else 0,
+    }
+
+
+def metrics_collector(engines):
+    """Collector para metrics.add_collector: `engines()` devuelve {etiqueta: engine}."""
+    def collect():
+        for label, engine in engines().items():
+            status = pool_status(engine)
+            if status is None:
+                continue
+            labels = (('pool', label),)
+            yield 'db_pool_size', 'gauge', labels, status['size']
+            yield 'db_pool_checked_out', 'gauge', labels, status['checked_out']
+            yield 'db_pool_overflow', 'gauge', labels, status['overflow']
+            yield 'db_pool_saturation', 'gauge', labels, status['saturation']
+    return collect
+
+
+# clave -> funcion reset de dispose_after_fork, para reset_after_fork()
+_FORK_RESETS = {}
+
+
+def dispose_after_fork(key, engines):
+    """Tras un fork, el hijo descarta las conexiones heredadas sin cerrarlas
+    (siguen siendo del padre) y abre las suyas bajo demanda.
+
+    Registrar otra vez la misma clave (otra app en el mismo proceso) sustituye
+    a los engines anteriores en vez de acumularlos.
+    """
+    state = {"pid": os.getpid()}
+
+    def reset():
+        # Una vez por proceso: os.register_at_fork y el post_fork de gunicorn llaman los dos
+        if state["pid"] == os.getpid():
+            return
+        state["pid"] = os.getpid()
+        for engine in engines().values():
+            engine.dispose(close=False)
+    _FORK_RESETS[key] = reset
+    return reset
+
+
+def reset_after_fork():
+    """Descarta en el proceso actual las conexiones heredadas de todos los engines
+    registrados (post_fork de gunicorn_config.py)."""
+    for reset in list(_FORK_RESETS.values()):
+        reset()
+
+
+os.register_at_fork(after_in_child=reset_after_fork)
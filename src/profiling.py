@@ -0,0 +1,237 @@
+"""
+Per-request profiling: SQL query count and time (engine events), slowest
+statement, JSON serialization time and total time. Exposed as a
+`Server-Timing` header, a structured log line per request and aggregated
+per route in Prometheus text format (see `metrics.render()` and /metrics).
+
+Metrics are per process: with several gunicorn workers each one reports
+its own numbers.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from functools import wraps
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('starwars.requests')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+class MetricsRegistry:
+    """Contadores e histogramas en memoria, con etiquetas, renderizables para Prometheus.
+
+    Otros modulos pueden añadir metricas calculadas al vuelo con `add_collector`:
+    una funcion que devuelve tuplas (nombre, tipo, etiquetas, valor). Cada una va
+    con una clave: registrar otra con la misma clave (p.ej. al crear otra app en
+    el mismo proceso) sustituye a la anterior en vez de duplicar sus series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+        self.collectors = {}
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            key = (name, tuple(labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=DURATION_BUCKETS):
+        with self._lock:
+            key = (name, tuple(labels))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def add_collector(self, key, collector):
+        self.collectors[key] = collector
+
+    def render(self):
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, 'counter')
+                lines.append(f"{name}{{{_labels(labels)}}} {value}")
+
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                header(name, 'histogram')
+                prefix = _labels(labels)
+                sep = "," if prefix else ""
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{name}_bucket{{{prefix}{sep}le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{prefix}{sep}le="+Inf"}} {histogram.count}')
+                lines.append(f"{name}_sum{{{prefix}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{prefix}}} {histogram.count}")
+
+        for collector in list(self.collectors.values()):
+            for name, kind, labels, value in collector():
+                header(name, kind)
+                lines.append(f"{name}{{{_labels(labels)}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe('http_requests_total', "Peticiones HTTP por ruta, metodo y status")
+metrics.describe('http_request_duration_seconds', "Duracion de la peticion por ruta")
+metrics.describe('http_request_db_seconds', "Tiempo en la base de datos por peticion y ruta")
+metrics.describe('http_request_queries', "Queries SQL por peticion y ruta")
+metrics.describe('http_request_serialization_seconds', "Tiempo serializando JSON por peticion y ruta")
+
+
+class RequestProfile:
+    __slots__ = ('started', 'queries', 'db_time', 'slowest_time', 'slowest_statement',
+                 'serialization_time', 'serializing')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.serialization_time = 0.0
+        self.serializing = 0
+
+
+def current_profile():
+    if has_app_context():
+        return g.get('_profile')
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # En el contexto de ejecucion y no en conn.info: si la query falla no hay
+    # after_cursor_execute y no queda nada que limpiar
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    if profile is None:
+        return
+    elapsed = time.perf_counter() - context._query_started
+    profile.queries += 1
+    profile.db_time += elapsed
+    if elapsed > profile.slowest_time:
+        profile.slowest_time = elapsed
+        profile.slowest_statement = statement
+
+
+def _timed_serialization(function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = current_profile()
+        if profile is None:
+            return function(*args, **kwargs)
+        # response() llama a dumps()/dumpb(): solo cuenta la llamada exterior
+        profile.serializing += 1
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.serializing -= 1
+            if profile.serializing == 0:
+                profile.serialization_time += time.perf_counter() - started
+    return wrapper
+
+
+def _before_request():
+    g._profile = RequestProfile()
+
+
+def _after_request(response):
+    profile = g.pop('_profile', None)
+    if profile is None:
+        return response
+
+    total = time.perf_counter() - profile.started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    labels = (('route', route),)
+
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={profile.db_time * 1000:.2f};desc="{profile.queries} queries", '
+        f'ser;dur={profile.serialization_time * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+    metrics.inc('http_requests_total', labels + (('method', request.method), ('status', response.status_code)))
+    metrics.observe('http_request_duration_seconds', labels, total)
+    metrics.observe('http_request_db_seconds', labels, profile.db_time)
+    metrics.observe('http_request_queries', labels, profile.queries, QUERY_BUCKETS)
+    metrics.observe('http_request_serialization_seconds', labels, profile.serialization_time)
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 2),
+            "queries": profile.queries,
+            "db_ms": round(profile.db_time * 1000, 2),
+            "slowest_query_ms": round(profile.slowest_time * 1000, 2),
+            "slowest_query": (profile.slowest_statement or "")[:200] or None,
+            "serialization_ms": round(profile.serialization_time * 1000, 2),
+        }))
+    return response
+
+
+def init_profiling(app):
+    """Registra los hooks de la peticion y mide la serializacion del provider JSON de la app.
+    El log por peticion se desactiva con REQUEST_LOG=0."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    for name in ('dumps', 'dumpb', 'response'):
+        if hasattr(app.json, name):
+            setattr(app.json, name, _timed_serialization(getattr(app.json, name)))
+
+    if os.getenv('REQUEST_LOG', '1') != '0' and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
@@ -0,0 +1,206 @@
+"""
+Deleting users and catalog entities.
+
+Normally a DELETE is answered after three statements (counters, DELETE of the
+row, its favorites removed by ON DELETE CASCADE). When the row has more than
+PURGE_THRESHOLD favorites the cascade alone would hold the locks for the
+whole deletion, so the request is answered with 202 and a background thread
+empties the favorites in batches of PURGE_BATCH_SIZE, one transaction each,
+before deleting the row. Until then the row is still served, with its
+favorite counts going down.
+
+The 202 is only sent once the row is recorded in `pending_purge`, in the
+same transaction, so accepted work survives a restart, a deploy or a crash.
+The process purging a row holds a lease on it (PURGE_LEASE seconds, renewed
+with every batch). Each process resumes the pending rows nobody holds when
+it starts serving (post_worker_init in gunicorn_config.py, otherwise its
+first request) and again every PURGE_LEASE seconds while idle, which picks
+up the rows of a process that died.
+
+Read from env: PURGE_THRESHOLD (10000, 0 = always in the request),
+PURGE_BATCH_SIZE (1000), PURGE_LEASE (60).
+"""
+import os
+import queue
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, User, PendingPurge
+from favorites import FAVORITE_KINDS, delete_entity, delete_user, purge_entity_favorites, purge_user_favorites
+from profiling import metrics
+from background import ProcessWorker
+
+PURGE_THRESHOLD = int(os.getenv('PURGE_THRESHOLD', 10000))
+PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', 1000))
+PURGE_LEASE = float(os.getenv('PURGE_LEASE', 60))
+
+# tipo -> modelo con favorite_count
+MODELS = {'user': User, **{kind: model for kind, (model, _, _) in FAVORITE_KINDS.items()}}
+
+logger = logging.getLogger('starwars.purge')
+metrics.describe('purge_favorites_deleted_total', "Favoritos borrados por la purga en segundo plano")
+metrics.describe('purge_pending', "Borrados encolados para la purga en este proceso")
+
+
+def _delete(kind, entity_id):
+    return delete_user(entity_id) if kind == 'user' else delete_entity(kind, entity_id)
+
+
+def _purge_batch(kind, entity_id, limit):
+    if kind == 'user':
+        return purge_user_favorites(entity_id, limit)
+    return purge_entity_favorites(kind, entity_id, limit)
+
+
+def _pending(kind, entity_id):
+    return (PendingPurge.kind == kind) & (PendingPurge.entity_id == entity_id)
+
+
+class Purger:
+    """Un thread por proceso que purga, de una en una, las filas de pending_purge."""
+
+    def __init__(self, app, batch_size=PURGE_BATCH_SIZE, lease=PURGE_LEASE):
+        self.app = app
+        self.batch_size = batch_size
+        self.lease = lease
+        self._worker = ProcessWorker('purge', self._run)
+        self._lock = threading.Lock()
+        self._queued = set()
+
+    def start(self):
+        """Arranca el thread de este proceso, que empieza retomando lo pendiente."""
+        if self._worker.start():
+            with self._lock:
+                # Lo encolado en el proceso padre no tiene quien lo purgue aqui
+                self._queued = set()
+
+    def schedule(self, kind, entity_id):
+        """Encola la purga de una fila ya marcada en pending_purge; False si ya estaba en cola."""
+        self.start()
+        with self._lock:
+            if (kind, entity_id) in self._queued:
+                return False
+            self._queued.add((kind, entity_id))
+        self._worker.queue.put((kind, entity_id))
+        return True
+
+    def pending(self):
+        if not self._worker.running():
+            return 0
+        with self._lock:
+            return len(self._queued)
+
+    def resume(self):
+        """Encola las filas de pending_purge que no tiene cogidas ningun proceso."""
+        with self.app.app_context():
+            rows = db.session.execute(
+                select(PendingPurge.kind, PendingPurge.entity_id).where(
+                    or_(PendingPurge.claimed_until.is_(None), PendingPurge.claimed_until < datetime.utcnow())
+                ).order_by(PendingPurge.created_at)
+            ).all()
+            db.session.rollback()
+        for kind, entity_id in rows:
+            self.schedule(kind, entity_id)
+
+    def _run(self):
+        resume = True
+        while True:
+            try:
+                if resume:
+                    self.resume()
+                kind, entity_id = self._worker.queue.get(timeout=self.lease)
+            except queue.Empty:
+                resume = True
+                continue
+            except Exception:
+                logger.exception("Fallo al retomar las purgas pendientes")
+                resume = False
+                continue
+            resume = False
+            try:
+                with self.app.app_context():
+                    self.purge(kind, entity_id)
+            except Exception:
+                logger.exception("Fallo la purga de %s %s", kind, entity_id)
+            finally:
+                with self._lock:
+                    self._queued.discard((kind, entity_id))
+
+    def _hold(self, kind, entity_id, claim):
+        """Coge (claim=True: solo si nadie la tiene) o renueva la fila de pending_purge."""
+        now = datetime.utcnow()
+        condition = _pending(kind, entity_id)
+        if claim:
+            condition &= or_(PendingPurge.claimed_until.is_(None), PendingPurge.claimed_until < now)
+        result = db.session.execute(
+            update(PendingPurge).where(condition).values(claimed_until=now + timedelta(seconds=self.lease))
+        )
+        return result.rowcount == 1
+
+    def purge(self, kind, entity_id):
+        """Vacia los favoritos en lotes (un commit por lote) y borra la fila y su
+        marca en pending_purge. No hace nada si otro proceso la tiene cogida."""
+        labels = (('kind', kind),)
+        try:
+            if not self._hold(kind, entity_id, claim=True):
+                db.session.rollback()
+                return
+            db.session.commit()
+            while True:
+                deleted = _purge_batch(kind, entity_id, self.batch_size)
+                self._hold(kind, entity_id, claim=False)
+                db.session.commit()
+                metrics.inc('purge_favorites_deleted_total', labels, deleted)
+                if deleted < self.batch_size:
+                    break
+            _delete(kind, entity_id)
+            db.session.execute(delete(PendingPurge).where(_pending(kind, entity_id)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def init_purge(app):
+    purger = app.extensions['purger'] = Purger(app)
+    # Sin gunicorn (flask run, uvicorn) el proceso retoma lo pendiente con su primera peticion
+    app.before_request(purger.start)
+    metrics.add_collector('purge', lambda: [('purge_pending', 'gauge', (), purger.pending())])
+    return purger
+
+
+def _mark_pending(kind, entity_id):
+    """Apunta la fila en pending_purge (si no lo estaba ya), en la transaccion del llamador."""
+    try:
+        with db.session.begin_nested():
+            db.session.add(PendingPurge(kind=kind, entity_id=entity_id))
+    except IntegrityError:
+        # Un DELETE anterior ya la dejo pendiente
+        pass
+
+
+def remove(kind, entity_id):
+    """Borra el usuario (kind='user') o el planeta/personaje/vehiculo, con commit.
+
+    Devuelve 'deleted', 'scheduled' si tiene mas de PURGE_THRESHOLD favoritos
+    y se purga en segundo plano, o None si no existe.
+    """
+    if PURGE_THRESHOLD:
+        model = MODELS[kind]
+        count = db.session.execute(select(model.favorite_count).where(model.id == entity_id)).scalar()
+        if count is None:
+            return None
+        if count > PURGE_THRESHOLD:
+            _mark_pending(kind, entity_id)
+            db.session.commit()
+            current_app.extensions['purger'].schedule(kind, entity_id)
+            return 'scheduled'
+
+    if not _delete(kind, entity_id):
+        db.session.rollback()
+        return None
+    db.session.commit()
+    return 'deleted'
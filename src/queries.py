@@ -0,0 +1,168 @@
+"""
+Shared query layer for the list endpoints: keyset pagination on `id`,
+column projection (`?fields=`) and indexed filters (`?climate=`, `?population_gte=`).
+"""
+from flask import abort
+from sqlalchemy import select, tuple_
+from models import db
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+POPULAR_LIMIT = 50
+
+# sufijo del query param -> operador sobre la columna
+RANGE_OPERATORS = {
+    "gte": lambda column, value: column >= value,
+    "gt": lambda column, value: column > value,
+    "lte": lambda column, value: column <= value,
+    "lt": lambda column, value: column < value,
+}
+
+
+def parse_int(args, name, default=None, minimum=None, maximum=None):
+    raw = args.get(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        abort(400, description=f"El parametro {name} debe ser un entero")
+    if minimum is not None and value < minimum:
+        abort(400, description=f"El parametro {name} debe ser >= {minimum}")
+    if maximum is not None and value > maximum:
+        value = maximum
+    return value
+
+
+def parse_fields(model, raw):
+    if not raw:
+        return list(model.public_fields)
+
+    fields = ["id"]
+    for name in raw.split(","):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in model.public_fields:
+            abort(400, description=f"El campo {name} no existe en {model.__tablename__}")
+        fields.append(name)
+    return fields
+
+
+def coerce_value(column, raw):
+    python_type = column.type.python_type
+    if python_type is bool:
+        if raw.lower() in ("true", "1"):
+            return True
+        if raw.lower() in ("false", "0"):
+            return False
+        abort(400, description=f"El filtro {column.key} debe ser true o false")
+    if python_type is int:
+        try:
+            return int(raw)
+        except ValueError:
+            abort(400, description=f"El filtro {column.key} debe ser un entero")
+    return raw
+
+
+def parse_filters(model, args):
+    """[(param, valor)] de los filtros que reconoce `model`, con el valor ya
+    convertido y ordenados por param; el resto de parametros se ignora."""
+    filters = []
+    for key, raw in args.items():
+        name, _, suffix = key.rpartition("_")
+        if key in model.filter_fields:
+            filters.append((key, coerce_value(getattr(model, key), raw)))
+        elif name in model.filter_fields and suffix in RANGE_OPERATORS:
+            filters.append((key, coerce_value(getattr(model, name), raw)))
+    return sorted(filters, key=lambda item: item[0])
+
+
+def filter_conditions(model, filters):
+    conditions = []
+    for key, value in filters:
+        if key in model.filter_fields:
+            conditions.append(getattr(model, key) == value)
+        else:
+            name, _, suffix = key.rpartition("_")
+            conditions.append(RANGE_OPERATORS[suffix](getattr(model, name), value))
+    return conditions
+
+
+def parse_list_args(model, args):
+    """(fields, filters, after, limit) de un listado, validados y normalizados.
+
+    Es todo lo que cambia la pagina y nada mas, asi que sirve tambien de
+    clave de cache: un parametro desconocido no crea otra entrada.
+    """
+    fields = tuple(parse_fields(model, args.get("fields")))
+    filters = tuple(parse_filters(model, args))
+    after = parse_int(args, "after")
+    limit = parse_int(args, "limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+    return fields, filters, after, limit
+
+
+def build_list_query(model, list_args):
+    """Devuelve (statement, fields, limit) para el listado de `parse_list_args`."""
+    fields, filters, after, limit = list_args
+
+    statement = select(*[getattr(model, name) for name in fields])
+    statement = statement.where(*filter_conditions(model, filters))
+    if after is not None:
+        statement = statement.where(model.id > after)
+    statement = statement.order_by(model.id).limit(limit)
+    return statement, fields, limit
+
+
+def paginate(model, list_args):
+    """Ejecuta el listado y devuelve (items, next_after).
+
+    `next_after` es el id a pasar como `?after=` para la siguiente pagina,
+    o None si no hay mas filas.
+    """
+    statement, fields, limit = build_list_query(model, list_args)
+    return page_from_rows(db.session.execute(statement).all(), fields, limit)
+
+
+def page_from_rows(rows, fields, limit):
+    items = [dict(zip(fields, row)) for row in rows]
+    next_after = rows[-1][0] if len(rows) == limit else None
+    return items, next_after
+
+
+def public_row_query(model, entity_id):
+    return select(*[getattr(model, name) for name in model.public_fields]).where(model.id == entity_id)
+
+
+def parse_popular_cursor(args):
+    """?after=<favorite_count>:<id>, el valor de X-Next-After de la pagina anterior."""
+    raw = args.get("after")
+    if not raw:
+        return None
+    count, _, entity_id = raw.partition(":")
+    try:
+        return int(count), int(entity_id)
+    except ValueError:
+        abort(400, description="El parametro after debe tener la forma <favoritos>:<id>")
+
+
+def paginate_popular(model, args):
+    """Ranking por favorite_count (desc, empates por id desc) paginado por keyset.
+
+    Cada pagina es un recorrido del indice (favorite_count, id) desde el cursor:
+    el coste no depende de la profundidad ni del tamaño de la tabla.
+    Devuelve (items, next_after) con next_after ya formateado como cursor.
+    """
+    fields = list(model.public_fields) + ["favorite_count"]
+    limit = parse_int(args, "limit", POPULAR_LIMIT, minimum=1, maximum=MAX_LIMIT)
+    after = parse_popular_cursor(args)
+
+    statement = select(*[getattr(model, name) for name in fields])
+    if after is not None:
+        statement = statement.where(tuple_(model.favorite_count, model.id) < after)
+    statement = statement.order_by(model.favorite_count.desc(), model.id.desc()).limit(limit)
+
+    rows = db.session.execute(statement).all()
+    items = [dict(zip(fields, row)) for row in rows]
+    next_after = f"{rows[-1].favorite_count}:{rows[-1].id}" if len(rows) == limit else None
+    return items, next_after
@@ -0,0 +1,87 @@
+"""
+Read-replica routing. With DATABASE_REPLICA_URLS (comma separated) the
+views marked with `@read_only` read from a replica chosen per request
+(REPLICA_STRATEGY=round_robin or least_connections). Everything else, and
+any read after a write in the same request, stays on the primary.
+A request reads the table versions (http_cache.table_versions) from the same
+replica as its data, so a lagging replica can only fill catalog cache keys
+of the version it has, never the newer ones written on the primary.
+"""
+import os
+import threading
+from functools import wraps
+from itertools import count
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from pool import engine_options_from_env, pool_status
+
+
+def _sync_engine(url, label):
+    return create_engine(url, **engine_options_from_env(url, pool_label=label))
+
+
+class ReplicaSet:
+    """`engine_factory(url, label)` crea cada engine (el modo ASGI pasa uno async)."""
+
+    def __init__(self, urls, strategy='round_robin', engine_factory=_sync_engine):
+        if strategy not in ('round_robin', 'least_connections'):
+            raise ValueError(f"REPLICA_STRATEGY desconocida: {strategy}")
+        self.strategy = strategy
+        self.urls = [url.replace("postgres://", "postgresql://") for url in urls]
+        self.engines = {}
+        for i, url in enumerate(self.urls):
+            label = f"replica{i}"
+            self.engines[label] = engine_factory(url, label)
+        self._engines = list(self.engines.values())
+        self._counter = count()
+        self._lock = threading.Lock()
+
+    def choose(self):
+        if self.strategy == 'least_connections':
+            return min(self._engines, key=lambda engine: (pool_status(engine) or {}).get('checked_out', 0))
+        with self._lock:
+            return self._engines[next(self._counter) % len(self._engines)]
+
+
+def init_replicas(app):
+    urls = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    replicas = ReplicaSet(urls, os.getenv('REPLICA_STRATEGY', 'round_robin')) if urls else None
+    app.extensions['replicas'] = replicas
+    return replicas
+
+
+class RoutingSession(Session):
+    """Session de Flask-SQLAlchemy que manda las lecturas a una replica cuando
+    la peticion es de solo lectura y todavia no ha escrito nada."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only') and not self.info.get('wrote'):
+            if clause is not None and getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            else:
+                replicas = current_app.extensions.get('replicas')
+                if replicas is not None:
+                    # La misma replica durante toda la peticion: lecturas coherentes entre si
+                    if 'replica' not in self.info:
+                        self.info['replica'] = replicas.choose()
+                    return self.info['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _mark_write(session, flush_context, instances):
+    session.info['wrote'] = True
+
+
+def read_only(view):
+    """Marca una vista GET como de solo lectura: sus queries pueden ir a una replica.
+
+    La marca vive en la session de la peticion (se descarta al terminar el
+    app context), asi que tambien cubre las respuestas en streaming.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        current_app.extensions['sqlalchemy'].session.info['read_only'] = True
+        return view(*args, **kwargs)
+    return wrapper
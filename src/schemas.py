@@ -0,0 +1,136 @@
+"""
+Request schemas for the write endpoints, derived from the models: which
+fields are required, their type and the maximum length of String(n)
+columns. Each schema is compiled once into a list of per-field checks, so
+validating a body is a loop over plain functions, and an invalid request
+is answered with a 422 listing every error before touching the database.
+"""
+from sqlalchemy import Integer, BigInteger, Boolean, String
+from utils import APIException
+from models import User, Planet, Character, Vehicle
+
+# Rangos de las columnas enteras: fuera de ellos PostgreSQL falla en el INSERT
+INTEGER_RANGES = {
+    BigInteger: (-2 ** 63, 2 ** 63 - 1),
+    Integer: (-2 ** 31, 2 ** 31 - 1),
+}
+
+
+def _string_check(name, max_length, non_empty):
+    not_string = f"el campo {name} debe ser un texto"
+    too_long = f"el campo {name} no puede tener mas de {max_length} caracteres"
+    empty = f"el campo {name} no puede estar vacio"
+
+    def check(value):
+        if type(value) is not str:
+            return not_string
+        if max_length is not None and len(value) > max_length:
+            return too_long
+        if non_empty and not value.strip():
+            return empty
+        return None
+    return check
+
+
+def _integer_check(name, minimum, maximum):
+    not_integer = f"el campo {name} debe ser un entero"
+    out_of_range = f"el campo {name} debe estar entre {minimum} y {maximum}"
+
+    def check(value):
+        # bool es subclase de int: type() lo deja fuera
+        if type(value) is not int:
+            return not_integer
+        if not minimum <= value <= maximum:
+            return out_of_range
+        return None
+    return check
+
+
+def _boolean_check(name):
+    not_boolean = f"el campo {name} debe ser true o false"
+
+    def check(value):
+        return None if type(value) is bool else not_boolean
+    return check
+
+
+def _column_check(column, non_empty):
+    column_type = column.type
+    if isinstance(column_type, String):
+        return _string_check(column.key, column_type.length, non_empty)
+    if isinstance(column_type, Boolean):
+        return _boolean_check(column.key)
+    if isinstance(column_type, Integer):
+        # BigInteger hereda de Integer: se mira primero el mas concreto
+        minimum, maximum = next(limits for kind, limits in INTEGER_RANGES.items() if isinstance(column_type, kind))
+        return _integer_check(column.key, minimum, maximum)
+    raise TypeError(f"Sin validacion para la columna {column.key} ({column_type})")
+
+
+def writable_fields(model):
+    """Columnas que el cliente debe mandar al crear: ni la clave primaria ni
+    las que rellena el servidor (con default, como updated_at o los contadores)."""
+    return tuple(
+        column.key for column in model.__table__.columns
+        if not column.primary_key and column.default is None and column.server_default is None
+    )
+
+
+class Schema:
+    """Validador de un body JSON compilado desde las columnas de `model`.
+
+    `fields` son los campos aceptados (por defecto `writable_fields`); los
+    que no admiten NULL son obligatorios. `non_empty` son los textos que
+    ademas no pueden venir vacios. Las claves desconocidas se ignoran.
+    """
+
+    def __init__(self, model, fields=None, non_empty=()):
+        self.model = model
+        self.fields = fields or writable_fields(model)
+        columns = model.__table__.columns
+        self._checks = tuple(
+            (name, not columns[name].nullable, f"el campo {name} es obligatorio",
+             _column_check(columns[name], name in non_empty))
+            for name in self.fields
+        )
+
+    def validate(self, data):
+        """Devuelve (fila, errores): la fila solo lleva los campos del schema."""
+        if type(data) is not dict:
+            return None, ["se esperaba un objeto JSON"]
+
+        row, errors = {}, []
+        for name, required, missing, check in self._checks:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    errors.append(missing)
+                continue
+            error = check(value)
+            if error is None:
+                row[name] = value
+            else:
+                errors.append(error)
+        return row, errors
+
+    def load(self, data):
+        """Fila validada o APIException 422 con todos los errores."""
+        row, errors = self.validate(data)
+        if errors:
+            raise APIException("El body no es valido", status_code=422, payload={"errors": errors})
+        return row
+
+
+USER_SCHEMA = Schema(User, fields=('email', 'password', 'first_name', 'last_name'),
+                     non_empty=('email', 'password', 'first_name', 'last_name'))
+PLANET_SCHEMA = Schema(Planet)
+CHARACTER_SCHEMA = Schema(Character)
+VEHICLE_SCHEMA = Schema(Vehicle)
+
+# Schema de creacion por modelo (lo usa tambien la carga masiva de bulk.py)
+CREATE_SCHEMAS = {
+    User: USER_SCHEMA,
+    Planet: PLANET_SCHEMA,
+    Character: CHARACTER_SCHEMA,
+    Vehicle: VEHICLE_SCHEMA,
+}
@@ -0,0 +1,180 @@
+"""
+Ranked full-text / prefix search over the catalog (GET /search?q=).
+
+- SQLite: one FTS5 table, `catalog_search`, kept up to date by triggers on
+  planet, character and vehicle (so bulk inserts and deletes are covered
+  too). Its rowid encodes type and id (id * 4 + type) so a trigger updates
+  or deletes an entry by rowid instead of scanning the index.
+- PostgreSQL: a GIN index per table on a weighted tsvector (name weighs
+  more than climate/terrain/model), queried with `to_tsquery(... :*)`.
+- Anything else (MySQL): prefix LIKE on the indexed `name` column.
+
+All the words of `q` must match; the last one as a prefix, as the user
+is still typing it ("luke sky" finds "Luke Skywalker"). Ranking looks at
+the first SEARCH_WINDOW matches only, so a two-letter query on a million
+rows costs about as much as a precise one.
+
+Results are ranked, not ordered by id, so pages go by position: `?offset=`
+(up to MAX_OFFSET) with the next one in X-Next-Offset, unlike the keyset
+`?after=` id cursor of the list endpoints.
+"""
+import re
+from flask import abort
+from sqlalchemy import event, text, select, literal, union_all
+from models import db, Planet, Character, Vehicle
+from queries import parse_int
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Paginar mas alla obliga a puntuar y ordenar demasiadas coincidencias
+MAX_OFFSET = 1000
+SEARCH_WINDOW = MAX_OFFSET + MAX_LIMIT
+
+# tipo -> (modelo, codigo en el rowid de FTS5, columnas buscables ademas de name)
+SEARCHABLE = {
+    'planet': (Planet, 1, ('climate', 'terrain')),
+    'character': (Character, 2, ()),
+    'vehicle': (Vehicle, 3, ('model',)),
+}
+KIND_BY_CODE = {code: kind for kind, (_, code, _) in SEARCHABLE.items()}
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _extra(prefix, columns):
+    return " || ' ' || ".join(f"{prefix}{column}" for column in columns) if columns else "''"
+
+
+def sqlite_ddl():
+    """Sentencias que crean la tabla FTS5 y sus triggers (la migracion tiene su propia copia)."""
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5("
+        "name, extra, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+    ]
+    for table, (_, code, columns) in SEARCHABLE.items():
+        insert = (f"INSERT INTO catalog_search (rowid, name, extra) "
+                  f"VALUES (new.id * 4 + {code}, new.name, {_extra('new.', columns)});")
+        delete = f"DELETE FROM catalog_search WHERE rowid = old.id * 4 + {code};"
+        watched = ", ".join(('name',) + columns)
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {watched} ON {table} "
+            f"BEGIN {delete} {insert} END",
+        ]
+    return statements
+
+
+def postgresql_vector(columns):
+    weighted = "setweight(to_tsvector('simple', coalesce(name, '')), 'A')"
+    if columns:
+        weighted += f" || setweight(to_tsvector('simple', {_extra('', columns)}), 'B')"
+    return weighted
+
+
+def postgresql_ddl():
+    return [
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING gin (({postgresql_vector(columns)}))"
+        for table, (_, _, columns) in SEARCHABLE.items()
+    ]
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(metadata, connection, **kw):
+    # Para las bases creadas con create_all (tests, benchmarks); las demas usan la migracion
+    ddl = {'sqlite': sqlite_ddl, 'postgresql': postgresql_ddl}.get(connection.dialect.name)
+    for statement in ddl() if ddl else ():
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, 'after_drop')
+def _drop_search_index(metadata, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS catalog_search")
+
+
+def rebuild_index():
+    """Rehace el indice desde las tablas (por si se cargaron datos con los triggers desactivados)."""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return False
+    db.session.execute(text("DELETE FROM catalog_search"))
+    for table, (_, code, columns) in SEARCHABLE.items():
+        db.session.execute(text(
+            f"INSERT INTO catalog_search (rowid, name, extra) "
+            f"SELECT id * 4 + {code}, name, {_extra('', columns)} FROM {table}"
+        ))
+    return True
+
+
+def parse_search(args):
+    words = [word.lower() for word in WORD.findall(args.get("q", ""))]
+    if not words:
+        abort(400, description="El parametro q es obligatorio")
+
+    kinds = list(SEARCHABLE)
+    if args.get("type"):
+        kinds = [kind.strip() for kind in args["type"].split(",")]
+        unknown = [kind for kind in kinds if kind not in SEARCHABLE]
+        if unknown:
+            abort(400, description=f"type debe ser uno de: {', '.join(SEARCHABLE)}")
+
+    if "after" in args:
+        abort(400, description="La busqueda se pagina con ?offset= (posicion en el ranking), no con ?after=")
+    limit = parse_int(args, "limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+    offset = parse_int(args, "offset", 0, minimum=0, maximum=MAX_OFFSET)
+    return words, kinds, limit, offset
+
+
+def _search_sqlite(words, kinds, limit, offset):
+    # Cada palabra entre comillas (sin sintaxis de FTS5 del usuario); la ultima como prefijo.
+    # Un termino exacto recorre su lista con saltos; un prefijo hay que expandirlo entero
+    match = " ".join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+    codes = ", ".join(str(SEARCHABLE[kind][1]) for kind in kinds)
+    rows = db.session.execute(text(
+        # bm25 con name 4 veces mas importante que extra, solo para las primeras coincidencias
+        "SELECT rowid, name FROM ("
+        "SELECT rowid, name, bm25(catalog_search, 4.0, 1.0) AS score FROM catalog_search "
+        f"WHERE catalog_search MATCH :match AND rowid % 4 IN ({codes}) LIMIT :window"
+        ") ORDER BY score, rowid LIMIT :limit OFFSET :offset"
+    ), {"match": match, "window": SEARCH_WINDOW, "limit": limit, "offset": offset}).all()
+    return [{"type": KIND_BY_CODE[rowid % 4], "id": rowid // 4, "name": name} for rowid, name in rows]
+
+
+def _search_postgresql(words, kinds, limit, offset):
+    query = " & ".join(words[:-1] + [f"{words[-1]}:*"])
+    parts = []
+    for kind in kinds:
+        model, _, columns = SEARCHABLE[kind]
+        vector = postgresql_vector(columns)
+        parts.append(
+            f"(SELECT '{kind}' AS type, id, name, ts_rank({vector}, to_tsquery('simple', :query)) AS score "
+            f"FROM {model.__tablename__} WHERE {vector} @@ to_tsquery('simple', :query) LIMIT :window)"
+        )
+    rows = db.session.execute(text(
+        " UNION ALL ".join(parts) + " ORDER BY score DESC, type, id LIMIT :limit OFFSET :offset"
+    ), {"query": query, "window": SEARCH_WINDOW, "limit": limit, "offset": offset}).all()
+    return [{"type": kind, "id": entity_id, "name": name} for kind, entity_id, name, _ in rows]
+
+
+def _search_prefix(words, kinds, limit, offset):
+    # Sin indice de texto: prefijo de la frase completa sobre name (columna unica, indexada;
+    # en MySQL LIKE ya no distingue mayusculas con la collation por defecto)
+    phrase = " ".join(words)
+    statement = union_all(*[
+        select(literal(kind).label("type"), model.id, model.name).where(model.name.like(f"{phrase}%"))
+        for kind in kinds
+        for model in [SEARCHABLE[kind][0]]
+    ]).order_by("name", "type", "id").limit(limit).offset(offset)
+    return [{"type": kind, "id": entity_id, "name": name} for kind, entity_id, name in db.session.execute(statement)]
+
+
+SEARCH_BACKENDS = {'sqlite': _search_sqlite, 'postgresql': _search_postgresql}
+
+
+def search(args):
+    """Devuelve (items, next_offset): next_offset es el ?offset= de la siguiente pagina o None."""
+    words, kinds, limit, offset = parse_search(args)
+    backend = SEARCH_BACKENDS.get(db.session.get_bind().dialect.name, _search_prefix)
+    items = backend(words, kinds, limit, offset)
+    next_offset = offset + limit if len(items) == limit and offset + limit < SEARCH_WINDOW else None
+    return items, next_offset
@@ -0,0 +1,44 @@
+"""
+Read views written once for both serving modes.
+
+A step function is a generator that yields SQLAlchemy statements and gets
+each result back (`rows = (yield statement).all()`); it never touches a
+session itself. `run` executes it with Flask-SQLAlchemy's session (wsgi.py)
+and `run_async` with an AsyncSession (asgi.py), so the ETags, the catalog
+cache and the responses are the same code under both. Only buffered results
+come back: `.all()`, `.first()`, `.one()`, `.scalar()`, `.scalars()`.
+"""
+from functools import wraps
+from models import db
+
+
+def run(steps):
+    """Ejecuta con db.session las sentencias que pide `steps` y devuelve lo que este devuelva."""
+    try:
+        statement = next(steps)
+        while True:
+            statement = steps.send(db.session.execute(statement))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_async(steps, session):
+    """Igual que `run` con una AsyncSession."""
+    try:
+        statement = next(steps)
+        while True:
+            statement = steps.send(await session.execute(statement))
+    except StopIteration as stop:
+        return stop.value
+
+
+def executed(view):
+    """Vista de Flask a partir de una funcion de pasos, ejecutada con `run`.
+
+    La funcion de pasos queda en `.steps`: asgi.py la ejecuta en async.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return run(view(*args, **kwargs))
+    wrapper.steps = view
+    return wrapper
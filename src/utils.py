@@ -21,7 +21,15 @@ def has_no_empty_params(rule):
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    # Las rutas no cambian con la app arrancada: el HTML se construye la primera vez
+    html = app.extensions.get('sitemap')
+    if html is None:
+        html = app.extensions['sitemap'] = build_sitemap(app)
+    return html
+
+def build_sitemap(app):
+    # El admin solo esta si lo carga el perfil (ver create_app)
+    links = ['/admin/'] if 'admin' in app.extensions else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
@@ -0,0 +1,207 @@
+"""
+Write-behind for POST /favorite/<type>/<id> (optional, FAVORITES_WRITE_BEHIND=1).
+
+The handlers check the ids and put the favorite in a bounded in-process queue
+instead of committing it themselves. A flusher thread takes everything that
+is queued, up to FAVORITES_FLUSH_ITEMS favorites, and writes it at once with
+favorites.add_favorites_bulk: multi-row INSERTs and the counters in one
+transaction, so one commit (one fsync) serves the whole batch. It never waits
+for more (group commit): a lone favorite is written right away, and under load
+the batch is whatever arrived while the previous commit was running. With the
+queue full the request gets a 503 and Retry-After. If writing a batch fails,
+it is written again one favorite per savepoint, so only the favorite that
+fails gets "error" and not everyone who shared its commit.
+
+The gain needs several favorites in flight per process. With sync durability
+behind gunicorn sync workers with one thread each (the default), every
+worker holds one request at a time: its batches have a single favorite and
+there is no group commit. Use GUNICORN_THREADS, the async worker (asgi.py)
+or async durability.
+
+FAVORITES_DURABILITY chooses what the client waits for:
+- sync (default): the response comes after the commit of its batch, with the
+  same 201 / 400 / 404 as without the queue.
+- async: 202 as soon as it is queued. Duplicates and missing ids are only
+  counted in /metrics, and whatever is still queued is lost if the process dies
+  (what is queued at a clean exit is flushed).
+
+Read from env: FAVORITES_QUEUE_SIZE (10000), FAVORITES_FLUSH_ITEMS (500), FAVORITES_DURABILITY (sync),
+FAVORITES_FLUSH_TIMEOUT (10 s, how long a sync request waits).
+"""
+import os
+import queue
+import atexit
+import logging
+import threading
+from sqlalchemy import Integer
+from models import db
+from favorites import add_favorites_bulk
+from schemas import INTEGER_RANGES
+from profiling import metrics
+from background import ProcessWorker
+
+DURABILITY_MODES = ('sync', 'async')
+FLUSH_BUCKETS = (1, 5, 10, 50, 100, 250, 500, 1000, 5000)
+MIN_ID, MAX_ID = INTEGER_RANGES[Integer]
+# Marca en la cola para que el flusher termine (ver close)
+_STOP = object()
+
+logger = logging.getLogger('starwars.write_behind')
+metrics.describe('favorites_queue_rejected_total', "Favoritos rechazados con 503 por tener la cola llena")
+metrics.describe('favorites_flush_items', "Favoritos escritos en cada commit del write-behind")
+metrics.describe('favorites_flush_results_total', "Resultado de los favoritos escritos por el write-behind")
+metrics.describe('favorites_queue_depth', "Favoritos esperando al flusher en este proceso")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Waiter:
+    """Lo que espera una peticion con durabilidad sync: el estado de su favorito."""
+    __slots__ = ('event', 'status')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.status = None
+
+
+class WriteBehindQueue:
+    def __init__(self, app, max_size=10000, flush_items=500, durability='sync', flush_timeout=10):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"FAVORITES_DURABILITY debe ser uno de: {', '.join(DURABILITY_MODES)}")
+        self.app = app
+        self.max_size = max_size
+        self.flush_items = flush_items
+        self.durability = durability
+        self.flush_timeout = flush_timeout
+        self._worker = ProcessWorker('favorites-flusher', self._run, max_size)
+        self._closed = False
+        atexit.register(self.close)
+
+    def depth(self):
+        return self._worker.queue.qsize() if self._worker.running() else 0
+
+    def add(self, user_id, kind, entity_id):
+        """Encola el favorito. Con durabilidad sync espera al commit y devuelve su
+        estado (el de add_favorites_bulk, 'error' o 'timeout'); con async, 'queued'.
+        QueueFull si la cola esta llena."""
+        if not (MIN_ID <= user_id <= MAX_ID and MIN_ID <= entity_id <= MAX_ID):
+            # Fuera del rango de la columna: no puede existir, y romperia el INSERT de todo el lote
+            return "user_not_found" if not MIN_ID <= user_id <= MAX_ID else "not_found"
+        self._worker.start()
+        if self._closed:
+            raise QueueFull()
+        waiter = Waiter() if self.durability == 'sync' else None
+        try:
+            self._worker.queue.put_nowait((user_id, kind, entity_id, waiter))
+        except queue.Full:
+            metrics.inc('favorites_queue_rejected_total')
+            raise QueueFull() from None
+        if waiter is None:
+            return "queued"
+        if not waiter.event.wait(self.flush_timeout):
+            return "timeout"
+        return waiter.status
+
+    def _next_batch(self):
+        batch = [self._worker.queue.get()]
+        # Lo que ya este en cola, como mucho flush_items: sin esperar a que llegue mas
+        while len(batch) < self.flush_items and batch[-1] is not _STOP:
+            try:
+                batch.append(self._worker.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self.flush(batch)
+            if stop:
+                return
+
+    def flush(self, batch):
+        items = [(user_id, kind, entity_id) for user_id, kind, entity_id, _ in batch]
+        try:
+            statuses = self._write(add_favorites_bulk, items)
+        except Exception:
+            if len(items) == 1:
+                logger.exception("Fallo el flush de 1 favorito")
+                statuses = ["error"]
+            else:
+                logger.warning("Fallo el flush de %d favoritos: se reintentan uno a uno", len(items), exc_info=True)
+                try:
+                    statuses = self._write(self._add_one_by_one, items)
+                except Exception:
+                    logger.exception("Fallo el flush uno a uno de %d favoritos", len(items))
+                    statuses = ["error"] * len(items)
+
+        metrics.observe('favorites_flush_items', (), len(batch), FLUSH_BUCKETS)
+        for (*_, waiter), status in zip(batch, statuses):
+            metrics.inc('favorites_flush_results_total', (('status', status),))
+            if waiter is not None:
+                waiter.status = status
+                waiter.event.set()
+
+    def _write(self, add, items):
+        with self.app.app_context():
+            try:
+                statuses = add(items)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        return statuses
+
+    @staticmethod
+    def _add_one_by_one(items):
+        # Cada favorito en su savepoint: el que falla no se lleva a los demas del lote
+        statuses = []
+        for item in items:
+            try:
+                with db.session.begin_nested():
+                    statuses.extend(add_favorites_bulk([item]))
+            except Exception:
+                logger.exception("Fallo el favorito %s", item)
+                statuses.append("error")
+        return statuses
+
+    def close(self):
+        """Al salir del proceso: el flusher termina su lote y se escribe lo que quede en la cola."""
+        if self._closed or not self._worker.running():
+            return
+        self._closed = True
+        try:
+            self._worker.queue.put(_STOP, timeout=self.flush_timeout)
+            self._worker.thread.join(self.flush_timeout)
+        except queue.Full:
+            pass
+        pending = []
+        while True:
+            try:
+                item = self._worker.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                pending.append(item)
+        for start in range(0, len(pending), self.flush_items):
+            self.flush(pending[start:start + self.flush_items])
+
+
+def init_write_behind(app):
+    if os.getenv('FAVORITES_WRITE_BEHIND', '0') != '1':
+        return None
+    write_behind = app.extensions['write_behind'] = WriteBehindQueue(
+        app,
+        max_size=int(os.getenv('FAVORITES_QUEUE_SIZE', 10000)),
+        flush_items=int(os.getenv('FAVORITES_FLUSH_ITEMS', 500)),
+        durability=os.getenv('FAVORITES_DURABILITY', 'sync'),
+        flush_timeout=float(os.getenv('FAVORITES_FLUSH_TIMEOUT', 10)),
+    )
+    metrics.add_collector('write_behind', lambda: [('favorites_queue_depth', 'gauge', (), write_behind.depth())])
+    return write_behind
@@ -1,7 +1,11 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
 
-from app import app as application
+import os
+from app import create_app
+
+# Perfil de produccion salvo que APP_PROFILE diga otra cosa: sin admin, migraciones ni swagger
+application = create_app(os.getenv('APP_PROFILE', 'production'))
 
 if __name__ == "__main__":
     application.run()
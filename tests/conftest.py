@@ -0,0 +1,33 @@
+"""
+Fixtures for the test suite: the app of src/app.py against a throwaway
+SQLite database, built with the same helpers as the benchmarks.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from common import SRC, load_app  # noqa: E402
+
+sys.path.insert(0, SRC)
+
+
+@pytest.fixture
+def make_app():
+    """load_app de benchmarks/common.py; la cache del catalogo se vacia entre tests
+    porque sus claves no dependen de la base de datos. Las variables de entorno
+    que pone load_app se deshacen al acabar el test."""
+    environ = dict(os.environ)
+
+    def factory(**env):
+        app, db_path = load_app(**env)
+        from cache import catalog_cache
+        catalog_cache.backend.clear()
+        return app, db_path
+    yield factory
+    os.environ.clear()
+    os.environ.update(environ)
+
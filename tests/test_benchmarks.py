@@ -0,0 +1,38 @@
+from common import seed
+import run
+
+VOLUMES = {"users": 5, "planets": 30, "characters": 30, "vehicles": 30, "favorites_per_user": 3}
+
+
+class RecordingDriver(run.TestClientDriver):
+    """Guarda el status de cada peticion para ver las que el escenario hace mal."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.statuses = []
+
+    def request(self, method, url, body):
+        status, data = super().request(method, url, body)
+        self.statuses.append((status, method, url))
+        return status, data
+
+
+def test_every_route_has_a_scenario(make_app):
+    app, _ = make_app(profile='production')
+    scenarios, _ = run.build_scenarios(VOLUMES)
+    assert run.check_coverage(app, scenarios) == []
+
+
+def test_every_scenario_runs_without_errors(make_app):
+    app, _ = make_app(profile='production')
+    seed(app, **VOLUMES)
+    scenarios, _ = run.build_scenarios(VOLUMES)
+    driver = RecordingDriver(app)
+
+    for scenario in scenarios:
+        result = run.run_scenario(driver, scenario, 3)
+        # Los DELETE se quedan sin ids si los POST de antes no crearon nada
+        assert result["requests"] > 0, scenario.rule
+        assert result["queries_per_request"] is not None
+
+    assert [request for request in driver.statuses if request[0] >= 400] == []
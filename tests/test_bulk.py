@@ -0,0 +1,66 @@
+import json
+import bulk
+
+
+def planet(name, climate=None):
+    return {"name": name, "climate": climate or f"climate-{name}", "terrain": "t", "population": 1}
+
+
+def test_bulk_reports_every_item(make_app):
+    app, _ = make_app()
+    client = app.test_client()
+    assert client.post('/planets', json=planet("Tatooine")).status_code == 201
+
+    response = client.post('/planets/bulk', json=[
+        planet("Hoth"),
+        planet("Tatooine"),               # ya existe
+        planet("Endor", "climate-Hoth"),  # climate unico, repetido dentro del lote
+        {"name": 3},
+        7,
+        planet("Naboo"),
+    ])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["created"], body["conflict"], body["invalid"]) == (2, 2, 2)
+    assert [result["status"] for result in body["results"]] == [
+        "created", "conflict", "conflict", "invalid", "invalid", "created"]
+    assert [result["index"] for result in body["results"]] == list(range(6))
+    assert body["results"][4]["errors"] == ["se esperaba un objeto JSON"]
+
+    created = {result["id"] for result in body["results"] if result["status"] == "created"}
+    names = {client.get(f'/planets/{planet_id}').get_json()["name"] for planet_id in created}
+    assert names == {"Hoth", "Naboo"}
+
+
+def test_bulk_ndjson_in_chunks(make_app):
+    app, _ = make_app()
+    client = app.test_client()
+    # El listado en cache no debe sobrevivir a la carga
+    assert client.get('/planets').get_json() == []
+
+    lines = [json.dumps(planet("A")), "no es json", "", json.dumps(planet("B")), json.dumps(planet("A", "other"))]
+    response = client.post('/planets/bulk?chunk_size=2', data="\n".join(lines),
+                           content_type='application/x-ndjson')
+    body = response.get_json()
+    # La linea vacia no cuenta; el duplicado de A esta en otro chunk
+    assert [result["status"] for result in body["results"]] == ["created", "invalid", "created", "conflict"]
+    assert {item["name"] for item in client.get('/planets').get_json()} == {"A", "B"}
+
+
+def test_bulk_race_falls_back_to_one_row_per_savepoint(make_app, monkeypatch):
+    app, _ = make_app()
+    client = app.test_client()
+    assert client.post('/planets', json=planet("Hoth")).status_code == 201
+    # Como si la fila la hubiera escrito otra peticion despues de buscar conflictos
+    monkeypatch.setattr(bulk, 'find_conflicts', lambda model, rows: set())
+
+    body = client.post('/planets/bulk', json=[planet("Bespin"), planet("Hoth"), planet("Dagobah")]).get_json()
+    assert [result["status"] for result in body["results"]] == ["created", "conflict", "created"]
+    assert len(client.get('/planets').get_json()) == 3
+
+
+def test_bulk_rejects_a_body_that_is_not_an_array(make_app):
+    app, _ = make_app()
+    client = app.test_client()
+    assert client.post('/planets/bulk', json={"name": "Hoth"}).status_code == 400
+    assert client.post('/planets/bulk?chunk_size=0', json=[]).status_code == 400
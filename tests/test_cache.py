@@ -0,0 +1,48 @@
+import os
+import pickle
+import sqlite3
+import pytest
+from cache import SqliteCache, CatalogCache
+
+LIST_ARGS = (("id", "name"), (("climate", "arid"),), None, 100)
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Dos CatalogCache sobre el mismo fichero, como dos workers de gunicorn."""
+    path = os.path.join(tmp_path, 'cache.db')
+    return CatalogCache(SqliteCache(path)), CatalogCache(SqliteCache(path))
+
+
+def test_entries_and_deletes_are_shared(workers):
+    first, second = workers
+    key = first.entity_key('planet', 3, 1)
+    first.set(key, b'{"id":1}')
+    assert second.get(key) == b'{"id":1}'
+
+    second.backend.delete(key)
+    assert first.get(key) is None
+
+
+def test_version_bump_moves_every_worker_to_new_keys(workers):
+    first, second = workers
+    old_key = first.list_key('planet', 3, LIST_ARGS)
+    first.set_page(old_key, b'[{"id":1}]', 1)
+    assert second.get_page(second.list_key('planet', 3, LIST_ARGS)) == (b'[{"id":1}]', 1)
+
+    # Tras un cambio en planet la version es 4: nadie vuelve a leer la pagina vieja
+    assert second.get_page(second.list_key('planet', 4, LIST_ARGS)) is None
+    second.set_page(second.list_key('planet', 4, LIST_ARGS), b'[]', None)
+    assert first.get_page(first.list_key('planet', 4, LIST_ARGS)) == (b'[]', None)
+
+
+def test_values_are_stored_as_raw_bytes(workers, tmp_path):
+    first, second = workers
+    # Lo que otro proceso escriba en el fichero se devuelve tal cual, nunca se deserializa
+    payload = pickle.dumps(("body", 1))
+    with sqlite3.connect(os.path.join(tmp_path, 'cache.db')) as conn:
+        conn.execute("INSERT INTO cache_entry VALUES (?, ?, ?, ?)", ('planet:1:id:1', payload, 2e9, 0))
+    assert second.get('planet:1:id:1') == payload
+    # Una pagina que no tiene el formato de set_page es un fallo de cache
+    second.set(second.list_key('planet', 1, LIST_ARGS), payload)
+    assert first.get_page(first.list_key('planet', 1, LIST_ARGS)) is None
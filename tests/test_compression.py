@@ -0,0 +1,63 @@
+import gzip
+import json
+import brotli
+import zstandard
+from common import seed
+
+DECOMPRESS = {
+    'gzip': gzip.decompress,
+    'br': brotli.decompress,
+    'zstd': lambda data: zstandard.ZstdDecompressor().decompress(data, max_output_size=10 ** 7),
+}
+
+
+def catalog_app(make_app):
+    app, _ = make_app(COMPRESSION_MIN_SIZE='200')
+    seed(app, users=1, planets=50, characters=0, vehicles=0, favorites_per_user=0)
+    return app
+
+
+def test_each_encoding_round_trips(make_app):
+    app = catalog_app(make_app)
+    client = app.test_client()
+    plain = client.get('/planets', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+
+    for encoding, decompress in DECOMPRESS.items():
+        response = client.get('/planets', headers={'Accept-Encoding': encoding})
+        assert response.headers['Content-Encoding'] == encoding
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert json.loads(decompress(response.data)) == plain.get_json()
+        # Cada representacion con su ETag: un 304 no mezcla encodings
+        assert response.headers['ETag'] != plain.headers['ETag']
+
+
+def test_negotiation_follows_the_client_preference(make_app):
+    app = catalog_app(make_app)
+    client = app.test_client()
+
+    def encoding(accept):
+        return client.get('/planets', headers={'Accept-Encoding': accept}).headers.get('Content-Encoding')
+
+    # Con la misma q gana el orden del servidor (zstd, br, gzip)
+    assert encoding('gzip, br, zstd') == 'zstd'
+    assert encoding('gzip;q=1, br;q=0.5') == 'gzip'
+    assert encoding('br;q=0, gzip') == 'gzip'
+    assert encoding('deflate') is None
+
+
+def test_small_bodies_are_not_compressed(make_app):
+    app = catalog_app(make_app)
+    response = app.test_client().get('/planets/1', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_cached_page_reuses_its_compressed_bytes(make_app):
+    app = catalog_app(make_app)
+    client = app.test_client()
+    first = client.get('/planets', headers={'Accept-Encoding': 'zstd'})
+    second = client.get('/planets', headers={'Accept-Encoding': 'zstd'})
+    assert first.data == second.data
+    stats = client.get('/cache/stats').get_json()
+    assert stats['hits'] >= 1
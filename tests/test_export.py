@@ -0,0 +1,31 @@
+import tracemalloc
+import pytest
+from common import seed
+
+
+def export_peak(make_app, characters, fmt):
+    """(bytes enviados, pico de memoria) de leer entero /characters/export."""
+    app, _ = make_app()
+    seed(app, users=1, planets=0, characters=characters, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        response = client.get(f'/characters/export?format={fmt}')
+        sent = sum(len(chunk) for chunk in response.response)
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return sent, peak
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'json'])
+def test_export_memory_does_not_grow_with_the_table(make_app, fmt):
+    small_sent, small_peak = export_peak(make_app, 3000, fmt)
+    large_sent, large_peak = export_peak(make_app, 30000, fmt)
+
+    assert large_sent > 9 * small_sent
+    # Un bloque de EXPORT_BATCH_SIZE filas en memoria, no la tabla
+    assert large_peak < 2 * small_peak
@@ -0,0 +1,97 @@
+import threading
+from sqlalchemy import event, insert
+from common import seed
+
+
+def add_favorites(app, user_id, count):
+    """`count` favoritos de `user_id`, repartidos entre planetas, personajes y vehiculos."""
+    from models import db, Favorite
+    from favorites import recompute_counts
+    columns = ("planet_id", "character_id", "vehicle_id")
+    with app.app_context():
+        db.session.execute(insert(Favorite), [
+            {"user_id": user_id, columns[n % 3]: n // 3 + 1} for n in range(count)
+        ])
+        recompute_counts()
+        db.session.commit()
+
+
+def count_queries(app, path):
+    from models import db
+    statements = []
+    # Solo las de la peticion: no las de los threads de fondo (purge.py) que arranca
+    request_thread = threading.current_thread()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is request_thread:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = app.test_client().get(path)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return response, len(statements)
+
+
+def test_user_favorites_query_count_does_not_grow_with_favorites(make_app):
+    app, _ = make_app()
+    seed(app, users=2, planets=100, characters=100, vehicles=100, favorites_per_user=0)
+    add_favorites(app, 1, 20)
+    add_favorites(app, 2, 200)
+
+    few, few_queries = count_queries(app, '/users/1/favorites')
+    many, many_queries = count_queries(app, '/users/2/favorites')
+
+    assert few.status_code == many.status_code == 200
+    assert len(few.get_json()["favorites"]) == 20
+    assert len(many.get_json()["favorites"]) == 200
+    assert few_queries == many_queries
+
+
+def post_statements(app, path, body):
+    """Respuesta y sentencias de escritura de un POST."""
+    from models import db
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.split(None, 1)[0] in ('INSERT', 'UPDATE', 'DELETE'):
+            statements.append(statement.split('(')[0].split(' SET')[0].strip())
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = app.test_client().post(path, json=body)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return response, statements
+
+
+def test_favorite_insert_goes_before_the_counter_updates(make_app):
+    from models import db, User, Planet
+    app, _ = make_app()
+    seed(app, users=1, planets=1, characters=0, vehicles=0, favorites_per_user=0)
+
+    response, statements = post_statements(app, '/favorite/planet/1', {"user_id": 1})
+    assert response.status_code == 201
+    assert statements == ['INSERT INTO favorite', 'UPDATE planet', 'UPDATE user']
+
+    # El duplicado falla en el INSERT, sin tocar las filas de los contadores
+    response, statements = post_statements(app, '/favorite/planet/1', {"user_id": 1})
+    assert response.status_code == 400
+    assert statements == ['INSERT INTO favorite']
+    with app.app_context():
+        assert db.session.get(Planet, 1).favorite_count == 1
+        assert db.session.get(User, 1).favorite_planet_count == 1
+
+
+def test_favorite_of_missing_user_or_entity(make_app):
+    app, _ = make_app()
+    seed(app, users=1, planets=1, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+    assert client.post('/favorite/planet/2', json={"user_id": 1}).get_json() == {"msg": "El planeta no existe"}
+    assert client.post('/favorite/planet/1', json={"user_id": 2}).get_json() == {"msg": "El usuario no existe"}
+    assert client.post('/favorite/planet/2', json={"user_id": 2}).status_code == 404
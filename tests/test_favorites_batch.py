@@ -0,0 +1,59 @@
+from common import seed
+from favorites import MAX_BATCH_SIZE
+
+
+def statuses(body):
+    return [result["status"] for result in body["results"]]
+
+
+def summary(client, user_id):
+    return client.get(f'/users/{user_id}/favorites/summary').get_json()
+
+
+def test_batch_add_reports_a_status_per_item(make_app):
+    app, _ = make_app()
+    seed(app, users=2, planets=3, characters=2, vehicles=1, favorites_per_user=0)
+    client = app.test_client()
+    assert client.post('/favorite/vehicle/1', json={"user_id": 1}).status_code == 201
+
+    body = client.post('/users/1/favorites/batch', json=[
+        {"type": "planet", "id": 1},
+        {"type": "planet", "id": 1},   # repetido en el lote
+        {"type": "vehicle", "id": 1},  # ya era favorito
+        {"type": "vehicle", "id": 9},
+        {"type": "ship", "id": 1},
+        {"type": "character", "id": "2"},
+        {"type": "character", "id": 2},
+    ]).get_json()
+    assert statuses(body) == ["created", "duplicate", "duplicate", "not_found", "invalid", "invalid", "created"]
+    assert (body["created"], body["duplicate"], body["not_found"], body["invalid"]) == (2, 2, 1, 2)
+    assert summary(client, 1) == {"user_id": 1, "total": 3, "planets": 1, "characters": 1, "vehicles": 1}
+    assert summary(client, 2)["total"] == 0
+
+
+def test_batch_remove_reports_a_status_per_item(make_app):
+    app, _ = make_app()
+    seed(app, users=1, planets=3, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+    client.post('/users/1/favorites/batch', json=[{"type": "planet", "id": 1}, {"type": "planet", "id": 2}])
+
+    body = client.delete('/users/1/favorites/batch', json=[
+        {"type": "planet", "id": 1},
+        {"type": "planet", "id": 3},
+        {"type": "planet", "id": 1},
+        {"id": 2},
+    ]).get_json()
+    assert statuses(body) == ["deleted", "not_found", "not_found", "invalid"]
+    assert summary(client, 1) == {"user_id": 1, "total": 1, "planets": 1, "characters": 0, "vehicles": 0}
+    assert [item["planet"]["id"] for item in client.get('/users/1/favorites').get_json()["favorites"]] == [2]
+
+
+def test_batch_rejects_bad_requests(make_app):
+    app, _ = make_app()
+    seed(app, users=1, planets=1, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+    assert client.post('/users/1/favorites/batch', json={"type": "planet", "id": 1}).status_code == 400
+    too_many = [{"type": "planet", "id": 1}] * (MAX_BATCH_SIZE + 1)
+    assert client.post('/users/1/favorites/batch', json=too_many).status_code == 400
+    assert client.post('/users/9/favorites/batch', json=[{"type": "planet", "id": 1}]).status_code == 404
+    assert summary(client, 1)["total"] == 0
@@ -0,0 +1,96 @@
+import threading
+from sqlalchemy import select, delete, event
+from common import seed
+
+
+def versions(app):
+    from models import db, TableVersion
+    with app.app_context():
+        return dict(db.session.execute(select(TableVersion.name, TableVersion.version)).all())
+
+
+def test_create_all_seeds_the_table_versions(make_app):
+    app, _ = make_app()
+    assert versions(app) == {'user': 1, 'planet': 1, 'character': 1, 'vehicle': 1}
+
+
+def test_missing_version_row_is_created_by_the_first_write(make_app):
+    from models import db, TableVersion
+    app, _ = make_app()
+    seed(app, users=1, planets=2, characters=0, vehicles=0, favorites_per_user=0)
+    with app.app_context():
+        db.session.execute(delete(TableVersion).where(TableVersion.name == 'planet'))
+        db.session.commit()
+
+    client = app.test_client()
+    assert client.delete('/planets/1').status_code == 200
+    assert versions(app)['planet'] == 1
+    assert client.delete('/planets/2').status_code == 200
+    assert versions(app)['planet'] == 2
+
+
+def test_conditional_get_answers_304_until_the_table_changes(make_app):
+    app, _ = make_app()
+    seed(app, users=1, planets=3, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+
+    first = client.get('/planets')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    not_modified = client.get('/planets', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+    assert not_modified.headers['ETag'] == etag
+    assert client.get('/planets', headers={'If-Modified-Since': last_modified}).status_code == 304
+    # Otra URL es otra representacion; otra tabla no cuenta
+    assert client.get('/planets?limit=1', headers={'If-None-Match': etag}).status_code == 200
+    assert client.post('/characters', json={"name": "Luke", "gender": "m", "height": 1, "mass": 1}).status_code == 201
+    assert client.get('/planets', headers={'If-None-Match': etag}).status_code == 304
+
+    assert client.delete('/planets/3').status_code == 200
+    changed = client.get('/planets', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.get_json()) == 2
+
+
+def test_not_modified_costs_one_query(make_app):
+    from models import db
+    app, _ = make_app()
+    seed(app, users=1, planets=3, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+    etag = client.get('/planets/1').headers['ETag']
+    with app.app_context():
+        engine = db.engine
+    statements = []
+    # Solo las de la peticion: no las del thread de la purga que arranca con ella
+    request_thread = threading.current_thread()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is request_thread:
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        assert client.get('/planets/1', headers={'If-None-Match': etag}).status_code == 304
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert len(statements) == 1
+    assert 'table_version' in statements[0]
+
+
+def test_favorites_etag_follows_the_favorites_and_the_embedded_rows(make_app):
+    app, _ = make_app()
+    seed(app, users=1, planets=3, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+    assert client.post('/favorite/planet/1', json={"user_id": 1}).status_code == 201
+
+    etag = client.get('/users/1/favorites').headers['ETag']
+    assert client.get('/users/1/favorites', headers={'If-None-Match': etag}).status_code == 304
+    # Un favorito nuevo cambia el count y el updated_at de sus favoritos
+    assert client.post('/favorite/planet/2', json={"user_id": 1}).status_code == 201
+    response = client.get('/users/1/favorites', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    # Y tambien un cambio en un planeta que va embebido
+    assert client.delete('/planets/3').status_code == 200
+    assert client.get('/users/1/favorites', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,73 @@
+import pytest
+from common import seed
+
+
+def walk(client, url):
+    """Recorre las paginas siguiendo X-Next-After; devuelve los items y el numero de paginas."""
+    items, pages, after = [], 0, None
+    while True:
+        response = client.get(url + (f'&after={after}' if after is not None else ''))
+        assert response.status_code == 200
+        items += response.get_json()
+        pages += 1
+        after = response.headers.get('X-Next-After')
+        if after is None:
+            return items, pages
+
+
+def test_keyset_pages_cover_every_row_once_in_order(make_app):
+    app, _ = make_app()
+    seed(app, users=0, planets=45, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+
+    items, pages = walk(client, '/planets?limit=10')
+    assert [item["id"] for item in items] == list(range(1, 46))
+    assert pages == 5
+
+
+def test_filters_combine_with_paging_and_projection(make_app):
+    app, _ = make_app()
+    seed(app, users=0, planets=100, characters=0, vehicles=0, favorites_per_user=0)
+    client = app.test_client()
+
+    # terrain-3 son los planetas 3, 23, 43, 63 y 83 (ids 4, 24, ...); de ellos population < 60000
+    items, pages = walk(client, '/planets?terrain=terrain-3&population_gte=20000&population_lt=60000&limit=1&fields=name')
+    assert items == [{"id": 24, "name": "Planet 23"}, {"id": 44, "name": "Planet 43"}]
+    # La ultima pagina llena aun manda cursor: la siguiente sale vacia y sin X-Next-After
+    assert pages == 3
+
+
+def test_unknown_query_parameters_are_ignored(make_app):
+    app, _ = make_app()
+    seed(app, users=0, planets=3, characters=0, vehicles=0, favorites_per_user=0)
+    response = app.test_client().get('/planets?color=red')
+    assert response.status_code == 200
+    assert len(response.get_json()) == 3
+
+
+@pytest.mark.parametrize('query, message', [
+    ('fields=bogus', "El campo bogus no existe en planet"),
+    ('population_gte=abc', "El filtro population debe ser un entero"),
+    ('after=x', "El parametro after debe ser un entero"),
+    ('limit=0', "El parametro limit debe ser &gt;= 1"),
+])
+def test_bad_list_parameters_are_rejected(make_app, query, message):
+    app, _ = make_app()
+    seed(app, users=0, planets=3, characters=0, vehicles=0, favorites_per_user=0)
+    response = app.test_client().get(f'/planets?{query}')
+    assert response.status_code == 400
+    assert message in response.get_data(as_text=True)
+
+
+def test_popular_ranking_pages_by_count_and_id(make_app):
+    app, _ = make_app()
+    seed(app, users=30, planets=20, characters=20, vehicles=20, favorites_per_user=3)
+    client = app.test_client()
+
+    items, _ = walk(client, '/planets/popular?limit=4')
+    # favorite_count desc, empates por id desc
+    ranking = [(item["favorite_count"], item["id"]) for item in items]
+    assert ranking == sorted(ranking, reverse=True)
+    assert sorted(item["id"] for item in items) == list(range(1, 21))
+
+    assert client.get('/planets/popular?after=x').status_code == 400
@@ -0,0 +1,10 @@
+def test_metrics_series_are_not_duplicated_by_a_second_app(make_app):
+    make_app()
+    app, _ = make_app()
+    client = app.test_client()
+    client.get('/planets')
+
+    lines = client.get('/metrics').get_data(as_text=True).splitlines()
+    series = [line.rsplit(' ', 1)[0] for line in lines if not line.startswith('#')]
+    assert 'db_pool_size{pool="primary"}' in series
+    assert len(series) == len(set(series))
@@ -0,0 +1,22 @@
+import os
+import pool
+
+
+def test_fork_resets_keep_only_the_latest_app(make_app):
+    make_app()
+    app, _ = make_app()
+    assert list(pool._FORK_RESETS) == ['app']
+
+    from models import db
+    with app.app_context():
+        engine = db.engine
+    disposed = []
+    engine.dispose = lambda close=True: disposed.append(close)
+
+    # os.register_at_fork ejecuta los reset en el hijo
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if disposed == [False] else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert disposed == []
@@ -0,0 +1,90 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, func
+from common import seed
+import purge
+
+
+def popular_planet(app, users=30):
+    """Planeta 1 favorito de todos los usuarios; el 2 sin favoritos."""
+    from models import db, User, Favorite
+    from favorites import recompute_counts, recompute_popularity
+    seed(app, users=users, planets=2, characters=0, vehicles=0, favorites_per_user=0)
+    with app.app_context():
+        user_ids = db.session.execute(select(User.id)).scalars().all()
+        db.session.execute(insert(Favorite), [{"user_id": user_id, "planet_id": 1} for user_id in user_ids])
+        recompute_counts()
+        recompute_popularity()
+        db.session.commit()
+
+
+def state(app):
+    """(planeta 1 existe, sus favoritos, filas en pending_purge)."""
+    from models import db, Planet, Favorite, PendingPurge
+    with app.app_context():
+        return (db.session.get(Planet, 1) is not None,
+                db.session.scalar(select(func.count()).where(Favorite.planet_id == 1)),
+                db.session.scalar(select(func.count()).select_from(PendingPurge)))
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.02)
+
+
+def test_small_delete_is_done_in_the_request(make_app, monkeypatch):
+    monkeypatch.setattr(purge, 'PURGE_THRESHOLD', 100)
+    app, _ = make_app()
+    popular_planet(app)
+
+    response = app.test_client().delete('/planets/1')
+    assert response.status_code == 200
+    assert state(app) == (False, 0, 0)
+
+
+def test_large_delete_is_accepted_and_purged_in_background(make_app, monkeypatch):
+    monkeypatch.setattr(purge, 'PURGE_THRESHOLD', 10)
+    app, _ = make_app()
+    popular_planet(app)
+    app.extensions['purger'].batch_size = 7
+
+    response = app.test_client().delete('/planets/1')
+    assert response.status_code == 202
+    wait_for(lambda: state(app) == (False, 0, 0))
+    assert app.test_client().get('/planets/1').status_code == 404
+
+
+def test_pending_purge_survives_a_restart(make_app, monkeypatch):
+    monkeypatch.setattr(purge, 'PURGE_THRESHOLD', 10)
+    app, db_path = make_app()
+    popular_planet(app)
+    # El proceso que acepto el DELETE murio antes de purgar: solo queda la marca
+    monkeypatch.setattr(purge.Purger, 'schedule', lambda self, kind, entity_id: True)
+    assert app.test_client().delete('/planets/1').status_code == 202
+    assert state(app) == (True, 30, 1)
+    monkeypatch.undo()
+
+    restarted, _ = make_app(db_path=db_path)
+    restarted.extensions['purger'].start()
+    wait_for(lambda: state(restarted) == (False, 0, 0))
+
+
+def test_purge_held_by_another_process_is_left_alone(make_app):
+    from models import db, PendingPurge
+    app, _ = make_app()
+    popular_planet(app)
+    with app.app_context():
+        db.session.add(PendingPurge(kind='planet', entity_id=1,
+                                    claimed_until=datetime.utcnow() + timedelta(minutes=5)))
+        db.session.commit()
+        app.extensions['purger'].purge('planet', 1)
+    assert state(app) == (True, 30, 1)
+
+    # Si su lease vence (el proceso murio), la purga se retoma
+    with app.app_context():
+        db.session.execute(db.update(PendingPurge).values(claimed_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+    app.extensions['purger'].start()
+    wait_for(lambda: state(app) == (False, 0, 0))
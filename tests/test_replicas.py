@@ -0,0 +1,29 @@
+import os
+import shutil
+from common import seed
+
+
+def sync_replica(app, db_path, replica_path):
+    """La replica se pone al dia copiando la base primaria."""
+    shutil.copy(db_path, replica_path)
+    for engine in app.extensions['replicas'].engines.values():
+        engine.dispose()
+
+
+def test_lagging_replica_does_not_fill_fresh_cache_keys(make_app, monkeypatch, tmp_path):
+    replica_path = os.path.join(tmp_path, 'replica.db')
+    monkeypatch.setenv('DATABASE_REPLICA_URLS', f"sqlite:///{replica_path}")
+    app, db_path = make_app()
+    seed(app, users=2, planets=5, characters=5, vehicles=5, favorites_per_user=0)
+    sync_replica(app, db_path, replica_path)
+    client = app.test_client()
+    assert client.get('/planets/2').status_code == 200
+
+    # El borrado va a la primaria; la replica aun no lo tiene
+    assert client.delete('/planets/2').status_code == 200
+    assert client.get('/planets/2').status_code == 200
+
+    # Lo leido de la replica atrasada quedo bajo la version vieja: al ponerse al dia ya no se sirve
+    sync_replica(app, db_path, replica_path)
+    assert client.get('/planets/2').status_code == 404
+    assert all(planet['id'] != 2 for planet in client.get('/planets').get_json())
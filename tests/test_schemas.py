@@ -0,0 +1,70 @@
+import threading
+from sqlalchemy import event
+
+
+def test_create_returns_every_error_with_422(make_app):
+    app, _ = make_app()
+    response = app.test_client().post('/planets', json={"name": "Hoth", "climate": 5, "population": "x"})
+    assert response.status_code == 422
+    assert response.get_json() == {
+        "message": "El body no es valido",
+        "errors": [
+            "el campo climate debe ser un texto",
+            "el campo terrain es obligatorio",
+            "el campo population debe ser un entero",
+        ],
+    }
+
+
+def test_schema_checks_types_ranges_lengths_and_empty_strings(make_app):
+    app, _ = make_app()
+    client = app.test_client()
+
+    errors = client.post('/users', json={
+        "email": "  ", "password": "x" * 300, "first_name": True, "last_name": "Organa",
+    }).get_json()["errors"]
+    assert errors == [
+        "el campo email no puede estar vacio",
+        "el campo password no puede tener mas de 255 caracteres",
+        "el campo first_name debe ser un texto",
+    ]
+
+    errors = client.post('/characters', json={
+        "name": "Luke", "gender": "male", "height": 2 ** 31, "mass": True,
+    }).get_json()["errors"]
+    assert errors == [
+        f"el campo height debe estar entre {-2 ** 31} y {2 ** 31 - 1}",
+        "el campo mass debe ser un entero",
+    ]
+
+
+def test_invalid_body_is_rejected_before_any_query(make_app):
+    from models import db
+    app, _ = make_app()
+    with app.app_context():
+        engine = db.engine
+    statements = []
+    # Solo las de la peticion: no las del thread de la purga que arranca con ella
+    request_thread = threading.current_thread()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is request_thread:
+            statements.append(statement)
+
+    client = app.test_client()
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        assert client.post('/users', json=["no", "es", "un", "objeto"]).status_code == 422
+        assert client.post('/vehicles', json={"name": "X-wing"}).status_code == 422
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert statements == []
+
+
+def test_valid_body_ignores_unknown_fields(make_app):
+    app, _ = make_app()
+    response = app.test_client().post('/vehicles', json={
+        "name": "X-wing", "cargo_capacity": "110", "length": "12", "model": "T-65", "id": 99, "favorite_count": 5,
+    })
+    assert response.status_code == 201
+    assert response.get_json()["id"] == 1
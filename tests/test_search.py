@@ -0,0 +1,62 @@
+from sqlalchemy import insert
+from common import seed
+
+
+def catalog(app):
+    from models import db, Planet, Character, Vehicle
+    seed(app, users=0, planets=0, characters=0, vehicles=0, favorites_per_user=0)
+    with app.app_context():
+        db.session.execute(insert(Character), [
+            {"name": "Luke Skywalker", "gender": "male-1", "height": 172, "mass": 77},
+            {"name": "Anakin Skywalker", "gender": "male-2", "height": 188, "mass": 84},
+            {"name": "Leia Organa", "gender": "female", "height": 150, "mass": 49},
+        ])
+        db.session.execute(insert(Planet), [
+            {"name": f"Planet {i}", "climate": f"arid-{i}", "terrain": "desert", "population": i} for i in range(25)
+        ])
+        db.session.execute(insert(Vehicle), [
+            {"name": "Sand Crawler", "cargo_capacity": "50000", "length": "36", "model": "Digger Crawler"},
+        ])
+        db.session.commit()
+
+
+def test_search_matches_every_word_and_the_last_as_prefix(make_app):
+    app, _ = make_app()
+    catalog(app)
+    client = app.test_client()
+
+    assert client.get('/search?q=luke sky').get_json() == [{"type": "character", "id": 1, "name": "Luke Skywalker"}]
+    assert {item["name"] for item in client.get('/search?q=skyw').get_json()} == {"Luke Skywalker", "Anakin Skywalker"}
+    # Tambien en las columnas secundarias (model del vehiculo), acotado por tipo
+    assert client.get('/search?q=digg&type=vehicle').get_json() == [{"type": "vehicle", "id": 1, "name": "Sand Crawler"}]
+    assert client.get('/search?q=digg&type=planet').get_json() == []
+
+
+def test_search_pages_by_offset(make_app):
+    app, _ = make_app()
+    catalog(app)
+    client = app.test_client()
+
+    first = client.get('/search?q=planet&limit=10')
+    assert len(first.get_json()) == 10
+    assert first.headers['X-Next-Offset'] == '10'
+    last = client.get('/search?q=planet&limit=10&offset=20')
+    assert len(last.get_json()) == 5
+    assert 'X-Next-Offset' not in last.headers
+
+    ids = [item["id"] for offset in (0, 10, 20)
+           for item in client.get(f'/search?q=planet&limit=10&offset={offset}').get_json()]
+    assert sorted(ids) == list(range(1, 26))
+
+
+def test_search_bad_requests(make_app):
+    app, _ = make_app()
+    catalog(app)
+    client = app.test_client()
+    assert client.get('/search').status_code == 400
+    assert client.get('/search?q=planet&type=starship').status_code == 400
+    assert client.get('/search?q=planet&limit=0').status_code == 400
+    assert client.get('/search?q=planet&offset=-1').status_code == 400
+    assert client.get('/search?q=planet&offset=x').status_code == 400
+    # after es el cursor por id de los listados: aqui no se acepta en silencio
+    assert client.get('/search?q=planet&after=10').status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+from common import seed
+import write_behind
+from write_behind import Waiter
+
+
+@pytest.mark.parametrize('queued', ['0', '1'])
+@pytest.mark.parametrize('body, status', [
+    ({}, 400),
+    ({"user_id": "1"}, 400),
+    ({"user_id": "abc"}, 400),
+    ({"user_id": True}, 400),
+    ({"user_id": 1.5}, 400),
+    ({"user_id": 2 ** 40}, 404),
+    ({"user_id": 1}, 201),
+])
+def test_user_id_is_validated_the_same_with_and_without_the_queue(make_app, queued, body, status):
+    app, _ = make_app(FAVORITES_WRITE_BEHIND=queued, FAVORITES_DURABILITY='sync')
+    seed(app, users=1, planets=1, characters=0, vehicles=0, favorites_per_user=0)
+    response = app.test_client().post('/favorite/planet/1', json=body)
+    assert response.status_code == status
+
+
+def test_failed_batch_is_retried_one_by_one(make_app, monkeypatch):
+    from models import db, User, Planet
+    app, _ = make_app(FAVORITES_WRITE_BEHIND='1')
+    seed(app, users=3, planets=1, characters=0, vehicles=0, favorites_per_user=0)
+    add_favorites_bulk = write_behind.add_favorites_bulk
+
+    def failing_for_user_2(items):
+        statuses = add_favorites_bulk(items)
+        if any(user_id == 2 for user_id, _, _ in items):
+            raise OperationalError("INSERT", None, Exception("simulado"))
+        return statuses
+    monkeypatch.setattr(write_behind, 'add_favorites_bulk', failing_for_user_2)
+
+    batch = [(user_id, 'planet', 1, Waiter()) for user_id in (1, 2, 3)]
+    app.extensions['write_behind'].flush(batch)
+
+    assert [waiter.status for *_, waiter in batch] == ["created", "error", "created"]
+    with app.app_context():
+        assert db.session.get(Planet, 1).favorite_count == 2
+        assert [db.session.get(User, user_id).favorite_count for user_id in (1, 2, 3)] == [1, 0, 1]